@@ -0,0 +1,131 @@
+# answer_cache.py
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class SemanticAnswerCache:
+    """
+    Caches generated answers in front of Generator.generate.
+
+    An entry is keyed by:
+      - the set of context documents the prompt was built from (exact match)
+      - the user preference string attached to the prompt (exact match)
+      - the query embedding (cosine similarity >= `threshold`)
+
+    so paraphrases of a recent question that retrieve the same context reuse its answer.
+    Generation is deterministic (do_sample=False), which makes reuse safe.
+
+    Entries expire after `ttl` seconds, the least recently used entry is evicted beyond
+    `capacity`, and everything is dropped when the FAISS index changes (`indexer.version`).
+    """
+
+    def __init__(self, capacity: int = 1024, ttl: float = 3600.0, threshold: float = 0.95, indexer=None):
+        """
+        Args:
+            capacity: maximum number of cached answers
+            ttl: seconds an answer stays valid; None disables expiry
+            threshold: minimum cosine similarity between normalized query embeddings
+            indexer: FaissIndexer whose version invalidates the cache on rebuild/update
+        """
+        self.capacity = capacity
+        self.ttl = ttl
+        self.threshold = threshold
+        self.indexer = indexer
+        self._version = self._index_version()
+
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()  # LRU order, oldest first
+        self._groups: Dict[Tuple[frozenset, str], List[int]] = {}  # context key -> entry ids
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._counts = {"lookups": 0, "hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def context_key(doc_indices: Iterable[int], user_pref: Optional[str] = None) -> Tuple[frozenset, str]:
+        return frozenset(int(i) for i in doc_indices), (user_pref or "").strip().lower()
+
+    def _index_version(self) -> Optional[int]:
+        return getattr(self.indexer, "version", None)
+
+    def _check_version(self):
+        version = self._index_version()
+        if version != self._version:
+            self._entries.clear()
+            self._groups.clear()
+            self._version = version
+            self._counts["invalidations"] += 1
+
+    def _drop(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        group = self._groups[entry["ctx"]]
+        group.remove(entry_id)
+        if not group:
+            del self._groups[entry["ctx"]]
+
+    def get(self, q_emb: np.ndarray, doc_indices: Iterable[int], user_pref: Optional[str] = None) -> Optional[str]:
+        """
+        Args:
+            q_emb: normalized query embedding, shape (1, dim) or (dim,)
+            doc_indices: document indices of the prompt context
+            user_pref: preference string attached to the prompt, if any
+
+        Returns:
+            the cached answer, or None on a miss
+        """
+        ctx = self.context_key(doc_indices, user_pref)
+        q = np.asarray(q_emb, dtype="float32").reshape(-1)
+        now = time.monotonic()
+        with self._lock:
+            self._check_version()
+            self._counts["lookups"] += 1
+            best_id, best_sim = None, self.threshold
+            for entry_id in list(self._groups.get(ctx, ())):
+                entry = self._entries[entry_id]
+                if entry["expires"] is not None and entry["expires"] <= now:
+                    self._drop(entry_id)
+                    continue
+                sim = float(entry["q_emb"] @ q)
+                if sim >= best_sim:
+                    best_id, best_sim = entry_id, sim
+            if best_id is None:
+                self._counts["misses"] += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self._counts["hits"] += 1
+            return self._entries[best_id]["answer"]
+
+    def put(self, q_emb: np.ndarray, doc_indices: Iterable[int], answer: str, user_pref: Optional[str] = None):
+        ctx = self.context_key(doc_indices, user_pref)
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._check_version()
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {
+                "q_emb": np.asarray(q_emb, dtype="float32").reshape(-1).copy(),
+                "ctx": ctx,
+                "answer": answer,
+                "expires": expires
+            }
+            self._groups.setdefault(ctx, []).append(entry_id)
+            while len(self._entries) > self.capacity:
+                self._drop(next(iter(self._entries)))
+                self._counts["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        """Counters plus the hit rate."""
+        with self._lock:
+            counts = dict(self._counts)
+            counts["size"] = len(self._entries)
+        counts["hit_rate"] = counts["hits"] / (counts["lookups"] or 1)
+        return counts
@@ -1,21 +1,13 @@
 # app_streamlit.py
 import streamlit as st
 import json
-from data_loader import load_items, load_faq, load_orders, build_document_store
 from embedder import  Embedder
-from indexer import FaissIndexer
-from retriever import HybridRetriever
+from embedding_cache import EmbeddingCache
 from reranker import  Reranker
 from generator import Generator
-from recommender import SimpleRecommender
-import re
-
-# --- Normalization function ---
-def normalize(text):
-    text = text.lower()
-    text = text.replace(' u ', ' you ')
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
+from hot_reload import SnapshotManager
+from metrics import PrometheusMetrics
+from pipeline import CafeBot
 
 # Dataset paths
 ITEMS_PATH = r"C:\\Users\\KIIT\\OneDrive\\Desktop\\Chat Bot\\Dataset\\Chat Bot Dataset\\Item_to_id.csv"
@@ -24,67 +16,73 @@ ORDERS_PATH = r"C:\\Users\\KIIT\\OneDrive\\Desktop\\Chat Bot\\Dataset\\Chat Bot
 
 @st.cache_resource
 def prepare():
-    items = load_items(ITEMS_PATH)
-    faq = load_faq(FAQ_PATH)
-    orders = load_orders(ORDERS_PATH)
-    docs = build_document_store(items, faq, orders)
-
-    embedder = Embedder()
-    texts = [d["text"] for d in docs]
-    vectors = embedder.encode(texts, normalize=True)
-
-    indexer = FaissIndexer(dim=vectors.shape[1])
-    indexer.build(vectors, [d["meta"] for d in docs])
-
-    retriever = HybridRetriever(docs, embedder, indexer)
+    embedder = Embedder(cache=EmbeddingCache())
     ranker = Reranker()
     generator = Generator()
-    recommender = SimpleRecommender(docs, embedder)
+    # Sessions run in parallel threads: share model calls across them
+    ranker.enable_batching()
+    generator.enable_batching()
+
+    # Dataset-dependent components, rebuilt incrementally when the CSVs change
+    snapshots = SnapshotManager(embedder, {"items": ITEMS_PATH, "faq": FAQ_PATH, "orders": ORDERS_PATH})
+    snapshots.start_watching()
 
-    return docs, retriever, ranker, generator, recommender
+    # Same question-answering pipeline as the CLI, with per-stage timings
+    metrics = PrometheusMetrics()
+    return CafeBot(embedder, ranker, generator, snapshots, metrics=metrics), metrics
 
 # Load resources
-docs, retriever, reranker, generator, recommender = prepare()
+bot, metrics = prepare()
+
+# One snapshot per script run: a reload mid-request never mixes old and new data
+snap = bot.snapshot
+docs = snap.docs
+faq_fastpath, answer_cache = snap.faq_fastpath, snap.answer_cache
 
 # --- UI ---
 st.title("☕ Café Assistant")
 st.write("Ask about shop timings, menu, prices, or get meal suggestions.")
-st.caption(f"📚 Loaded {len(docs)} documents")
+st.caption(f"📚 Loaded {len(docs)} documents (data version {snap.version})")
 
 with st.sidebar:
     user_pref = st.text_input("Your preferences (vegetarian, spicy, budget, etc.)")
     use_pref_for_gen = st.checkbox("Attach preferences to answer", value=True)
+    stream_answer = st.checkbox("Show the answer as it is written", value=True,
+                                help="Off: the answer is generated in a batch with other customers' questions")
+    fp_stats = faq_fastpath.stats()
+    st.caption(f"⚡ FAQ fast path: {fp_stats['hit_rate']:.0%} of {fp_stats['queries']} questions "
+               f"(exact {fp_stats['exact']}, similar {fp_stats['semantic']})")
+    ac_stats = answer_cache.stats()
+    st.caption(f"💾 Answer cache: {ac_stats['hit_rate']:.0%} of {ac_stats['lookups']} generations reused "
+               f"({ac_stats['size']} cached)")
+    if snap.menu_lookup is not None:
+        ml_stats = snap.menu_lookup.stats()
+        st.caption(f"🔎 Menu lookup: {ml_stats['answered']} answered from the menu data, "
+                   f"{ml_stats['injected']} more with the mentioned items as sources")
+    rr_stats = bot.reranker.stats()
+    st.caption(f"🎯 Reranker skipped for {rr_stats['skip_rate']:.0%} of {rr_stats['calls']} questions, "
+               f"{rr_stats['cache_hit_rate']:.0%} of scores from cache")
+    with st.expander("⏱️ Stage timings"):
+        st.table({stage: {"calls": v["calls"], "wall ms": round(v["wall_ms"], 1), "cpu ms": round(v["cpu_ms"], 1)}
+                  for stage, v in metrics.summary()["stages"].items()})
 
 # --- User question ---
 q = st.text_input("Your question")
 ask = st.button("Ask")
 
 if ask and q.strip():
-    q_norm = normalize(q)
     st.subheader("🔍 Processing your question...")
+    pref = user_pref if use_pref_for_gen else None
+    turn = bot.retrieve(q, pref)  # FAQ fast path, retrieval, rerank and answer cache
 
-    # Retrieve candidates
-    candidates = retriever.hybrid_search(q_norm, k=12)  # fetch more to include detailed answers
-    for c in candidates:
-        idx = c.get("index")
-        if idx is not None and 0 <= idx < len(docs):
-            c["text"] = docs[idx]["text"]
-        else:
-            c["text"] = ""
-
-    # Rerank candidates
-    reranked = reranker.rerank(q_norm, candidates[:10])
-    context_docs = reranked[:6]  # give generator more context
-
-    # Generate answer
-    prompt = generator.craft_prompt(
-        q, context_docs, user_pref if use_pref_for_gen else None
-    )
-    answer = generator.generate(prompt)
-
-    # Display answer
+    # Display answer (streamed word by word when it has to be generated)
     st.subheader("✅ Answer")
-    st.write(answer)
+    if turn.answer is None and stream_answer:
+        answer = st.write_stream(bot.stream(turn)).strip()
+    else:
+        answer = bot.generate(turn)
+        st.write(answer)
+    context_docs, reranked = turn.context, turn.candidates
 
     # --- Human feedback ---
     feedback = st.radio("Did this answer help you?", ("👍 Yes", "👎 No"))
@@ -110,6 +108,6 @@ else:
 
 # --- Recommendations ---
 st.subheader("🍴 Quick recommendations")
-recs = recommender.recommend(user_pref if user_pref else "popular", k=3)
+recs = bot.recommend(user_pref if user_pref else "popular", k=3)
 for r in recs:
     st.write(r["meta"].get("item_name", "Unknown"), "| score:", round(r["score"], 3))
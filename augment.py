@@ -0,0 +1,289 @@
+# augment.py
+"""
+Offline augmentation stage: builds an augmented corpus once and stores it on disk,
+instead of augmenting text by text inside Embedder.encode(augment=True).
+
+Per chunk of records:
+  - preprocessing as in Embedder.encode
+  - WordNet synonym replacement in a process pool
+  - back-translation through a pluggable BackTranslator ("google", "marian", "none")
+  - T5 paraphrasing in padded batches
+
+Results are appended to a JSONL file chunk by chunk, so an interrupted run resumes
+where it stopped. `load_augmented` reads the corpus back for index builds.
+
+Usage:
+    python augment.py --faq "Dataset/Chat Bot Dataset/conversationo.csv" --out models/augmented_faq.jsonl
+    python augment.py --faq ... --methods synonym t5 --back-translator none --workers 8
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+METHODS = ("synonym", "back_translate", "t5")
+
+
+# -------------------- Synonym replacement (runs in worker processes) --------------------
+def synonym_replacement(sentence: str, n: int = 2, seed: Optional[int] = None) -> str:
+    """Same replacement as Embedder.synonym_replacement, with an optional per-sentence seed."""
+    from nltk.corpus import wordnet
+
+    words = sentence.split()
+    if not words:
+        return sentence
+    rng = random.Random(seed)
+    new_words = words.copy()
+    for word in rng.sample(words, min(n, len(words))):
+        synonyms = wordnet.synsets(word)
+        if synonyms:
+            synonym_words = synonyms[0].lemma_names()
+            if synonym_words and synonym_words[0].lower() != word.lower():
+                new_words[words.index(word)] = synonym_words[0].replace('_', ' ')
+    return ' '.join(new_words)
+
+
+def _synonym_task(args: Tuple[str, int, int]) -> str:
+    return synonym_replacement(*args)
+
+
+def _seed(seed: int, record_id: str) -> int:
+    """Stable per-record seed, so a resumed run produces the same output as an uninterrupted one."""
+    return int.from_bytes(hashlib.sha1(f"{seed}|{record_id}".encode("utf-8")).digest()[:4], "little")
+
+
+# -------------------- Back-translation backends --------------------
+class BackTranslator:
+    """Translates sentences src -> mid -> src. Subclasses implement `back_translate_batch`."""
+
+    name = "base"
+
+    def back_translate_batch(self, sentences: List[str]) -> List[str]:
+        raise NotImplementedError
+
+
+class IdentityBackTranslator(BackTranslator):
+    """Offline no-op stand-in: returns the sentences unchanged."""
+
+    name = "none"
+
+    def back_translate_batch(self, sentences: List[str]) -> List[str]:
+        return list(sentences)
+
+
+class GoogleBackTranslator(BackTranslator):
+    """googletrans round trip (needs network access); falls back to the input per sentence."""
+
+    name = "google"
+
+    def __init__(self, src: str = "en", mid: str = "fr"):
+        from googletrans import Translator
+        self.translator = Translator()
+        self.src, self.mid = src, mid
+
+    def back_translate_batch(self, sentences: List[str]) -> List[str]:
+        out = []
+        for s in sentences:
+            try:
+                translated = self.translator.translate(s, src=self.src, dest=self.mid).text
+                out.append(self.translator.translate(translated, src=self.mid, dest=self.src).text)
+            except Exception:
+                out.append(s)  # fallback if translation fails
+        return out
+
+
+class MarianBackTranslator(BackTranslator):
+    """Local round trip through two MarianMT models (Helsinki-NLP/opus-mt-*), batched."""
+
+    name = "marian"
+
+    def __init__(self, src: str = "en", mid: str = "fr", device: str = "cpu", batch_size: int = 32):
+        from transformers import MarianMTModel, MarianTokenizer
+        self.device = device
+        self.batch_size = batch_size
+        self.models = []
+        for a, b in ((src, mid), (mid, src)):
+            name = f"Helsinki-NLP/opus-mt-{a}-{b}"
+            self.models.append((MarianTokenizer.from_pretrained(name), MarianMTModel.from_pretrained(name).to(device)))
+
+    def _translate(self, sentences: List[str], tokenizer, model) -> List[str]:
+        import torch
+        out = []
+        for start in range(0, len(sentences), self.batch_size):
+            batch = tokenizer(sentences[start:start + self.batch_size], return_tensors="pt",
+                              padding=True, truncation=True).to(self.device)
+            with torch.no_grad():
+                generated = model.generate(**batch)
+            out.extend(tokenizer.batch_decode(generated, skip_special_tokens=True))
+        return out
+
+    def back_translate_batch(self, sentences: List[str]) -> List[str]:
+        for tokenizer, model in self.models:
+            sentences = self._translate(sentences, tokenizer, model)
+        return sentences
+
+
+BACK_TRANSLATORS = {
+    "none": IdentityBackTranslator,
+    "google": GoogleBackTranslator,
+    "marian": MarianBackTranslator,
+}
+
+
+def make_back_translator(name: str, **kwargs) -> BackTranslator:
+    if name not in BACK_TRANSLATORS:
+        raise ValueError(f"Unknown back-translator {name!r}, expected one of {tuple(BACK_TRANSLATORS)}")
+    return BACK_TRANSLATORS[name](**kwargs)
+
+
+# -------------------- Pipeline --------------------
+class AugmentationPipeline:
+    """
+    Batched, resumable augmentation of (id, text) records.
+
+    Methods are applied in the order given, to whole chunks at a time, the same way
+    Embedder.encode(augment=True) chains them for a single text.
+    """
+
+    def __init__(self, embedder, methods: Sequence[str] = METHODS, back_translator: Optional[BackTranslator] = None,
+                 workers: Optional[int] = None, chunk_size: int = 256, t5_batch_size: int = 32, seed: int = 0):
+        """
+        Args:
+            embedder: Embedder providing `preprocess` and the (lazily loaded) T5 paraphraser
+            methods: subset of METHODS, applied in order
+            back_translator: backend for "back_translate" (default: offline identity stand-in)
+            workers: processes for synonym replacement (default: CPU count)
+            chunk_size: records per chunk written to disk
+            t5_batch_size: sentences per T5 generate call
+            seed: base seed for synonym replacement
+        """
+        unknown = set(methods) - set(METHODS)
+        if unknown:
+            raise ValueError(f"Unknown augmentation methods {sorted(unknown)}, expected {METHODS}")
+        self.embedder = embedder
+        self.methods = list(methods)
+        self.back_translator = back_translator or IdentityBackTranslator()
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.t5_batch_size = t5_batch_size
+        self.seed = seed
+
+    def _augment_chunk(self, ids: List[str], texts: List[str], pool: Optional[ProcessPoolExecutor]) -> List[str]:
+        texts = [self.embedder.preprocess(t) for t in texts]
+        for method in self.methods:
+            if method == "synonym":
+                tasks = [(t, 2, _seed(self.seed, i)) for i, t in zip(ids, texts)]
+                if pool is None:
+                    texts = [_synonym_task(task) for task in tasks]
+                else:
+                    texts = list(pool.map(_synonym_task, tasks, chunksize=max(1, len(tasks) // (4 * self.workers))))
+            elif method == "back_translate":
+                texts = self.back_translator.back_translate_batch(texts)
+            elif method == "t5":
+                texts = self.embedder.paraphrase_t5_batch(texts, batch_size=self.t5_batch_size)
+        return texts
+
+    def run(self, records: Iterable[Tuple[str, str]], out_path: str,
+            progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+        """
+        Augment records not yet present in `out_path` and append them to it.
+
+        Args:
+            progress: called after every chunk with (records on disk, records in total)
+
+        Returns:
+            {"done": records already on disk, "added": records written by this run}
+        """
+        if os.path.exists(out_path):
+            _truncate_torn_line(out_path)  # appending after a torn line would corrupt the first new record
+        done = set(load_augmented(out_path)) if os.path.exists(out_path) else set()
+        todo = [(str(i), t) for i, t in records if str(i) not in done]
+        if "synonym" in self.methods:
+            from preprocessing import ensure_nltk
+            ensure_nltk("wordnet", "omw-1.4")  # before the workers start looking it up
+
+        os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+        pool = ProcessPoolExecutor(self.workers) if "synonym" in self.methods and self.workers > 1 else None
+        added = 0
+        try:
+            with open(out_path, "a", encoding="utf-8") as f:
+                for start in range(0, len(todo), self.chunk_size):
+                    chunk = todo[start:start + self.chunk_size]
+                    ids, texts = [i for i, _ in chunk], [t for _, t in chunk]
+                    augmented = self._augment_chunk(ids, texts, pool)
+                    for i, t, a in zip(ids, texts, augmented):
+                        f.write(json.dumps({"id": i, "text": t, "augmented": a, "methods": self.methods},
+                                           ensure_ascii=False) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())  # a finished chunk survives a crash
+                    added += len(chunk)
+                    if progress is not None:
+                        progress(len(done) + added, len(done) + len(todo))
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return {"done": len(done), "added": added}
+
+
+def _truncate_torn_line(path: str, block_size: int = 1 << 16):
+    """Cut the file back to its last newline, dropping a line an interrupted write left unfinished."""
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            start = max(0, pos - block_size)
+            f.seek(start)
+            cut = f.read(pos - start).rfind(b"\n")
+            if cut >= 0:
+                if start + cut + 1 < end:
+                    f.truncate(start + cut + 1)
+                return
+            pos = start
+        f.truncate(0)  # no complete line at all
+
+
+def load_augmented(path: str) -> Dict[str, str]:
+    """id -> augmented text. A truncated last line (interrupted write) is ignored."""
+    out = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            out[rec["id"]] = rec["augmented"]
+    return out
+
+
+def faq_records(faq_df) -> List[Tuple[str, str]]:
+    """(id, question) records for load_faq output; ids match build_document_store's faq_<idx>."""
+    return [(f"faq_{idx}", q) for idx, q in zip(faq_df.index, faq_df['question'])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--faq", required=True, help="conversationo.csv")
+    parser.add_argument("--out", default="models/augmented_faq.jsonl")
+    parser.add_argument("--methods", nargs="+", default=list(METHODS), choices=METHODS)
+    parser.add_argument("--back-translator", default="none", choices=list(BACK_TRANSLATORS))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--t5-batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    from data_loader import load_faq
+    from embedder import Embedder
+
+    records = faq_records(load_faq(args.faq))
+    translator = make_back_translator(args.back_translator) if "back_translate" in args.methods else None
+    pipeline = AugmentationPipeline(Embedder(), args.methods, translator, workers=args.workers,
+                                    chunk_size=args.chunk_size, t5_batch_size=args.t5_batch_size)
+    print(pipeline.run(records, args.out,
+                       progress=lambda n, total: print(f"augmented {n}/{total}", flush=True)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# batching.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching for concurrent callers.
+
+    Requests from any number of threads go into one queue. A worker thread takes the
+    first waiting request, keeps collecting for at most `max_wait_ms` (or until
+    `max_batch_size` requests are queued) and runs them through `fn` in a single call.
+    Each request gets its own Future, resolved with its slice of the batch output.
+
+    `fn` maps a list of inputs to a list of outputs of the same length. An exception
+    raised by `fn` is set on every future of that batch.
+    """
+
+    def __init__(self, fn: Callable[[List[Any]], Sequence[Any]], max_batch_size: int = 16,
+                 max_wait_ms: float = 10.0, name: str = "micro-batcher"):
+        """
+        Args:
+            fn: batched function, list of inputs -> list of outputs
+            max_batch_size: upper bound on inputs per `fn` call
+            max_wait_ms: how long the first request of a batch waits for company
+        """
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._counts = {"requests": 0, "batches": 0, "max_batch": 0}
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, item: Any) -> Future:
+        """Queue one input; the returned Future resolves to its output."""
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def submit_many(self, items: Sequence[Any]) -> List[Future]:
+        return [self.submit(item) for item in items]
+
+    def __call__(self, item: Any) -> Any:
+        """Blocking single-input call."""
+        return self.submit(item).result()
+
+    def map(self, items: Sequence[Any]) -> List[Any]:
+        """Blocking call for several inputs; they may be split across or merged into batches."""
+        return [f.result() for f in self.submit_many(items)]
+
+    def _collect(self) -> Optional[List[tuple]]:
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                nxt = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if nxt is None:
+                self._queue.put(None)  # finish this batch, stop on the next round
+                break
+            batch.append(nxt)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            # Skip requests whose caller already gave up
+            batch = [(item, f) for item, f in batch if f.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            with self._lock:
+                self._counts["requests"] += len(batch)
+                self._counts["batches"] += 1
+                self._counts["max_batch"] = max(self._counts["max_batch"], len(batch))
+            try:
+                outputs = self.fn([item for item, _ in batch])
+                if len(outputs) != len(batch):
+                    raise RuntimeError(f"batched function returned {len(outputs)} outputs for {len(batch)} inputs")
+            except Exception as e:
+                for _, f in batch:
+                    f.set_exception(e)
+                continue
+            for (_, f), out in zip(batch, outputs):
+                f.set_result(out)
+
+    def close(self, timeout: Optional[float] = None):
+        """Finish queued requests and stop the worker."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._worker.join(timeout)
+
+    def stats(self) -> Dict[str, float]:
+        """Counters plus the mean batch size."""
+        with self._lock:
+            counts = dict(self._counts)
+        counts["mean_batch"] = counts["requests"] / (counts["batches"] or 1)
+        return counts
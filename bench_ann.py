@@ -0,0 +1,111 @@
+# bench_ann.py
+"""
+Recall@k vs latency of the approximate FaissIndexer modes against the exact flat index.
+
+Corpora:
+  - synthetic: normalized low-rank random vectors of several sizes
+  - project (--project): this repo's document store, encoded with Embedder,
+    queried with the FAQ questions
+
+Queries are searched one at a time, as the retriever does, and latency is per query.
+
+Usage:
+    python bench_ann.py
+    python bench_ann.py --sizes 10000 100000 500000 --k 10
+    python bench_ann.py --project
+"""
+import argparse
+import time
+import numpy as np
+from typing import Dict, List, Tuple
+
+from indexer import FaissIndexer
+
+SWEEPS: Dict[str, List[Tuple[str, int]]] = {
+    "ivf_flat": [("nprobe", n) for n in (1, 4, 16, 32, 64, 128)],
+    "ivf_pq": [("nprobe", n) for n in (4, 16, 32, 64, 128)],
+    "hnsw": [("ef_search", e) for e in (16, 32, 64, 128)],
+}
+
+
+def synthetic_corpus(n: int, dim: int, n_queries: int, latent: int = 32, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Normalized vectors with a low intrinsic dimension, like sentence embeddings:
+    a random `latent`-dim signal projected up to `dim`, plus a little isotropic noise.
+    """
+    rng = np.random.default_rng(seed)
+    z = rng.standard_normal((n + n_queries, latent)).astype("float32")
+    proj = rng.standard_normal((latent, dim)).astype("float32")
+    x = z @ proj + 0.1 * np.sqrt(latent) * rng.standard_normal((n + n_queries, dim)).astype("float32")
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    return x[:n], x[n:]
+
+
+def project_corpus() -> Tuple[np.ndarray, np.ndarray]:
+    from data_loader import load_items, load_faq, load_orders, build_document_store
+    from embedder import Embedder
+    from embedding_cache import EmbeddingCache
+
+    base = "Dataset/Chat Bot Dataset/"
+    faq = load_faq(base + "conversationo.csv")
+    docs = build_document_store(load_items(base + "Item_to_id.csv"), faq, load_orders(base + "food.csv"))
+    embedder = Embedder(cache=EmbeddingCache())
+    vectors = embedder.encode([d["text"] for d in docs], normalize=True)
+    queries = embedder.encode(faq["question"].tolist(), normalize=True)
+    return vectors, queries
+
+
+def build(vectors: np.ndarray, index_type: str) -> Tuple[FaissIndexer, float]:
+    indexer = FaissIndexer(dim=vectors.shape[1], index_type=index_type)
+    start = time.perf_counter()
+    indexer.build(vectors, [{} for _ in range(len(vectors))])
+    return indexer, time.perf_counter() - start
+
+
+def run_queries(indexer: FaissIndexer, queries: np.ndarray, k: int, **params) -> Tuple[List[set], np.ndarray]:
+    hits, latencies = [], []
+    for q in queries:
+        start = time.perf_counter()
+        res = indexer.search(q.reshape(1, -1), top_k=k, **params)
+        latencies.append(time.perf_counter() - start)
+        hits.append({r["index"] for r in res})
+    return hits, np.array(latencies) * 1000
+
+
+def report(name: str, vectors: np.ndarray, queries: np.ndarray, k: int):
+    print(f"\n== {name}: {len(vectors)} docs, dim {vectors.shape[1]}, {len(queries)} queries, k={k}")
+    print(f"{'index':<10} {'param':<14} {'build s':>8} {'recall@k':>9} {'mean ms':>8} {'p95 ms':>8}")
+
+    flat, t_build = build(vectors, "flat")
+    truth, lat = run_queries(flat, queries, k)
+    print(f"{'flat':<10} {'-':<14} {t_build:>8.2f} {1.0:>9.3f} {lat.mean():>8.3f} {np.percentile(lat, 95):>8.3f}")
+
+    for index_type, sweep in SWEEPS.items():
+        indexer, t_build = build(vectors, index_type)
+        for param, value in sweep:
+            found, lat = run_queries(indexer, queries, k, **{param: value})
+            recall = np.mean([len(f & t) / max(1, len(t)) for f, t in zip(found, truth)])
+            print(f"{index_type:<10} {f'{param}={value}':<14} {t_build:>8.2f} {recall:>9.3f} "
+                  f"{lat.mean():>8.3f} {np.percentile(lat, 95):>8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--dim", type=int, default=384, help="all-MiniLM-L6-v2 output size")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--project", action="store_true", help="also benchmark this project's documents")
+    args = parser.parse_args()
+
+    if args.project:
+        vectors, queries = project_corpus()
+        report("project documents", vectors, queries, args.k)
+
+    for n in args.sizes:
+        vectors, queries = synthetic_corpus(n, args.dim, args.queries)
+        report("synthetic", vectors, queries, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# bench_document_store.py
+"""
+Benchmark for data_loader.build_document_store on synthetic menus and order histories.
+
+Compares the vectorized loader against the previous per-item implementation
+(which scanned the whole orders table for every menu item) and checks that both
+produce the same documents.
+
+Usage:
+    python bench_document_store.py
+    python bench_document_store.py --items 100000 --orders 5000000 --legacy-max-work 1e9
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+from data_loader import build_document_store, chunk_text, normalize, normalize_series
+
+
+def build_document_store_legacy(items_df, faq_df, orders_df, chunk_size: int = 200, overlap: int = 50) -> List[Dict]:
+    """The original O(items x orders) implementation, kept here for comparison."""
+    docs = []
+    for _, r in items_df.iterrows():
+        item_id = str(r['id'])
+        text = r['item']
+        meta = {"type": "item", "item_id": item_id, "item_name": r['item']}
+        order_row = orders_df[orders_df['id'].astype(str) == item_id]
+        if not order_row.empty:
+            meta['num_orders'] = int(order_row['times_appeared'].values[0])
+            meta['avg_rating'] = float(order_row['food_rating'].values[0])
+        else:
+            meta['num_orders'] = 0
+            meta['avg_rating'] = 0.0
+        docs.append({"id": f"item_{item_id}", "text": text, "meta": meta})
+
+    for idx, r in faq_df.iterrows():
+        qid = f"faq_{idx}"
+        full_text = r['question'] + " " + r['answer']
+        meta = {"type": "faq", "question": r['question'], "answer": r['answer']}
+        for i, chunk in enumerate(chunk_text(full_text, chunk_size=chunk_size, overlap=overlap)):
+            docs.append({"id": f"{qid}_{i}", "text": chunk, "meta": meta})
+    return docs
+
+
+def make_dataset(n_items: int, n_orders: int, n_faq: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    words = np.array(["Iced", "Latte", "Mocha", "Vanilla", "Chocolate", "Shake", "Sandwich",
+                      "Spicy", "Paneer", "Cold", "Coffee", "Tea", "Masala", "Avocado", "Wrap"])
+    names = [" ".join(rng.choice(words, size=3)) + f" {i}" for i in range(n_items)]
+    items = pd.DataFrame({"id": np.arange(1, n_items + 1), "name": names})
+    items['item'] = normalize_series(items['name'].astype(str))
+
+    # Order history: many rows per item, ids as floats like food.csv
+    orders = pd.DataFrame({
+        "id": rng.integers(1, int(n_items * 1.2) + 1, size=n_orders).astype(float),
+        "times_appeared": rng.integers(1, 500, size=n_orders).astype(float),
+        "food_rating": rng.integers(1, 6, size=n_orders).astype(float)
+    })
+
+    questions = [f"do u have {' '.join(rng.choice(words, size=2)).lower()} {i}" for i in range(n_faq)]
+    answers = [" ".join(rng.choice(words, size=rng.integers(5, 400))) for _ in range(n_faq)]
+    faq = pd.DataFrame({"question": [normalize(q) for q in questions], "answer": answers})
+    return items, faq, orders
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, nargs="+", default=[100, 1_000, 10_000, 100_000])
+    parser.add_argument("--orders", type=int, nargs="+", default=[10_000, 100_000, 1_000_000, 3_000_000])
+    parser.add_argument("--faq", type=int, default=1_000)
+    parser.add_argument("--legacy-max-work", type=float, default=2e7,
+                        help="skip the legacy loader when items x orders exceeds this (it is quadratic)")
+    args = parser.parse_args()
+
+    print(f"{'items':>8} {'orders':>10} {'docs':>9} {'vectorized s':>13} {'legacy s':>10} {'speedup':>8}")
+    for n_items in args.items:
+        for n_orders in args.orders:
+            items, faq, orders = make_dataset(n_items, n_orders, args.faq)
+            docs, t_new = timed(build_document_store, items, faq, orders)
+
+            if n_items * n_orders <= args.legacy_max_work:
+                legacy_docs, t_old = timed(build_document_store_legacy, items, faq, orders)
+                assert legacy_docs == docs, "vectorized loader diverged from the legacy one"
+                legacy, speedup = f"{t_old:10.3f}", f"{t_old / t_new:7.1f}x"
+            else:
+                legacy, speedup = f"{'-':>10}", f"{'-':>8}"
+
+            print(f"{n_items:>8} {n_orders:>10} {len(docs):>9} {t_new:>13.3f} {legacy} {speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# bench_inference.py
+"""
+CPU latency and output drift of the InferenceConfig options for each model component.
+
+For every option (fp32 / dynamic int8, for each --threads value) it reports:
+  - embedder:  ms per single query and per document batch; mean cosine to fp32 vectors
+  - reranker:  ms per rerank call (one query, --candidates texts); mean |score - fp32 score|
+               and how often the top-ranked text matches fp32
+  - generator: ms per answer; share of answers identical to the fp32 answer
+
+The reference for drift is the first option run (by default fp32 with the first
+--threads value). Inputs come from this repo's FAQ data.
+
+Usage:
+    python bench_inference.py
+    python bench_inference.py --components reranker generator --threads 1 4 --questions 20
+"""
+import argparse
+import time
+import numpy as np
+from typing import Callable, Dict, Tuple
+
+from inference import InferenceConfig
+
+BASE = "Dataset/Chat Bot Dataset/"
+
+
+def load_inputs(n_questions: int, n_candidates: int):
+    from data_loader import load_items, load_faq, load_orders, build_document_store
+
+    faq = load_faq(BASE + "conversationo.csv")
+    docs = build_document_store(load_items(BASE + "Item_to_id.csv"), faq, load_orders(BASE + "food.csv"))
+    questions = faq["question"].tolist()[:n_questions]
+    texts = [d["text"] for d in docs]
+    rng = np.random.default_rng(0)
+    candidates = [[texts[i] for i in rng.choice(len(texts), n_candidates, replace=False)] for _ in questions]
+    faq_docs = [d for d in docs if d["meta"]["type"] == "faq"]
+    contexts = [[faq_docs[i % len(faq_docs)]] for i in range(len(questions))]
+    return questions, texts, candidates, contexts
+
+
+def timed_ms(fn, *args) -> Tuple[object, float]:
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, (time.perf_counter() - start) * 1000
+
+
+def bench_embedder(config: InferenceConfig, questions, texts, ref):
+    from embedder import Embedder
+
+    embedder = Embedder(inference=config)  # no cache: every encode hits the model
+    embedder.encode(questions[:2])  # warm-up
+    lat = [timed_ms(embedder.encode, [q])[1] for q in questions]
+    doc_vecs, batch_ms = timed_ms(embedder.encode, texts)
+    drift = "-" if ref is None else f"cos {np.mean(np.sum(doc_vecs * ref, axis=1)):.4f}"
+    return f"{np.mean(lat):8.2f} ms/query {batch_ms:9.1f} ms/{len(texts)} docs  {drift}", doc_vecs
+
+
+def bench_reranker(config: InferenceConfig, questions, candidates, ref):
+    from reranker import Reranker
+
+    reranker = Reranker(inference=config)
+    reranker.score_pairs([(questions[0], candidates[0][0])])  # warm-up
+    scores, lat = [], []
+    for q, cands in zip(questions, candidates):
+        s, ms = timed_ms(reranker.score_pairs, [(q, c) for c in cands])
+        scores.append(s)
+        lat.append(ms)
+    scores = np.array(scores)
+    if ref is None:
+        drift = "-"
+    else:
+        top1 = np.mean(np.argmax(scores, axis=1) == np.argmax(ref, axis=1))
+        drift = f"|Δscore| {np.abs(scores - ref).mean():.4f}  top-1 agree {top1:.0%}"
+    return f"{np.mean(lat):8.2f} ms/call  {drift}", scores
+
+
+def bench_generator(config: InferenceConfig, questions, contexts, ref):
+    from generator import Generator
+
+    generator = Generator(device=-1, inference=config)
+    prompts = [generator.craft_prompt(q, ctx) for q, ctx in zip(questions, contexts)]
+    generator.generate(prompts[0])  # warm-up
+    answers, lat = [], []
+    for p in prompts:
+        a, ms = timed_ms(generator.generate, p)
+        answers.append(a)
+        lat.append(ms)
+    drift = "-" if ref is None else f"identical answers {np.mean([a == b for a, b in zip(answers, ref)]):.0%}"
+    return f"{np.mean(lat):8.1f} ms/answer  {drift}", answers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--components", nargs="+", default=["embedder", "reranker", "generator"],
+                        choices=["embedder", "reranker", "generator"])
+    parser.add_argument("--presets", nargs="+", default=["fp32", "int8"], choices=["fp32", "int8"])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--candidates", type=int, default=10)
+    args = parser.parse_args()
+
+    questions, texts, candidates, contexts = load_inputs(args.questions, args.candidates)
+    runs: Dict[str, Callable] = {
+        "embedder": lambda cfg, ref: bench_embedder(cfg, questions, texts, ref),
+        "reranker": lambda cfg, ref: bench_reranker(cfg, questions, candidates, ref),
+        "generator": lambda cfg, ref: bench_generator(cfg, questions, contexts, ref),
+    }
+
+    for component in args.components:
+        print(f"\n== {component}")
+        ref = None
+        for threads in args.threads:
+            for preset in args.presets:
+                config = InferenceConfig.preset(preset, num_threads=threads)
+                line, out = runs[component](config, ref)
+                if ref is None:
+                    ref = out  # first option is the drift reference
+                print(f"{preset:<5} threads={threads:<3} {line}")
+
+
+if __name__ == "__main__":
+    main()
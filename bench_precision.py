@@ -0,0 +1,123 @@
+# bench_precision.py
+"""
+Accuracy and memory of reduced-precision embedding storage against float32.
+
+  - FAISS: "flat" (float32) vs "sq_fp16" and "sq8" scalar-quantizer indexes
+  - recommender: float32 item matrix vs QuantizedMatrix "float16" and "int8"
+
+For each option it reports the stored size and the top-k overlap with the float32
+results (1.0 = same documents), plus the mean absolute score error.
+
+Corpora:
+  - project (default): this repo's document store encoded with Embedder, queried
+    with the FAQ questions; recommender queried with preference strings
+  - synthetic (--synthetic N): low-rank random vectors, for machines without the models
+
+Usage:
+    python bench_precision.py
+    python bench_precision.py --k 5
+    python bench_precision.py --synthetic 100000
+"""
+import argparse
+import faiss
+import numpy as np
+from typing import List, Tuple
+
+from indexer import FaissIndexer
+from quantization import QuantizedMatrix
+
+PREFERENCES = [
+    "spicy", "vegetarian", "sweet dessert", "cold coffee", "something light", "chocolate",
+    "healthy breakfast", "cheesy snack", "iced tea", "budget meal", "popular", "fruity shake",
+    "hot drink", "vegan", "sandwich", "pastry",
+]
+
+
+def overlap(a: np.ndarray, b: np.ndarray) -> float:
+    """Mean |top-k(a) ∩ top-k(b)| / k over query rows."""
+    return float(np.mean([len(set(x) & set(y)) / max(1, len(y)) for x, y in zip(a, b)]))
+
+
+def faiss_report(vectors: np.ndarray, queries: np.ndarray, k: int):
+    print(f"\n== FAISS: {len(vectors)} vectors, dim {vectors.shape[1]}, {len(queries)} queries, k={k}")
+    print(f"{'index':<10} {'MB':>8} {'x smaller':>10} {'overlap@k':>10} {'score err':>10}")
+    ref_scores, ref_idx, ref_bytes = None, None, None
+    for index_type in ("flat", "sq_fp16", "sq8"):
+        indexer = FaissIndexer(dim=vectors.shape[1], index_type=index_type)
+        indexer.build(vectors, [{} for _ in range(len(vectors))])
+        scores, idx = indexer.search_positions(queries, top_k=k)
+        size = faiss.serialize_index(indexer.index).nbytes
+        if ref_idx is None:
+            ref_scores, ref_idx, ref_bytes = scores, idx, size
+        print(f"{index_type:<10} {size / 2**20:>8.2f} {ref_bytes / size:>10.1f} {overlap(idx, ref_idx):>10.3f} "
+              f"{np.abs(scores - ref_scores).mean():>10.5f}")
+
+
+def matrix_report(vectors: np.ndarray, queries: np.ndarray, bias: np.ndarray, k: int, alpha: float = 0.5):
+    """Recommender-style scoring: alpha * cosine + popularity/rating bias."""
+    print(f"\n== recommender matrix: {len(vectors)} items, {len(queries)} queries, k={k}")
+    print(f"{'precision':<10} {'MB':>8} {'x smaller':>10} {'overlap@k':>10} {'score err':>10}")
+    ref_scores, ref_top, ref_bytes = None, None, None
+    for precision in ("float32", "float16", "int8"):
+        matrix = QuantizedMatrix(vectors, precision)
+        scores = alpha * matrix.dot(queries) + bias
+        top = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        if ref_top is None:
+            ref_scores, ref_top, ref_bytes = scores, top, matrix.nbytes
+        print(f"{precision:<10} {matrix.nbytes / 2**20:>8.2f} {ref_bytes / matrix.nbytes:>10.1f} "
+              f"{overlap(top, ref_top):>10.3f} {np.abs(scores - ref_scores).mean():>10.5f}")
+
+
+def recommender_report(docs, embedder, vectors: np.ndarray, k: int):
+    from recommender import SimpleRecommender
+
+    print(f"\n== SimpleRecommender: {len(PREFERENCES)} preference strings, k={k}")
+    print(f"{'precision':<10} {'MB':>8} {'overlap@k':>10} {'score err':>10}")
+    ref = None
+    for precision in ("float32", "float16", "int8"):
+        rec = SimpleRecommender(docs, embedder, doc_embeddings=vectors, precision=precision)
+        results = rec.recommend_batch(PREFERENCES, k=k)
+        names = [[r['meta'].get('item_name') for r in row] for row in results]
+        scores = np.array([[r['score'] for r in row] for row in results])
+        if ref is None:
+            ref = (names, scores)
+        print(f"{precision:<10} {rec.item_embeddings.nbytes / 2**20:>8.3f} {overlap(names, ref[0]):>10.3f} "
+              f"{np.abs(np.sort(scores, axis=1) - np.sort(ref[1], axis=1)).mean():>10.5f}")
+
+
+def project_data() -> Tuple[list, object, np.ndarray, List[str]]:
+    from data_loader import load_items, load_faq, load_orders, build_document_store
+    from embedder import Embedder
+    from embedding_cache import EmbeddingCache
+
+    base = "Dataset/Chat Bot Dataset/"
+    faq = load_faq(base + "conversationo.csv")
+    docs = build_document_store(load_items(base + "Item_to_id.csv"), faq, load_orders(base + "food.csv"))
+    embedder = Embedder(cache=EmbeddingCache())
+    vectors = embedder.encode([d["text"] for d in docs], normalize=True)
+    return docs, embedder, vectors, faq["question"].tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--synthetic", type=int, default=0, help="use N synthetic vectors instead of the project data")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        from bench_ann import synthetic_corpus
+        vectors, queries = synthetic_corpus(args.synthetic, args.dim, args.queries)
+        faiss_report(vectors, queries, args.k)
+        bias = 0.5 * np.random.default_rng(1).random(len(vectors)).astype("float32")
+        matrix_report(vectors, queries, bias, args.k)
+        return
+
+    docs, embedder, vectors, questions = project_data()
+    faiss_report(vectors, embedder.encode(questions, normalize=True), args.k)
+    recommender_report(docs, embedder, vectors, min(args.k, 5))
+
+
+if __name__ == "__main__":
+    main()
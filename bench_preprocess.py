@@ -0,0 +1,104 @@
+# bench_preprocess.py
+"""
+Throughput of Embedder preprocessing: the previous per-call implementation against
+preprocessing.TextPreprocessor (token and text caches, bulk mode).
+
+Scenarios:
+  - corpus:  a list of documents with the duplication of a real document store
+             (legacy loop vs cold preprocess_many, serial and parallel)
+  - queries: a stream of short queries where popular questions repeat
+             (legacy per query vs cached preprocess)
+
+Both implementations are checked to produce identical output.
+
+Usage:
+    python bench_preprocess.py
+    python bench_preprocess.py --docs 200000 --queries 50000 --workers 8
+"""
+import argparse
+import re
+import time
+import numpy as np
+from typing import List
+
+from preprocessing import TextPreprocessor
+
+WORDS = ("iced latte mocha vanilla chocolate shake sandwich spicy paneer cold coffee tea masala avocado "
+         "wrap do you have what are the opening hours is there vegan option how much does cost can i "
+         "order online delivery available weekends timings open close served fresh breakfast lunch "
+         "dinner dishes drinks desserts cookies cakes muffins brownies pastries sugar free gluten").split()
+
+
+def preprocess_legacy(text: str, stop_words, lemmatizer) -> str:
+    """Embedder.preprocess before the caches: regex compiled on every call, every token lemmatized."""
+    text = text.lower()
+    text = re.sub(r'[^a-z0-9\s]', '', text)
+    tokens = text.split()
+    tokens = [lemmatizer.lemmatize(t) for t in tokens if t not in stop_words]
+    return ' '.join(tokens)
+
+
+def make_texts(n: int, n_unique: int, min_words: int, max_words: int, seed: int) -> List[str]:
+    """n texts drawn with a Zipf-like popularity from n_unique distinct texts."""
+    rng = np.random.default_rng(seed)
+    unique = []
+    for i in range(n_unique):
+        words = rng.choice(WORDS, size=rng.integers(min_words, max_words + 1))
+        unique.append(" ".join(words).capitalize() + f"? #{i}")
+    popularity = 1.0 / np.arange(1, n_unique + 1)
+    picks = rng.choice(n_unique, size=n, p=popularity / popularity.sum())
+    return [unique[i] for i in picks]
+
+
+def rate(n: int, seconds: float) -> str:
+    return f"{n / seconds:>12,.0f} texts/s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=50_000)
+    parser.add_argument("--doc-unique", type=float, default=0.8,
+                        help="size of the document pool to draw from, as a fraction of --docs")
+    parser.add_argument("--queries", type=int, default=20_000)
+    parser.add_argument("--query-unique", type=int, default=2_000)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    engine = TextPreprocessor()
+    stop_words, lemmatizer = engine.stop_words, engine.lemmatizer  # load NLTK data outside the timings
+    lemmatizer.lemmatize("warmup")
+
+    docs = make_texts(args.docs, max(1, int(args.docs * args.doc_unique)), 8, 60, seed=0)
+    queries = make_texts(args.queries, args.query_unique, 3, 12, seed=1)
+
+    print(f"== corpus: {len(docs)} documents, {len(set(docs))} distinct")
+    start = time.perf_counter()
+    legacy = [preprocess_legacy(t, stop_words, lemmatizer) for t in docs]
+    t_legacy = time.perf_counter() - start
+    print(f"{'legacy':<28} {t_legacy:>8.2f} s {rate(len(docs), t_legacy)}")
+
+    for name, workers, parallel_min in (("preprocess_many serial", 1, 0), ("preprocess_many parallel", args.workers, 0)):
+        fresh = TextPreprocessor(stop_words=stop_words, lemmatizer=lemmatizer)
+        start = time.perf_counter()
+        out = fresh.preprocess_many(docs, workers=workers, parallel_min=parallel_min)
+        t = time.perf_counter() - start
+        assert out == legacy, f"{name} diverged from the legacy preprocessing"
+        print(f"{name:<28} {t:>8.2f} s {rate(len(docs), t)} {t_legacy / t:>6.1f}x")
+
+    print(f"\n== queries: {len(queries)} queries, {len(set(queries))} distinct")
+    start = time.perf_counter()
+    legacy = [preprocess_legacy(q, stop_words, lemmatizer) for q in queries]
+    t_legacy = time.perf_counter() - start
+    print(f"{'legacy':<28} {t_legacy:>8.2f} s {rate(len(queries), t_legacy)}")
+
+    fresh = TextPreprocessor(stop_words=stop_words, lemmatizer=lemmatizer)
+    start = time.perf_counter()
+    out = [fresh.preprocess(q) for q in queries]
+    t = time.perf_counter() - start
+    assert out == legacy, "cached preprocessing diverged from the legacy preprocessing"
+    print(f"{'preprocess (cached)':<28} {t:>8.2f} s {rate(len(queries), t)} {t_legacy / t:>6.1f}x")
+    print(f"cache: {fresh.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
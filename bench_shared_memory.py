@@ -0,0 +1,142 @@
+# bench_shared_memory.py
+"""
+Resident memory per worker process with the shared files memory-mapped vs read into each
+process's heap.
+
+A synthetic corpus (menu-item documents with low-rank embeddings and random-word texts)
+is saved once in the on-disk formats used by the workers: FAISS index + MetadataStore,
+SparseIndex posting arrays, and the recommender's QuantizedMatrix. Then 1, 4, 16, ...
+worker processes each load them ("heap": mmap=False, "mmap": mmap=True), run searches
+that touch every page, and report while all of them are alive:
+
+  - RSS per worker: pages resident in the worker, shared or not
+  - PSS per worker: shared pages divided by the number of processes mapping them
+  - total PSS: what the workers together really cost the node
+
+Usage:
+    python bench_shared_memory.py
+    python bench_shared_memory.py --docs 200000 --workers 1 4 16 --modes mmap
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from typing import Dict, List
+
+WORDS = [f"w{i}" for i in range(3000)]
+
+
+def memory_kb() -> Dict[str, int]:
+    """Rss / Pss (anonymous and file-backed) of this process, from /proc."""
+    out = {}
+    with open("/proc/self/smaps_rollup", "r") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if name in ("Rss", "Pss", "Pss_Anon", "Pss_File"):
+                out[name] = int(rest.split()[0])
+    return out
+
+
+def build_corpus(path: str, n_docs: int, dim: int, precision: str):
+    from bench_ann import synthetic_corpus
+    from indexer import FaissIndexer
+    from meta_store import MetadataStore
+    from sparse_index import SparseIndex
+    from quantization import QuantizedMatrix
+
+    vectors, _ = synthetic_corpus(n_docs, dim, 1)
+    rng = np.random.default_rng(0)
+    texts = [" ".join(rng.choice(WORDS, 12)) for _ in range(n_docs)]
+    docs = [{"id": f"item_{i}", "text": t,
+             "meta": {"type": "item", "item_id": str(i), "item_name": t[:20], "num_orders": 0, "avg_rating": 0.0}}
+            for i, t in enumerate(texts)]
+
+    indexer = FaissIndexer(dim=dim, index_path=os.path.join(path, "faiss.index"), meta_path=os.path.join(path, "meta"))
+    indexer.build(vectors, MetadataStore.from_docs(docs))
+    indexer.save()
+    SparseIndex(texts).save(os.path.join(path, "sparse"))
+    QuantizedMatrix(vectors, precision).save(os.path.join(path, "recommender"))
+
+
+def worker(path: str, mode: str, dim: int):
+    """Load everything, search, report "ready", then wait for the parent to ask for memory."""
+    from indexer import FaissIndexer
+    from sparse_index import SparseIndex
+    from quantization import QuantizedMatrix
+
+    mmap = mode == "mmap"
+    indexer = FaissIndexer(dim=dim, index_path=os.path.join(path, "faiss.index"), meta_path=os.path.join(path, "meta"))
+    indexer.load(mmap=mmap)
+    sparse = SparseIndex.load(os.path.join(path, "sparse"), mmap=mmap)
+    matrix = QuantizedMatrix.load(os.path.join(path, "recommender"), mmap=mmap)
+
+    # Flat scans and a full matrix product read every page of the vectors
+    rng = np.random.default_rng(os.getpid())
+    queries = rng.standard_normal((8, dim)).astype("float32")
+    indexer.search_positions(queries, top_k=10)
+    matrix.dot(queries)
+    sparse.search_batch([" ".join(rng.choice(WORDS, 3)) for _ in range(8)], k=10)
+    for i in range(0, len(indexer.store), max(1, len(indexer.store) // 100)):
+        indexer.store.meta(i)
+
+    print("ready", flush=True)
+    sys.stdin.readline()
+    print(json.dumps(memory_kb()), flush=True)
+
+
+def run_workers(path: str, mode: str, n: int, dim: int) -> List[Dict[str, int]]:
+    procs = [subprocess.Popen([sys.executable, __file__, "--worker", path, "--mode", mode, "--dim", str(dim)],
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True) for _ in range(n)]
+    try:
+        for p in procs:
+            if p.stdout.readline().strip() != "ready":
+                raise RuntimeError(f"worker {p.pid} failed to start")
+        # Everyone is loaded and alive: shared pages are now split across all of them
+        for p in procs:
+            p.stdin.write("measure\n")
+            p.stdin.flush()
+        return [json.loads(p.stdout.readline()) for p in procs]
+    finally:
+        for p in procs:
+            p.stdin.close()
+            p.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--precision", default="float32", choices=["float32", "float16", "int8"],
+                        help="recommender matrix storage")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--modes", nargs="+", default=["heap", "mmap"], choices=["heap", "mmap"])
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.mode, args.dim)
+        return
+
+    with tempfile.TemporaryDirectory() as path:
+        start = time.perf_counter()
+        build_corpus(path, args.docs, args.dim, args.precision)
+        size = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+        print(f"corpus: {args.docs} docs, dim {args.dim}, {size / 2**20:.1f} MB on disk "
+              f"(built in {time.perf_counter() - start:.1f}s)\n")
+        print(f"{'mode':<6} {'workers':>7} {'RSS/worker':>11} {'PSS/worker':>11} {'anon':>8} {'file':>8} {'total PSS':>10}")
+        for mode in args.modes:
+            for n in args.workers:
+                stats = run_workers(path, mode, n, args.dim)
+                mean = {k: np.mean([s[k] for s in stats]) / 1024 for k in stats[0]}
+                total = sum(s["Pss"] for s in stats) / 1024
+                print(f"{mode:<6} {n:>7} {mean['Rss']:>9.1f}MB {mean['Pss']:>9.1f}MB {mean['Pss_Anon']:>6.1f}MB "
+                      f"{mean['Pss_File']:>6.1f}MB {total:>8.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
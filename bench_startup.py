@@ -0,0 +1,90 @@
+# bench_startup.py
+"""
+Startup cost of each component: wall time and resident memory for importing its module
+and constructing it.
+
+Every component is measured in a fresh interpreter, so imports and model loads of
+one component do not make the next one look cheap. RSS is read from /proc (Linux);
+elsewhere the peak RSS from getrusage is reported instead.
+
+Usage:
+    python bench_startup.py
+    python bench_startup.py --components embedder embedder+augment --repeat 3
+"""
+import argparse
+import json
+import subprocess
+import sys
+from typing import Dict, Tuple
+
+# name -> (import statement, construction statement)
+COMPONENTS: Dict[str, Tuple[str, str]] = {
+    "embedder": ("from embedder import Embedder", "obj = Embedder()"),
+    "embedder+augment": ("from embedder import Embedder",
+                         "obj = Embedder(); obj.t5_model; obj.translator; obj.lemmatizer; obj.stop_words"),
+    "reranker": ("from reranker import Reranker", "obj = Reranker()"),
+    "generator": ("from generator import Generator", "obj = Generator()"),
+    "faiss index": ("from indexer import FaissIndexer", "obj = FaissIndexer(dim=384); obj.load()"),
+}
+
+CHILD = r'''
+import json, sys, time
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+out = {"base_mb": rss_mb()}
+try:
+    start = time.perf_counter()
+    exec(IMPORT)
+    out["import_s"] = time.perf_counter() - start
+    out["import_mb"] = rss_mb() - out["base_mb"]
+    start = time.perf_counter()
+    exec(CONSTRUCT)
+    out["construct_s"] = time.perf_counter() - start
+    out["construct_mb"] = rss_mb() - out["base_mb"] - out["import_mb"]
+except Exception as e:
+    out["error"] = f"{type(e).__name__}: {e}"
+print(json.dumps(out))
+'''
+
+
+def measure(import_stmt: str, construct_stmt: str) -> Dict[str, float]:
+    code = f"IMPORT = {import_stmt!r}\nCONSTRUCT = {construct_stmt!r}\n" + CHILD
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    lines = [l for l in proc.stdout.splitlines() if l.startswith("{")]
+    if not lines:
+        return {"error": (proc.stderr.strip().splitlines() or ["no output"])[-1]}
+    return json.loads(lines[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--components", nargs="+", default=list(COMPONENTS), choices=list(COMPONENTS))
+    parser.add_argument("--repeat", type=int, default=1, help="runs per component; the fastest is reported")
+    args = parser.parse_args()
+
+    print(f"{'component':<18} {'import s':>9} {'import MB':>10} {'construct s':>12} {'construct MB':>13} {'total MB':>9}")
+    for name in args.components:
+        runs = [measure(*COMPONENTS[name]) for _ in range(args.repeat)]
+        ok = [r for r in runs if "error" not in r]
+        if not ok:
+            print(f"{name:<18} failed: {runs[-1]['error']}")
+            continue
+        best = min(ok, key=lambda r: r["import_s"] + r["construct_s"])
+        total = best["import_mb"] + best["construct_mb"]
+        print(f"{name:<18} {best['import_s']:>9.2f} {best['import_mb']:>10.1f} "
+              f"{best['construct_s']:>12.2f} {best['construct_mb']:>13.1f} {total:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,77 +1,66 @@
 # cli.py
-from data_loader import load_items, load_faq, load_orders, build_document_store
 from embedder import Embedder
-from indexer import FaissIndexer
-from retriever import HybridRetriever
+from embedding_cache import EmbeddingCache
+from hot_reload import build_snapshot
 from reranker import Reranker
 from generator import Generator
-from recommender import SimpleRecommender
+from metrics import PrometheusMetrics
+from pipeline import CafeBot
 import json
 
-def main():
-    # Load data
-    items = load_items(r"C:\\Users\\KIIT\\OneDrive\\Desktop\\Chat Bot\\Dataset\\Chat Bot Dataset\\Item_to_id.csv")
-    faq = load_faq(r"C:\\Users\\KIIT\\OneDrive\\Desktop\\Chat Bot\\Dataset\\Chat Bot Dataset\\conversationo.csv")
-    orders = load_orders(r"C:\\Users\\KIIT\\OneDrive\\Desktop\\Chat Bot\\Dataset\\Chat Bot Dataset\\food.csv")
-    docs = build_document_store(items, faq, orders)
+# Dataset paths
+ITEMS_PATH = r"C:\\Users\\KIIT\\OneDrive\\Desktop\\Chat Bot\\Dataset\\Chat Bot Dataset\\Item_to_id.csv"
+FAQ_PATH = r"C:\\Users\\KIIT\\OneDrive\\Desktop\\Chat Bot\\Dataset\\Chat Bot Dataset\\conversationo.csv"
+ORDERS_PATH = r"C:\\Users\\KIIT\\OneDrive\\Desktop\\Chat Bot\\Dataset\\Chat Bot Dataset\\food.csv"
 
-    # Initialize embedder
-    embedder = Embedder()
-    texts = [d['text'] for d in docs]
-    vectors = embedder.encode(texts, normalize=True)
+def main():
+    # Initialize embedder (cached on disk, so restarts only encode changed texts)
+    embedder = Embedder(cache=EmbeddingCache())
 
-    # Build and save FAISS index
-    indexer = FaissIndexer(dim=vectors.shape[1])
-    indexer.build(vectors, [d['meta'] for d in docs])
-    indexer.save()
+    # Load data, the FAISS index (patched or rebuilt only if the data changed) and the
+    # dataset-dependent components: retriever, recommender, FAQ fast path, answer cache
+    snapshot = build_snapshot(embedder, {"items": ITEMS_PATH, "faq": FAQ_PATH, "orders": ORDERS_PATH})
+    print(f"FAISS index {snapshot.status} ({snapshot.indexer.index.ntotal} vectors)")
 
-    # Initialize retriever, reranker, generator, recommender
-    retriever = HybridRetriever(docs, embedder, indexer)
-    reranker = Reranker()
-    generator = Generator()
-    recommender = SimpleRecommender(docs, embedder)
+    # Same question-answering pipeline as the Streamlit app
+    metrics = PrometheusMetrics()
+    bot = CafeBot(embedder, Reranker(), Generator(), snapshot, metrics=metrics)
 
     print("CafeBot ready. Type 'quit' to exit. Use 'recommend: <prefs>' for suggestions.")
 
     while True:
         q = input("You: ").strip()
         if q.lower() in ("quit", "exit"):
+            for name, stats in bot.stats().items():
+                print(f"{name}:", json.dumps(stats))
+            print("Stages:", json.dumps(metrics.summary(), indent=2))
+            bot.close()
             break
 
         if q.lower().startswith("recommend:"):
             pref = q.split(":", 1)[1].strip()
-            recs = recommender.recommend(pref, k=5)
+            recs = bot.recommend(pref, k=5)
             print("Recommended items:")
             for r in recs:
                 print(r['meta'].get('item_name', "Unknown"), "score:", round(r['score'], 3))
             continue
 
-        # Normal QA flow
-        candidates = retriever.hybrid_search(q, k=8)
-
-        # Attach texts to candidates
-        for c in candidates:
-            idx = c.get('index')
-            if idx is not None and 0 <= idx < len(docs):
-                c['text'] = docs[idx]['text']
-            else:
-                c['text'] = ""
+        turn = bot.retrieve(q)
+        if turn.answer is None:
+            # Stream the answer as it is decoded: the customer sees the first words right away
+            print("Bot:", end=" ", flush=True)
+            for piece in bot.stream(turn):
+                print(piece, end="", flush=True)
+            print()
+        else:
+            print("Bot:", turn.answer)
 
-        if not candidates:
-            print("Bot: Sorry, I couldn't find relevant information.")
+        if turn.source in ("faq", "none"):
             continue
 
-        # Rerank
-        candidates = reranker.rerank(q, candidates)
-
-        # Generate answer using top 4 candidates
-        prompt = generator.craft_prompt(q, candidates[:4])
-        answer = generator.generate(prompt)
-        print("Bot:", answer)
-
         # Show top sources
         print("--- Sources ---")
-        for c in candidates[:3]:
+        for c in turn.context[:3]:
             print(json.dumps(c['meta'], ensure_ascii=False, indent=2))
 
 
@@ -9,6 +9,15 @@ def normalize(text: str) -> str:
     text = re.sub(r'\s+', ' ', text)
     return text.strip()
 
+def normalize_series(s: pd.Series) -> pd.Series:
+    """Vectorized `normalize` over a whole column of strings."""
+    return (
+        s.str.lower()
+         .str.replace(' u ', ' you ', regex=False)
+         .str.replace(r'\s+', ' ', regex=True)
+         .str.strip()
+    )
+
 # --- Text chunking utility ---
 def chunk_text(text: str, chunk_size: int = 200, overlap: int = 50) -> List[str]:
     """
@@ -26,17 +35,17 @@ def chunk_text(text: str, chunk_size: int = 200, overlap: int = 50) -> List[str]
 
 def load_items(path="C:\\Users\\KIIT\\OneDrive\\Desktop\\Chat Bot\\Dataset\\Chat Bot Dataset\\Item_to_id.csv"):
     df = pd.read_csv(path)
-    df['item'] = df['name'].astype(str).apply(normalize)
+    df['item'] = normalize_series(df['name'].astype(str))
     return df
 
 
 def load_faq(path="C:\\Users\\KIIT\\OneDrive\\Desktop\\Chat Bot\\Dataset\\Chat Bot Dataset\\conversationo.csv"):
     df = pd.read_csv(path)
-    df['question'] = df['Question'].astype(str).apply(normalize)
+    df['question'] = normalize_series(df['Question'].astype(str))
     df['answer'] = df['answer'].astype(str)
 
     # Deduplicate FAQs: keep the longest answer for duplicate questions
-    df['answer_len'] = df['answer'].apply(len)
+    df['answer_len'] = df['answer'].str.len()
     df = df.sort_values('answer_len', ascending=False)
     df = df.drop_duplicates(subset=['question'], keep='first')
     df.drop(columns=['answer_len'], inplace=True)
@@ -53,31 +62,41 @@ def load_orders(path="C:\\Users\\KIIT\\OneDrive\\Desktop\\Chat Bot\\Dataset\\Cha
 def build_document_store(items_df, faq_df, orders_df, chunk_size: int = 200, overlap: int = 50) -> List[Dict]:
     docs = []
 
-    # --- Menu items ---
-    for _, r in items_df.iterrows():
-        item_id = str(r['id'])
-        text = r['item']
-        meta = {"type": "item", "item_id": item_id, "item_name": r['item']}
-
-        # Join with orders
-        order_row = orders_df[orders_df['id'].astype(str) == item_id]
-        if not order_row.empty:
-            meta['num_orders'] = int(order_row['times_appeared'].values[0])
-            meta['avg_rating'] = float(order_row['food_rating'].values[0])
-        else:
-            meta['num_orders'] = 0
-            meta['avg_rating'] = 0.0
-
-        docs.append({"id": f"item_{item_id}", "text": text, "meta": meta})
+    # --- Menu items: one left merge with orders instead of a scan per item ---
+    items = pd.DataFrame({
+        "item_id": items_df['id'].astype(str).to_numpy(),
+        "item": items_df['item'].to_numpy()
+    })
+    # First order row per id wins, as before; dedupe before the (slow) string cast
+    orders = orders_df[['id', 'times_appeared', 'food_rating']].drop_duplicates(subset=['id'], keep='first')
+    orders = pd.DataFrame({
+        "item_id": orders['id'].astype(str).to_numpy(),
+        "num_orders": orders['times_appeared'].to_numpy(),
+        "avg_rating": orders['food_rating'].to_numpy()
+    })
+
+    joined = items.merge(orders, on='item_id', how='left', sort=False)
+    num_orders = joined['num_orders'].fillna(0).astype('int64').tolist()
+    avg_rating = joined['avg_rating'].fillna(0.0).astype('float64').tolist()
+
+    docs.extend(
+        {
+            "id": f"item_{item_id}",
+            "text": name,
+            "meta": {"type": "item", "item_id": item_id, "item_name": name,
+                     "num_orders": n, "avg_rating": rating}
+        }
+        for item_id, name, n, rating in zip(joined['item_id'].tolist(), joined['item'].tolist(), num_orders, avg_rating)
+    )
 
     # --- FAQs (now chunked) ---
-    for idx, r in faq_df.iterrows():
+    full_texts = (faq_df['question'] + " " + faq_df['answer']).tolist()
+    for idx, question, answer, full_text in zip(faq_df.index, faq_df['question'].tolist(),
+                                                faq_df['answer'].tolist(), full_texts):
         qid = f"faq_{idx}"
-        full_text = r['question'] + " " + r['answer']
-        meta = {"type": "faq", "question": r['question'], "answer": r['answer']}
+        meta = {"type": "faq", "question": question, "answer": answer}
 
         chunks = chunk_text(full_text, chunk_size=chunk_size, overlap=overlap)
-        for i, chunk in enumerate(chunks):
-            docs.append({"id": f"{qid}_{i}", "text": chunk, "meta": meta})
+        docs.extend({"id": f"{qid}_{i}", "text": chunk, "meta": meta} for i, chunk in enumerate(chunks))
 
     return docs
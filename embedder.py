@@ -1,52 +1,89 @@
 # embedder.py
 from sentence_transformers import SentenceTransformer
 import numpy as np
-from typing import List, Union
-import nltk
-from nltk.corpus import stopwords, wordnet
-from nltk.stem import WordNetLemmatizer
-import re
+from functools import cached_property
+from typing import List, Optional, Union
+from nltk.corpus import wordnet
 import random
-from googletrans import Translator
-from transformers import T5ForConditionalGeneration, T5Tokenizer
 import torch
+from embedding_cache import EmbeddingCache
+from preprocessing import TextPreprocessor, ensure_nltk
+from inference import InferenceConfig
 
-# Download required NLTK resources (run once)
-nltk.download('stopwords')
-nltk.download('wordnet')
-nltk.download('omw-1.4')
+# Bump whenever `preprocess` changes its output, so cached embeddings are not reused
+PREPROCESS_VERSION = "v1"
 
 class Embedder:
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2", device: str = "cpu"):
-        self.model = SentenceTransformer(model_name, device=device)
-        self.stop_words = set(stopwords.words('english'))
-        self.lemmatizer = WordNetLemmatizer()
-        self.translator = Translator()
-        
-        # Load T5 for paraphrasing
+    """
+    Sentence embedder with text preprocessing and optional augmentation.
+
+    Only the SentenceTransformer is loaded up front. NLTK data, the T5 paraphraser and
+    the translator are loaded on first use, so serving processes (which never augment)
+    do not pay for them.
+    """
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", device: str = "cpu",
+                 cache: Optional[EmbeddingCache] = None, inference: Optional[InferenceConfig] = None):
+        self.model_name = model_name
+        self.device = device
+        self.inference = inference or InferenceConfig()
+        self.model = self.inference.optimize(SentenceTransformer(model_name, device=device))
+        self.cache = cache
+        self.preprocessor = TextPreprocessor()  # memoized; NLTK data loads on first use
         self.t5_model_name = "t5-small"
-        self.t5_tokenizer = T5Tokenizer.from_pretrained(self.t5_model_name)
-        self.t5_model = T5ForConditionalGeneration.from_pretrained(self.t5_model_name)
-        self.t5_device = torch.device(device if torch.cuda.is_available() else "cpu")
-        self.t5_model.to(self.t5_device)
+
+    # -------------------- Lazily loaded components --------------------
+    @property
+    def stop_words(self) -> frozenset:
+        return self.preprocessor.stop_words
+
+    @property
+    def lemmatizer(self):
+        return self.preprocessor.lemmatizer
+
+    @cached_property
+    def translator(self):
+        from googletrans import Translator
+        return Translator()
+
+    @cached_property
+    def _t5(self):
+        # Load T5 for paraphrasing
+        from transformers import T5ForConditionalGeneration, T5Tokenizer
+        tokenizer = T5Tokenizer.from_pretrained(self.t5_model_name)
+        model = T5ForConditionalGeneration.from_pretrained(self.t5_model_name)
+        t5_device = torch.device(self.device if torch.cuda.is_available() else "cpu")
+        model.to(t5_device)
+        return tokenizer, model, t5_device
+
+    @property
+    def t5_tokenizer(self):
+        return self._t5[0]
+
+    @property
+    def t5_model(self):
+        return self._t5[1]
+
+    @property
+    def t5_device(self):
+        return self._t5[2]
 
     # -------------------- Preprocessing --------------------
     def preprocess(self, text: str) -> str:
-        # Lowercase and remove non-alphanumeric characters
-        text = text.lower()
-        text = re.sub(r'[^a-z0-9\s]', '', text)
-        
-        # Tokenize, remove stopwords, lemmatize
-        tokens = text.split()
-        tokens = [self.lemmatizer.lemmatize(t) for t in tokens if t not in self.stop_words]
-        return ' '.join(tokens)
-    
+        """Lowercase, strip non-alphanumerics, drop stopwords, lemmatize (cached per text and token)."""
+        return self.preprocessor.preprocess(text)
+
+    def preprocess_many(self, texts: List[str]) -> List[str]:
+        """Bulk `preprocess`: duplicates once, large corpora in parallel chunks."""
+        return self.preprocessor.preprocess_many(texts)
+
     # -------------------- Augmentation Methods --------------------
     def synonym_replacement(self, sentence: str, n: int = 2) -> str:
         words = sentence.split()
         if not words:
             return sentence
         new_words = words.copy()
+        ensure_nltk("wordnet", "omw-1.4")
         random_words = random.sample(words, min(n, len(words)))
         for word in random_words:
             synonyms = wordnet.synsets(word)
@@ -78,6 +115,59 @@ class Embedder:
         paraphrased = self.t5_tokenizer.decode(outputs[0], skip_special_tokens=True)
         return paraphrased
 
+    def paraphrase_t5_batch(self, sentences: List[str], max_length: int = 64, batch_size: int = 32,
+                            num_beams: int = 5) -> List[str]:
+        """Batched `paraphrase_t5`: one padded generate call per `batch_size` sentences."""
+        out = []
+        for start in range(0, len(sentences), batch_size):
+            texts = ["paraphrase: " + s + " </s>" for s in sentences[start:start + batch_size]]
+            encoding = self.t5_tokenizer(texts, return_tensors="pt", padding=True).to(self.t5_device)
+            with torch.no_grad():
+                outputs = self.t5_model.generate(
+                    input_ids=encoding['input_ids'],
+                    attention_mask=encoding['attention_mask'],
+                    max_length=max_length,
+                    num_beams=num_beams,
+                    num_return_sequences=1
+                )
+            out.extend(self.t5_tokenizer.batch_decode(outputs, skip_special_tokens=True))
+        return out
+
+    @property
+    def dim(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    # -------------------- Embedding Cache --------------------
+    def cache_namespace(self) -> str:
+        """Everything besides the raw text that determines an embedding."""
+        namespace = f"{self.model_name}|preprocess={PREPROCESS_VERSION}|stopwords=english|lemmatizer=wordnet"
+        if self.inference.quantize:
+            namespace += f"|{self.inference.tag}"  # quantized vectors differ, keep them apart
+        return namespace
+
+    def _encode_cached(self, texts: List[str], batch_size: int) -> np.ndarray:
+        """Encode through the on-disk cache: only texts never seen before hit the model."""
+        namespace = self.cache_namespace()
+        keys = [EmbeddingCache.make_key(namespace, t) for t in texts]
+        found = self.cache.get_many(keys)
+
+        # Unique misses only (FAQ chunks and repeated items share text)
+        missing = {}
+        for k, t in zip(keys, texts):
+            if k not in found and k not in missing:
+                missing[k] = t
+
+        if missing:
+            processed = self.preprocess_many(list(missing.values()))
+            with self.inference.context():
+                new_emb = self.model.encode(processed, batch_size=batch_size, show_progress_bar=True)
+            new_emb = np.asarray(new_emb, dtype='float32')
+            fresh = dict(zip(missing.keys(), new_emb))
+            self.cache.put_many(fresh.items())
+            found.update(fresh)
+
+        return np.stack([found[k] for k in keys]).astype('float32')
+
     # -------------------- Main Encode Method --------------------
     def encode(
         self,
@@ -93,11 +183,16 @@ class Embedder:
         
         if augment and augment_methods is None:
             augment_methods = ['synonym', 'back_translate', 't5']
+
+        # Augmentation is random, so only deterministic encodes go through the cache
+        if self.cache is not None and not augment and texts:
+            emb = self._encode_cached(texts, batch_size)
+            if normalize:
+                emb = self._normalize(emb)
+            return emb
         
         processed_texts = []
-        for t in texts:
-            t_proc = self.preprocess(t)
-            
+        for t_proc in self.preprocess_many(texts):
             if augment:
                 for method in augment_methods:
                     if method == 'synonym':
@@ -110,12 +205,17 @@ class Embedder:
             processed_texts.append(t_proc)
         
         # Encode
-        emb = self.model.encode(processed_texts, batch_size=batch_size, show_progress_bar=True)
+        with self.inference.context():
+            emb = self.model.encode(processed_texts, batch_size=batch_size, show_progress_bar=True)
         emb = np.array(emb, dtype='float32')
         
         if normalize:
-            norms = np.linalg.norm(emb, axis=1, keepdims=True)
-            norms[norms == 0] = 1
-            emb = emb / norms
+            emb = self._normalize(emb)
         
         return emb
+
+    @staticmethod
+    def _normalize(emb: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(emb, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return emb / norms
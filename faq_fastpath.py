@@ -0,0 +1,111 @@
+# faq_fastpath.py
+import re
+import threading
+import numpy as np
+from typing import Any, Dict, Optional
+
+from data_loader import normalize
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_WS_RE = re.compile(r"\s+")
+_MISSING = {"", "nan", "none"}
+
+
+class FAQFastPath:
+    """
+    Answers FAQ questions directly, bypassing retrieval, reranking and generation.
+
+    Tiers:
+      1. exact: hash lookup of the normalized question (lowercase, 'u' -> 'you',
+         punctuation and extra whitespace removed)
+      2. semantic (optional, needs an embedder): the closest FAQ question by embedding
+         cosine similarity, if it is at least `threshold`
+
+    Hit/miss counters are available through `stats()`.
+    """
+
+    def __init__(self, faq_df, embedder=None, threshold: float = 0.92):
+        """
+        Args:
+            faq_df: output of load_faq (already deduplicated by normalized question)
+            embedder: Embedder for the semantic tier; None disables it
+            threshold: minimum cosine similarity for a semantic match
+        """
+        self.answers: Dict[str, str] = {}
+        self.questions: Dict[str, str] = {}  # key -> original normalized question
+        for question, answer in zip(faq_df['question'].tolist(), faq_df['answer'].tolist()):
+            key = self.key(str(question))
+            if key.strip() in _MISSING or str(answer).strip().lower() in _MISSING:
+                continue  # rows without a usable question or answer
+            if key not in self.answers:
+                self.answers[key] = answer
+                self.questions[key] = question
+
+        self.embedder = embedder
+        self.threshold = threshold
+        self._keys = list(self.answers.keys())
+        self.question_embeddings = None
+        if embedder is not None and self._keys:
+            self.question_embeddings = embedder.encode([self.questions[k] for k in self._keys], normalize=True)
+
+        self._lock = threading.Lock()
+        self._counts = {"queries": 0, "exact": 0, "semantic": 0, "miss": 0}
+
+    @staticmethod
+    def key(text: str) -> str:
+        """Normalization shared by the index and the lookups."""
+        text = normalize(text)
+        text = _PUNCT_RE.sub(" ", text)
+        return _WS_RE.sub(" ", text).strip()
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self._counts["queries"] += 1
+            self._counts[outcome] += 1
+
+    def lookup(self, query: str, q_emb: Optional[np.ndarray] = None) -> Optional[Dict[str, Any]]:
+        """
+        Args:
+            query: raw user question
+            q_emb: precomputed normalized query embedding, shape (1, dim) or (dim,), to skip encoding
+
+        Returns:
+            {"answer", "question", "match": "exact"|"semantic", "score", "meta"} or None on a miss
+        """
+        key = self.key(query)
+        answer = self.answers.get(key)
+        if answer is not None:
+            self._count("exact")
+            return self._hit(key, "exact", 1.0)
+
+        if self.question_embeddings is not None and key:
+            if q_emb is None:
+                q_emb = self.embedder.encode([query], normalize=True)
+            sims = self.question_embeddings @ np.asarray(q_emb, dtype="float32").reshape(-1)
+            best = int(np.argmax(sims))
+            if sims[best] >= self.threshold:
+                self._count("semantic")
+                return self._hit(self._keys[best], "semantic", float(sims[best]))
+
+        self._count("miss")
+        return None
+
+    def _hit(self, key: str, match: str, score: float) -> Dict[str, Any]:
+        question, answer = self.questions[key], self.answers[key]
+        return {
+            "answer": answer,
+            "question": question,
+            "match": match,
+            "score": score,
+            "meta": {"type": "faq", "question": question, "answer": answer}
+        }
+
+    def stats(self) -> Dict[str, float]:
+        """Counters plus hit rates for the exact and semantic tiers."""
+        with self._lock:
+            counts = dict(self._counts)
+        total = counts["queries"] or 1
+        counts["exact_rate"] = counts["exact"] / total
+        counts["semantic_rate"] = counts["semantic"] / total
+        counts["hit_rate"] = (counts["exact"] + counts["semantic"]) / total
+        return counts
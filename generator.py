@@ -1,14 +1,22 @@
 # generator.py
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
+from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, TextIteratorStreamer, pipeline
+import threading
 import torch
-from typing import List, Dict, Optional, Union
+from typing import List, Dict, Iterator, Optional, Tuple, Union
+from batching import MicroBatcher
+from inference import InferenceConfig
 
 class Generator:
     """
     Wrapper around a seq2seq model (e.g., FLAN-T5) for controlled response generation.
     """
 
-    def __init__(self, model_name: str = "google/flan-t5-small", device: Optional[Union[int, str]] = None):
+    def __init__(self, model_name: str = "google/flan-t5-small", device: Optional[Union[int, str]] = None,
+                 inference: Optional[InferenceConfig] = None):
+        """
+        Args:
+            inference: CPU inference settings (quantization, threads); default eager float32
+        """
         # Determine device
         if device is None:
             device = 0 if torch.cuda.is_available() else -1
@@ -20,6 +28,8 @@ class Generator:
 
         if device != -1:
             self.model = self.model.to(device)
+        self.inference = inference or InferenceConfig()
+        self.model = self.inference.optimize(self.model)
 
         self.pipe = pipeline(
             "text2text-generation",
@@ -27,6 +37,28 @@ class Generator:
             tokenizer=self.tokenizer,
             device=device
         )
+        self.batcher = None
+
+    def enable_batching(self, max_batch_size: int = 8, max_wait_ms: float = 20.0):
+        """
+        Coalesce prompts from concurrent `generate` calls into shared batched pipeline
+        calls (see batching.MicroBatcher).
+        """
+        if self.batcher is None:
+            self.batcher = MicroBatcher(self._generate_requests, max_batch_size=max_batch_size,
+                                        max_wait_ms=max_wait_ms, name="generate-batcher")
+
+    def _generate_requests(self, requests: List[Tuple[str, int, int]]) -> List[str]:
+        """Batch function: (prompt, max_length, num_beams) requests, grouped by settings."""
+        outputs: List[Optional[str]] = [None] * len(requests)
+        groups: Dict[Tuple[int, int], List[int]] = {}
+        for i, (_, max_length, num_beams) in enumerate(requests):
+            groups.setdefault((max_length, num_beams), []).append(i)
+        for (max_length, num_beams), idx in groups.items():
+            texts = self.generate_batch([requests[i][0] for i in idx], max_length=max_length, num_beams=num_beams)
+            for i, text in zip(idx, texts):
+                outputs[i] = text
+        return outputs
 
     def craft_prompt(self, query: str, retrieved_docs: List[Dict], user_pref: Optional[str] = None) -> str:
         """
@@ -60,12 +92,65 @@ class Generator:
     def generate(self, prompt: str, max_length: int = 150, temperature: float = 0.2, num_beams: int = 3) -> str:
         """
         Generate a response given a prompt.
+        With batching enabled, the prompt shares a pipeline call with concurrent requests.
         """
-        out = self.pipe(
-            prompt,
-            max_length=max_length,
-            do_sample=False,  # deterministic output
-            num_beams=num_beams
-        )[0]["generated_text"]
+        if self.batcher is not None:
+            return self.batcher((prompt, max_length, num_beams))
+
+        with self.inference.context():
+            out = self.pipe(
+                prompt,
+                max_length=max_length,
+                do_sample=False,  # deterministic output
+                num_beams=num_beams
+            )[0]["generated_text"]
 
         return out
+
+    def generate_batch(self, prompts: List[str], max_length: int = 150, num_beams: int = 3) -> List[str]:
+        """
+        Generate responses for several prompts in one padded forward pass per decoding step.
+        """
+        if not prompts:
+            return []
+        with self.inference.context():
+            outs = self.pipe(
+                list(prompts),
+                max_length=max_length,
+                do_sample=False,  # deterministic output
+                num_beams=num_beams,
+                batch_size=len(prompts)
+            )
+        # One result per prompt; older pipelines wrap each in a single-element list
+        return [(o[0] if isinstance(o, list) else o)["generated_text"] for o in outs]
+
+    def generate_stream(self, prompt: str, max_length: int = 150) -> Iterator[str]:
+        """
+        Generate a response given a prompt, yielding text pieces as they are decoded.
+
+        Beam search only knows the final sequence once every beam is finished, so
+        streaming decodes greedily (still deterministic, do_sample=False).
+        """
+        inputs = self.tokenizer(prompt, return_tensors="pt", truncation=True).to(self.model.device)
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        error = []
+
+        def run():
+            try:
+                with self.inference.context():
+                    self.model.generate(**inputs, streamer=streamer, max_length=max_length,
+                                        do_sample=False, num_beams=1)
+            except Exception as e:  # surface it in the caller instead of blocking the streamer
+                error.append(e)
+                streamer.end()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            for piece in streamer:
+                if piece:
+                    yield piece
+        finally:
+            thread.join()
+        if error:
+            raise error[0]
@@ -0,0 +1,219 @@
+# hot_reload.py
+import os
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from data_loader import load_items, load_faq, load_orders, build_document_store
+from index_manifest import load_or_build_index
+from meta_store import doc_texts
+from retriever import HybridRetriever
+from sparse_index import SparseIndex
+from recommender import SimpleRecommender
+from faq_fastpath import FAQFastPath
+from menu_lookup import MenuLookup
+from answer_cache import SemanticAnswerCache
+
+
+class Snapshot:
+    """
+    Everything that depends on the dataset, built together: document store, FAISS index,
+    sparse index (inside the retriever), recommender, FAQ fast path, menu lookup and answer
+    cache. Models (embedder, reranker, generator) are shared across snapshots.
+
+    Nothing is modified after the build except the recommender's popularity and ratings,
+    which take streamed orders through SnapshotManager.ingest_orders (published
+    copy-on-write, see SimpleRecommender.ingest_orders).
+    """
+
+    def __init__(self, version: int, status: str, docs, faq, indexer, retriever, recommender,
+                 faq_fastpath, answer_cache, menu_lookup=None):
+        self.version = version
+        self.status = status  # how the FAISS index was obtained: "loaded", "updated" or "rebuilt"
+        self.docs = docs
+        self.faq = faq
+        self.indexer = indexer
+        self.retriever = retriever
+        self.recommender = recommender
+        self.faq_fastpath = faq_fastpath
+        self.answer_cache = answer_cache
+        self.menu_lookup = menu_lookup
+        self.created = time.time()
+
+
+def build_snapshot(embedder, data_paths: Dict[str, str], version: int = 0,
+                   index_kwargs: Optional[Dict[str, Any]] = None, shared_dir: Optional[str] = "models") -> Snapshot:
+    """
+    Load the CSVs and bring every dataset-dependent component up to date.
+
+    The FAISS index goes through `load_or_build_index`: the build manifest is diffed
+    against the new documents, only added or changed documents are embedded (and the
+    embedding cache makes unchanged texts free), and the index is patched in place
+    when possible. The sparse index is refitted when any text changed, since its IDF
+    weights are global.
+
+    With `shared_dir`, the sparse index and the recommender's item matrix are saved
+    under it and memory-mapped, like the FAISS index and the document store: worker
+    processes map the same files instead of each holding a copy. Each file set is
+    checked and written under a lock file in its directory (meta_store.file_lock), so
+    when the data changes only the first worker to take the lock rebuilds it; the
+    others find it up to date and map it.
+    """
+    items = load_items(data_paths["items"])
+    faq = load_faq(data_paths["faq"])
+    orders = load_orders(data_paths["orders"])
+    docs = build_document_store(items, faq, orders)
+
+    indexer, status = load_or_build_index(docs, embedder, data_paths, **(index_kwargs or {}))
+    docs = indexer.store  # columnar document store shared by every component
+
+    sparse, rec_path = None, None
+    if shared_dir is not None:
+        sparse = SparseIndex.load_or_build(doc_texts(docs), os.path.join(shared_dir, "sparse"))
+        rec_path = os.path.join(shared_dir, "recommender")
+
+    return Snapshot(
+        version=version,
+        status=status,
+        docs=docs,
+        faq=faq,
+        indexer=indexer,
+        retriever=HybridRetriever(docs, embedder, indexer, sparse=sparse),
+        recommender=SimpleRecommender.from_indexer(docs, embedder, indexer, cache_path=rec_path),
+        faq_fastpath=FAQFastPath(faq, embedder),
+        answer_cache=SemanticAnswerCache(indexer=indexer),
+        menu_lookup=MenuLookup(docs, faq),
+    )
+
+
+class SnapshotManager:
+    """
+    Keeps the current Snapshot and replaces it when the dataset files change.
+
+    Requests read `manager.current` once and use that snapshot throughout, so a reload
+    never mixes old and new components inside one request. A reload builds the new
+    snapshot next to the live one and swaps the reference; requests still holding the
+    old snapshot finish on it. If a reload fails (e.g. a half-written CSV), the current
+    snapshot stays and the error is kept in `last_error`.
+
+    Orders streamed through `ingest_orders` are kept per item_id and replayed into the
+    new snapshot's recommender before the swap, so a menu or FAQ edit does not reset
+    popularity and ratings to the CSV values. They are dropped when the orders CSV
+    itself changes: whoever rewrites it is expected to have persisted them there.
+    """
+
+    def __init__(self, embedder, data_paths: Dict[str, str], index_kwargs: Optional[Dict[str, Any]] = None,
+                 interval: float = 30.0, shared_dir: Optional[str] = "models",
+                 builder: Optional[Callable[..., Snapshot]] = None):
+        """
+        Args:
+            embedder: Embedder shared by all snapshots
+            data_paths: {"items", "faq", "orders"} CSV paths
+            index_kwargs: extra arguments for load_or_build_index (paths, index_params)
+            interval: seconds between file checks of the watcher thread
+            shared_dir: where the memory-mapped sparse index and item matrix live (see build_snapshot)
+            builder: snapshot factory with build_snapshot's signature (default build_snapshot)
+        """
+        self.embedder = embedder
+        self.data_paths = dict(data_paths)
+        self.index_kwargs = index_kwargs or {}
+        self.interval = interval
+        self.shared_dir = shared_dir
+        self.builder = builder or build_snapshot
+        self.last_error: Optional[str] = None
+        self._reload_lock = threading.Lock()  # one reload at a time
+        self._orders_lock = threading.Lock()  # ingestion vs. replay + swap
+        self._ingested: Dict[str, List[float]] = {}  # item_id -> [orders, rated orders, rating sum]
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+        self._stamp = self._file_stamp()
+        self._current = self.builder(embedder, self.data_paths, 0, self.index_kwargs, self.shared_dir)
+
+    @property
+    def current(self) -> Snapshot:
+        return self._current
+
+    def _file_stamp(self) -> Tuple:
+        """Cheap change check: (path, mtime, size) of every data file."""
+        stamp = []
+        for name, path in sorted(self.data_paths.items()):
+            try:
+                st = os.stat(path)
+                stamp.append((name, st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append((name, None, None))
+        return tuple(stamp)
+
+    def reload(self) -> Snapshot:
+        """Build a snapshot from the current files and swap it in."""
+        with self._reload_lock:
+            stamp = self._file_stamp()
+            snapshot = self.builder(self.embedder, self.data_paths, self._current.version + 1, self.index_kwargs,
+                                    self.shared_dir)
+            with self._orders_lock:
+                if self._orders_stamp(stamp) != self._orders_stamp(self._stamp):
+                    self._ingested.clear()  # new orders CSV: it already holds the streamed orders
+                elif self._ingested:
+                    snapshot.recommender.ingest_orders(self._replay_events())
+                self._stamp = stamp
+                self._current = snapshot  # single reference assignment: atomic for readers
+            self.last_error = None
+            return snapshot
+
+    # -------------------- Streamed orders --------------------
+    def ingest_orders(self, events: Iterable[Tuple[str, Optional[float]]]) -> Dict[str, int]:
+        """
+        Apply (item_id, rating) order events to the current snapshot's recommender and keep
+        them for the snapshots built by later reloads. Returns ingest_orders' counts.
+        """
+        events = list(events)
+        with self._orders_lock:
+            result = self._current.recommender.ingest_orders(events)
+            for item_id, rating in events:
+                totals = self._ingested.setdefault(str(item_id), [0, 0, 0.0])
+                totals[0] += 1
+                if rating is not None:
+                    totals[1] += 1
+                    totals[2] += float(rating)
+        return result
+
+    def _replay_events(self) -> List[Tuple[str, Optional[float]]]:
+        """Events with the same per-item counts and rating means as everything ingested."""
+        events = []
+        for item_id, (orders, rated, rating_sum) in self._ingested.items():
+            if rated:
+                events.extend([(item_id, rating_sum / rated)] * rated)
+            events.extend([(item_id, None)] * (orders - rated))
+        return events
+
+    @staticmethod
+    def _orders_stamp(stamp: Tuple):
+        return [entry for entry in stamp if entry[0] == "orders"]
+
+    def check(self) -> Optional[Snapshot]:
+        """Reload if any data file changed since the last build; returns the new snapshot or None."""
+        if self._file_stamp() == self._stamp:
+            return None
+        try:
+            return self.reload()
+        except Exception:
+            self.last_error = traceback.format_exc()
+            return None
+
+    # -------------------- Watcher thread --------------------
+    def start_watching(self):
+        if self._watcher is None or not self._watcher.is_alive():
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch, name="snapshot-watcher", daemon=True)
+            self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            self.check()
@@ -0,0 +1,156 @@
+# index_manifest.py
+import hashlib
+import json
+import os
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+from indexer import FaissIndexer
+from meta_store import MetadataStore, file_lock, write_atomic
+
+MANIFEST_VERSION = 2
+
+
+def fingerprint_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's bytes."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def fingerprint_text(text: str) -> str:
+    """Hash of the text a document is embedded from."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class BuildManifest:
+    """
+    Record of what the saved FAISS index was built from:
+      - the embedder namespace (model name + preprocessing settings)
+      - the FAISS index configuration (type, nlist, ...)
+      - a fingerprint of every source CSV
+      - a hash of every document's text, keyed by document id
+    """
+
+    def __init__(self, model: str, index: Dict[str, Any], data: Dict[str, str], docs: Dict[str, str]):
+        self.model = model
+        self.index = index
+        self.data = data
+        self.docs = docs
+
+    @classmethod
+    def load(cls, path: str) -> Optional["BuildManifest"]:
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        if raw.get("version") != MANIFEST_VERSION:
+            return None
+        return cls(raw["model"], raw["index"], raw["data"], raw["docs"])
+
+    def save(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        raw = json.dumps({"version": MANIFEST_VERSION, "model": self.model, "index": self.index,
+                          "data": self.data, "docs": self.docs}).encode("utf-8")
+        write_atomic(path, lambda f: f.write(raw))  # never leave a half-written manifest behind
+
+    @staticmethod
+    def invalidate(path: str):
+        """Remove the manifest before its files are rewritten: an interrupted save means a rebuild."""
+        if os.path.exists(path):
+            os.remove(path)
+
+    def diff(self, doc_hashes: Dict[str, str]) -> Tuple[List[str], List[str]]:
+        """
+        Compare against the current document hashes.
+
+        Returns:
+            (remove_ids, add_ids): ids whose old vectors must go, and ids that need (re-)encoding
+        """
+        remove_ids = [d for d, h in self.docs.items() if doc_hashes.get(d) != h]
+        add_ids = [d for d, h in doc_hashes.items() if self.docs.get(d) != h]
+        return remove_ids, add_ids
+
+
+def load_or_build_index(
+    docs: List[Dict[str, Any]],
+    embedder,
+    data_paths: Dict[str, str],
+    index_path: str = "models/faiss.index",
+    meta_path: str = "models/meta",
+    manifest_path: str = "models/manifest.json",
+    index_params: Optional[Dict[str, Any]] = None
+) -> Tuple[FaissIndexer, str]:
+    """
+    Warm-start the FAISS index for a document store.
+
+    - Nothing changed (same embedder, same CSV fingerprints): load the saved index.
+    - Some documents changed: remove/add only those vectors, then save.
+    - Otherwise (no saved index, different embedder or index type): full rebuild, then save.
+
+    The whole check-and-write runs under a lock file next to the manifest (see
+    meta_store.file_lock), so processes sharing the files never load a half-replaced
+    set, and after a data change only the first one rebuilds.
+
+    Args:
+        docs: output of build_document_store, or a MetadataStore built from it
+        embedder: Embedder used for the vectors
+        data_paths: {"items": ..., "faq": ..., "orders": ...} source CSV paths
+        index_params: extra FaissIndexer arguments (index_type, nlist, nprobe, ...)
+
+    Returns:
+        (indexer, status) where status is "loaded", "updated" or "rebuilt".
+        `indexer.store` is the document store to share with the retriever and recommender.
+    """
+    model = embedder.cache_namespace()
+    data = {name: fingerprint_file(path) for name, path in sorted(data_paths.items())}
+    doc_ids = [d["id"] for d in docs]
+    doc_hashes = {d["id"]: fingerprint_text(d["text"]) for d in docs}
+    store = docs if isinstance(docs, MetadataStore) else MetadataStore.from_docs(docs)
+
+    # Workers sharing these files take turns: one rebuilds, the others then load its result
+    with file_lock(os.path.dirname(manifest_path)):
+        indexer = FaissIndexer(dim=embedder.dim, index_path=index_path, meta_path=meta_path, **(index_params or {}))
+        index_config = indexer.config()
+        manifest = BuildManifest.load(manifest_path)
+        if manifest is not None and (manifest.model != model or manifest.index != index_config):
+            manifest = None
+
+        if manifest is not None:
+            try:
+                # Unchanged data is served from the mapped files; a patch needs a writable copy
+                indexer.load(mmap=manifest.data == data)
+            except FileNotFoundError:
+                manifest = None
+
+        if manifest is not None:
+            if manifest.data == data:
+                return indexer, "loaded"
+
+            remove_ids, add_ids = manifest.diff(doc_hashes)
+            text_of = {d["id"]: d["text"] for d in docs}
+            if add_ids:
+                add_vectors = embedder.encode([text_of[d] for d in add_ids], normalize=True)
+            else:
+                add_vectors = np.zeros((0, indexer.dim), dtype="float32")
+            try:
+                indexer.update(store, doc_ids, remove_ids, add_ids, add_vectors)
+            except RuntimeError:
+                pass  # index could not be patched in place, fall through to a full rebuild
+            else:
+                BuildManifest.invalidate(manifest_path)
+                indexer.save()
+                BuildManifest(model, index_config, data, doc_hashes).save(manifest_path)
+                indexer.load()  # serve from the mapped files, like the workers that only load them
+                return indexer, "updated"
+
+        vectors = embedder.encode([d["text"] for d in docs], normalize=True)
+        indexer.build(vectors, store, doc_ids)
+        BuildManifest.invalidate(manifest_path)
+        indexer.save()
+        BuildManifest(model, index_config, data, doc_hashes).save(manifest_path)
+        indexer.load()
+        return indexer, "rebuilt"
@@ -1,46 +1,315 @@
 # indexer.py
 import faiss
+import hashlib
 import numpy as np
 import pickle
 import os
-from typing import List, Dict, Any
+import json
+import tempfile
+from typing import List, Dict, Any, Optional, Sequence, Union
+from meta_store import MetadataStore, write_atomic
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq", "sq8", "sq_fp16")
+# Scalar quantizer per reduced-precision flat index type (sq8 learns per-dimension ranges at build time)
+SCALAR_QUANTIZERS = {"sq8": faiss.ScalarQuantizer.QT_8bit, "sq_fp16": faiss.ScalarQuantizer.QT_fp16}
+# Index types that keep the original vectors (no quantization, no inverted lists)
+EXACT_INDEX_TYPES = ("flat", "hnsw")
+# Read flag for memory-mapped loading: FAISS >= 1.9 maps vector codes, HNSW storage and IVF
+# lists straight from the file (no copy); older versions can only map IVF lists
+MMAP_FLAG = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
 
 class FaissIndexer:
-    def __init__(self, dim: int, index_path: str = "models/faiss.index", meta_path: str = "models/meta.pkl"):
+    """
+    FAISS index over normalized document embeddings (inner product = cosine similarity).
+
+    index_type:
+      - "flat":     exact brute-force scan (default)
+      - "ivf_flat": inverted lists over k-means cells; `nprobe` cells are scanned per query
+      - "hnsw":     graph index; `ef_search` controls the candidate list size per query
+      - "ivf_pq":   inverted lists with product-quantized vectors (smallest, lossy)
+      - "sq_fp16":  exact scan over float16 vectors (half the memory, near-lossless)
+      - "sq8":      exact scan over int8 scalar-quantized vectors (a quarter of the memory)
+
+    IVF and sq8 indexes are trained on the vectors passed to `build`. When `nlist` is None it is
+    derived from the corpus size.
+    """
+
+    def __init__(self, dim: int, index_path: str = "models/faiss.index", meta_path: str = "models/meta",
+                 index_type: str = "flat", nlist: Optional[int] = None, nprobe: int = 8,
+                 hnsw_m: int = 32, ef_construction: int = 80, ef_search: int = 64,
+                 pq_m: int = 48, pq_nbits: int = 8):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index_type {index_type!r}, expected one of {INDEX_TYPES}")
         self.dim = dim
         self.index_path = index_path
         self.meta_path = meta_path
-        self.index = faiss.IndexFlatIP(dim)  # inner product on normalized vectors = cosine similarity
-        self.metadata: List[Dict[str, Any]] = []  # parallel list of metadata dicts
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.pq_m = pq_m
+        self.pq_nbits = pq_nbits
+        self.index = self._new_index()
+        self.store = MetadataStore.from_docs([])  # columnar texts + metadata, shared with retriever/recommender
+        self.metadata = self.store.metas  # parallel sequence of metadata dicts
+        self.doc_ids: List[str] = []  # parallel list of document ids
+        # FAISS id -> position in metadata, as sorted ids + positions for vectorized lookup
+        self._sorted_fids = np.zeros(0, dtype="int64")
+        self._sorted_pos = np.zeros(0, dtype="int64")
+        self.version = 0  # bumped whenever the indexed documents change (caches key on it)
+        self.mapped = False  # index read from a memory-mapped file: searchable, not updatable
+
+    def config(self) -> Dict[str, Any]:
+        """Settings that determine the index structure (persisted alongside it)."""
+        # Query-time knobs (nprobe, ef_search) are deliberately left out: they can change freely
+        return {
+            "index_type": self.index_type, "nlist": self.nlist, "hnsw_m": self.hnsw_m,
+            "ef_construction": self.ef_construction, "pq_m": self.pq_m, "pq_nbits": self.pq_nbits
+        }
+
+    def _new_index(self, n_train: int = 0):
+        # The ID map keys vectors by document id, so single documents can be added/removed later.
+        return faiss.IndexIDMap2(self._new_base_index(n_train))
+
+    def _new_base_index(self, n_train: int):
+        metric = faiss.METRIC_INNER_PRODUCT
+        if self.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(self.dim, self.hnsw_m, metric)
+            index.hnsw.efConstruction = self.ef_construction
+            index.hnsw.efSearch = self.ef_search
+            return index
+        if self.index_type in SCALAR_QUANTIZERS:
+            # Flat scan over compact codes: 2 (fp16) or 4 (int8) times less memory than float32
+            return faiss.IndexScalarQuantizer(self.dim, SCALAR_QUANTIZERS[self.index_type], metric)
+        if self.index_type in ("ivf_flat", "ivf_pq") and n_train > 0:
+            # k-means wants ~39 training points per cell
+            nlist = self.nlist or int(4 * np.sqrt(n_train))
+            nlist = max(1, min(nlist, n_train // 39 or 1))
+            quantizer = faiss.IndexFlatIP(self.dim)
+            if self.index_type == "ivf_flat":
+                index = faiss.IndexIVFFlat(quantizer, self.dim, nlist, metric)
+            else:
+                # m must divide dim; each sub-quantizer's k-means (2**nbits centroids) also
+                # wants ~39 training points per centroid
+                m = max(d for d in range(1, min(self.pq_m, self.dim) + 1) if self.dim % d == 0)
+                nbits = max(1, min(self.pq_nbits, int(np.log2(max(n_train // 39, 2)))))
+                index = faiss.IndexIVFPQ(quantizer, self.dim, nlist, m, nbits, metric)
+            index.nprobe = self.nprobe
+            return index
+        # Inner product on normalized vectors = cosine similarity
+        return faiss.IndexFlatIP(self.dim)
+
+    @staticmethod
+    def faiss_id(doc_id: str) -> int:
+        """Stable non-negative 63-bit FAISS id for a document id."""
+        digest = hashlib.sha1(doc_id.encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "little") & 0x7FFFFFFFFFFFFFFF
+
+    def _faiss_ids(self, doc_ids: Sequence[str]) -> np.ndarray:
+        return np.array([self.faiss_id(d) for d in doc_ids], dtype="int64")
+
+    def _reindex(self):
+        """Rebuild the FAISS id -> position lookup after metadata changed."""
+        if isinstance(self.index, faiss.IndexIDMap):
+            fids = self._faiss_ids(self.doc_ids)
+        else:
+            # Indexes saved before the ID map was introduced are keyed by position
+            fids = np.arange(len(self.metadata), dtype="int64")
+        order = np.argsort(fids, kind="stable")
+        self._sorted_fids = fids[order]
+        self._sorted_pos = order.astype("int64")
+        self.version += 1
+
+    def _positions(self, fids: np.ndarray) -> np.ndarray:
+        """Map FAISS ids to metadata positions; unknown ids (and FAISS's -1 padding) map to -1."""
+        if len(self._sorted_fids) == 0:
+            return np.full(fids.shape, -1, dtype="int64")
+        slot = np.searchsorted(self._sorted_fids, fids)
+        slot = np.minimum(slot, len(self._sorted_fids) - 1)
+        found = self._sorted_fids[slot] == fids
+        return np.where(found & (fids >= 0), self._sorted_pos[slot], -1)
+
+    def reconstruct_positions(self, positions: Sequence[int]) -> np.ndarray:
+        """
+        Stored vectors of the documents at `positions`, shape (len(positions), dim).
+        Raises RuntimeError when the index does not keep exact vectors (IVF / PQ).
+        """
+        if self.index_type not in EXACT_INDEX_TYPES:
+            raise RuntimeError(f"{self.index_type} index does not keep exact vectors")
+        positions = np.asarray(positions, dtype="int64")
+        if isinstance(self.index, faiss.IndexIDMap):
+            keys = self._faiss_ids([self.doc_ids[p] for p in positions])
+        else:
+            keys = positions
+        out = np.empty((len(keys), self.dim), dtype="float32")
+        for row, key in enumerate(keys):
+            out[row] = self.index.reconstruct(int(key))
+        return out
+
+    def _adopt(self, docs_meta: Union[MetadataStore, List[Dict[str, Any]]], doc_ids: Optional[List[str]]):
+        """Take over a MetadataStore, or wrap a plain list of metadata dicts into one."""
+        if isinstance(docs_meta, MetadataStore):
+            store = docs_meta
+            doc_ids = store.doc_ids() if doc_ids is None else list(doc_ids)
+        else:
+            if doc_ids is None:
+                doc_ids = [str(i) for i in range(len(docs_meta))]
+            store = MetadataStore.from_metas(docs_meta, doc_ids)
+        assert len(doc_ids) == len(store), "Document ids and metadata length mismatch"
+        self.store = store
+        self.metadata = store.metas
+        self.doc_ids = list(doc_ids)
 
-    def build(self, vectors: np.ndarray, docs_meta: List[Dict[str, Any]]):
+    def build(self, vectors: np.ndarray, docs_meta: Union[MetadataStore, List[Dict[str, Any]]],
+              doc_ids: Optional[List[str]] = None):
+        """
+        docs_meta: a MetadataStore, or a list of metadata dicts parallel to `vectors`
+        """
         assert vectors.shape[0] == len(docs_meta), "Vectors and metadata length mismatch"
-        self.index.add(vectors)
-        self.metadata = docs_meta
+        if doc_ids is not None:
+            assert len(set(doc_ids)) == len(doc_ids), "Document ids must be unique"
+
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        self.index = self._new_index(n_train=vectors.shape[0])
+        self.mapped = False
+        if not self.index.is_trained:
+            self.index.train(vectors)
+        self._adopt(docs_meta, doc_ids)
+        assert len(set(self.doc_ids)) == len(self.doc_ids), "Document ids must be unique"
+        self.index.add_with_ids(vectors, self._faiss_ids(self.doc_ids))
+        self._reindex()
+
+    def update(self, docs_meta: Union[MetadataStore, List[Dict[str, Any]]], doc_ids: List[str],
+               remove_ids: Sequence[str], add_ids: Sequence[str], add_vectors: np.ndarray):
+        """
+        Incrementally move the index to a new document set.
+        IVF cells keep the centroids trained at build time; HNSW cannot remove vectors
+        and raises RuntimeError, in which case the caller should rebuild.
+
+        Args:
+            docs_meta: MetadataStore or metadata dicts of the new document set, in document order
+            doc_ids: ids of the new document set, parallel to docs_meta
+            remove_ids: ids whose vectors are dropped (deleted or changed documents)
+            add_ids: ids whose vectors are added (new or changed documents)
+            add_vectors: vectors for add_ids, shape (len(add_ids), dim)
+        """
+        assert len(doc_ids) == len(docs_meta), "Document ids and metadata length mismatch"
+        assert add_vectors.shape[0] == len(add_ids), "Vectors and ids length mismatch"
+        if not isinstance(self.index, faiss.IndexIDMap):
+            raise RuntimeError("Index has no id map; rebuild it before applying incremental updates.")
+        if self.mapped:
+            raise RuntimeError("Index is memory-mapped read-only; load it with mmap=False to update it.")
+
+        if len(remove_ids):
+            self.index.remove_ids(self._faiss_ids(remove_ids))
+        if len(add_ids):
+            self.index.add_with_ids(np.ascontiguousarray(add_vectors, dtype="float32"), self._faiss_ids(add_ids))
+
+        self._adopt(docs_meta, doc_ids)
+        self._reindex()
+        if self.index.ntotal != len(self.doc_ids):
+            raise RuntimeError("Index out of sync with documents; rebuild required.")
 
     def save(self):
-        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
-        faiss.write_index(self.index, self.index_path)
-        with open(self.meta_path, "wb") as f:
-            pickle.dump(self.metadata, f)
-
-    def load(self):
-        if os.path.exists(self.index_path) and os.path.exists(self.meta_path):
-            self.index = faiss.read_index(self.index_path)
+        directory = os.path.dirname(self.index_path) or "."
+        os.makedirs(directory, exist_ok=True)
+        # Write next to it (unique temp name) and rename: processes mapping the old file keep reading intact pages
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.index_path) + ".", suffix=".tmp")
+        os.close(fd)
+        try:
+            faiss.write_index(self.index, tmp)
+            os.replace(tmp, self.index_path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self.store.save(self.meta_path)
+        config = json.dumps(self.config()).encode("utf-8")
+        write_atomic(os.path.join(self.meta_path, "index_config.json"), lambda f: f.write(config))
+
+    def _read_index(self, mmap: bool):
+        if mmap:
+            try:
+                index = faiss.read_index(self.index_path, MMAP_FLAG)
+                self.mapped = True
+                return index
+            except RuntimeError:
+                pass  # index type this FAISS build cannot map: read it into memory
+        self.mapped = False
+        return faiss.read_index(self.index_path)
+
+    def load(self, mmap: bool = True):
+        """
+        Load the index and its metadata.
+
+        With mmap=True (default) both are memory-mapped read-only: only the pages a search
+        touches are read, and worker processes loading the same files share those pages
+        instead of holding one copy each. A mapped index cannot be updated; load with
+        mmap=False before calling `update`.
+        """
+        if not os.path.exists(self.index_path):
+            raise FileNotFoundError("FAISS index or metadata file not found.")
+
+        if os.path.isdir(self.meta_path) and MetadataStore.exists(self.meta_path):
+            self.index = self._read_index(mmap)
+            store = MetadataStore.load(self.meta_path, mmap=mmap)
+            config_path = os.path.join(self.meta_path, "index_config.json")
+            if os.path.exists(config_path):
+                with open(config_path, "r", encoding="utf-8") as f:
+                    for key, value in json.load(f).items():
+                        setattr(self, key, value)
+            self._adopt(store, None)
+        elif os.path.isfile(self.meta_path):
+            # Legacy pickle: a bare list of metadata dicts, or {"metadata", "doc_ids", "config"}
+            self.index = self._read_index(mmap)
             with open(self.meta_path, "rb") as f:
-                self.metadata = pickle.load(f)
+                stored = pickle.load(f)
+            if isinstance(stored, dict):
+                for key, value in stored.get("config", {}).items():
+                    setattr(self, key, value)
+                self._adopt(stored["metadata"], stored["doc_ids"])
+            else:
+                self._adopt(stored, None)
         else:
             raise FileNotFoundError("FAISS index or metadata file not found.")
+        self._reindex()
+
+    def _search_params(self, nprobe: Optional[int], ef_search: Optional[int]):
+        """Per-query search parameters, so concurrent callers can use different settings."""
+        if self.index_type in ("ivf_flat", "ivf_pq"):
+            return faiss.SearchParametersIVF(nprobe=nprobe or self.nprobe)
+        if self.index_type == "hnsw":
+            return faiss.SearchParametersHNSW(efSearch=ef_search or self.ef_search)
+        return None
+
+    def search_positions(self, q_vectors: np.ndarray, top_k: int = 5,
+                         nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+        """
+        Search a whole query matrix in one FAISS call.
+
+        q_vectors: np.ndarray of shape (n_queries, dim)
+        Returns (scores, positions), both of shape (n_queries, top_k); missing hits have position -1.
+        """
+        q_vectors = np.ascontiguousarray(q_vectors, dtype="float32")
+        params = self._search_params(nprobe, ef_search)
+        if params is not None:
+            D, I = self.index.search(q_vectors, top_k, params=params)
+        else:
+            D, I = self.index.search(q_vectors, top_k)
+        return D, self._positions(I)
 
-    def search(self, q_vector: np.ndarray, top_k: int = 5) -> List[Dict[str, Any]]:
+    def search(self, q_vector: np.ndarray, top_k: int = 5,
+               nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         q_vector: np.ndarray of shape (1, dim)
+        nprobe / ef_search: override the index defaults for this query (IVF / HNSW only)
         Returns a list of dicts: [{"score": float, "meta": dict, "index": int}, ...]
         """
-        D, I = self.index.search(q_vector, top_k)
+        D, P = self.search_positions(q_vector, top_k, nprobe=nprobe, ef_search=ef_search)
         results = []
 
-        for score, idx in zip(D[0], I[0]):
+        for score, idx in zip(D[0], P[0]):
             if idx < 0 or idx >= len(self.metadata):
                 continue
             results.append({"score": float(score), "meta": self.metadata[idx], "index": int(idx)})
@@ -0,0 +1,61 @@
+# inference.py
+import contextlib
+import torch
+from typing import Optional
+
+_threads_applied = False
+
+
+class InferenceConfig:
+    """
+    CPU inference settings for a model component (Embedder, Reranker, Generator).
+
+    - quantize: dynamic int8 quantization of the nn.Linear layers (weights stored as
+      int8, activations quantized on the fly); CPU only, ignored for CUDA models
+    - num_threads / num_interop_threads: torch intra-/inter-op thread pools
+      (process-wide; the interop pool is set once, by the first component that asks for it)
+    - inference_mode: run forward passes under torch.inference_mode (no autograd state)
+    """
+
+    def __init__(self, quantize: bool = False, num_threads: Optional[int] = None,
+                 num_interop_threads: Optional[int] = None, inference_mode: bool = True):
+        self.quantize = quantize
+        self.num_threads = num_threads
+        self.num_interop_threads = num_interop_threads
+        self.inference_mode = inference_mode
+
+    @classmethod
+    def preset(cls, name: str, num_threads: Optional[int] = None) -> "InferenceConfig":
+        """"fp32" (eager float32) or "int8" (dynamic quantization)."""
+        if name not in ("fp32", "int8"):
+            raise ValueError(f"Unknown inference preset {name!r}, expected 'fp32' or 'int8'")
+        return cls(quantize=name == "int8", num_threads=num_threads)
+
+    @property
+    def tag(self) -> str:
+        """Short description of the settings that change model outputs (for cache keys)."""
+        return "int8" if self.quantize else "fp32"
+
+    def apply_threads(self):
+        global _threads_applied
+        if self.num_threads:
+            torch.set_num_threads(self.num_threads)
+        if self.num_interop_threads and not _threads_applied:
+            try:
+                torch.set_num_interop_threads(self.num_interop_threads)
+            except RuntimeError:
+                pass  # can only be set before the first parallel region runs
+            _threads_applied = True  # only once attempted: a later config may still ask for it
+
+    def optimize(self, model: torch.nn.Module) -> torch.nn.Module:
+        """Put the model in eval mode and quantize it if configured; returns the model to use."""
+        self.apply_threads()
+        model.eval()
+        on_cpu = all(p.device.type == "cpu" for p in model.parameters())
+        if self.quantize and on_cpu:
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+    def context(self):
+        """Context manager for forward passes."""
+        return torch.inference_mode() if self.inference_mode else contextlib.nullcontext()
@@ -0,0 +1,123 @@
+# loadtest.py
+"""
+Load generator for server.py: latency percentiles and throughput at increasing concurrency.
+
+For each concurrency level, that many clients send requests back to back over keep-alive
+connections until --requests have completed, then it reports:
+  - requests/sec of successful (200) responses
+  - p50 / p95 / p99 / max latency of successful responses, in ms
+  - counts of 503 (rejected by backpressure), 504 (timed out) and other failures
+
+Questions are this repo's FAQ questions mixed with free-form menu questions that miss
+the FAQ fast path. Note that repeated questions hit the answer cache, like repeat
+customers do; pass --unique to append a counter so every question is new.
+
+Usage:
+    python server.py &
+    python loadtest.py
+    python loadtest.py --concurrency 1 4 16 64 --requests 400 --endpoint recommend
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+import numpy as np
+from typing import Dict, Iterator, List, Tuple
+
+BASE = "Dataset/Chat Bot Dataset/"
+MENU_QUESTIONS = [
+    "what is the most popular shake", "do you have anything chocolate", "which coffee is rated best",
+    "suggest something cold to drink", "is there a vegetarian sandwich", "what desserts do you have",
+    "how much is a cold coffee", "what should i order for breakfast",
+]
+PREFERENCES = ["spicy", "vegetarian", "sweet dessert", "cold coffee", "chocolate", "popular", "healthy"]
+
+
+def load_payloads(endpoint: str, unique: bool) -> Iterator[Dict]:
+    if endpoint == "recommend":
+        return itertools.cycle([{"preferences": p, "k": 5} for p in PREFERENCES])
+    from data_loader import load_faq
+
+    questions = load_faq(BASE + "conversationo.csv")["question"].tolist()[:50] + MENU_QUESTIONS
+    rng = np.random.default_rng(0)
+    rng.shuffle(questions)
+    if unique:
+        return ({"question": f"{q} ({i})"} for i, q in enumerate(itertools.cycle(questions)))
+    return itertools.cycle([{"question": q} for q in questions])
+
+
+async def post(reader, writer, host: str, path: str, payload: Dict) -> int:
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(host: str, port: int, path: str, payloads, remaining: List[int],
+                 latencies: List[float], statuses: Dict[str, int]):
+    reader = writer = None
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        payload = next(payloads)
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            status = await post(reader, writer, host, path, payload)
+        except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+            status = "error"
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+        if status == 200:
+            latencies.append(time.perf_counter() - start)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    if writer is not None:
+        writer.close()
+
+
+async def run_level(host: str, port: int, path: str, payloads, concurrency: int,
+                    n_requests: int) -> Tuple[List[float], Dict[str, int], float]:
+    remaining, latencies, statuses = [n_requests], [], {}
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, path, payloads, remaining, latencies, statuses)
+                           for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--endpoint", choices=["ask", "recommend"], default="ask")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--unique", action="store_true", help="never repeat a question (no answer cache hits)")
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.endpoint, args.unique)
+    path = "/" + args.endpoint
+    print(f"{'clients':>7} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}  statuses")
+    for concurrency in args.concurrency:
+        latencies, statuses, elapsed = asyncio.run(
+            run_level(args.host, args.port, path, payloads, concurrency, args.requests))
+        ok = np.array(latencies) * 1000
+        p50, p95, p99, worst = np.percentile(ok, [50, 95, 99, 100]) if len(ok) else (float("nan"),) * 4
+        print(f"{concurrency:>7} {len(ok) / elapsed:>8.1f} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {worst:>8.1f}  "
+              f"{json.dumps(dict(sorted(statuses.items())))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+# menu_lookup.py
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+from faq_fastpath import FAQFastPath
+from meta_store import MetadataStore, TYPE_ITEM
+
+# Question words that make a menu question "direct" (answered from the data, no generation)
+INTENT_WORDS = {
+    "price": "price", "prices": "price", "priced": "price", "cost": "price", "costs": "price",
+    "rating": "rating", "ratings": "rating", "rated": "rating", "stars": "rating", "reviews": "rating",
+    "popular": "popularity", "popularity": "popularity", "bestseller": "popularity", "bestselling": "popularity",
+}
+INTENT_CUTOFF = 90  # fuzz.ratio: one typo in a long word, never a different word ("start" vs "stars" is 80)
+# "how much is / for <item>": a price question only when the item follows (articles allowed)
+_HOW_MUCH = ("how", "much")
+_HOW_MUCH_LINKS = {"is", "are", "for"}
+_ARTICLES = {"a", "an", "the", "one", "your"}
+_PRICE_RE = re.compile(r"rs\.?\s*(\d+)")
+_PRICE_PAIR_RE = re.compile(r"^\s*(?:sir|madam|mam)?\s*(.+?)\s+is of rs\.?\s*(\d+)")
+_PRICE_QUESTION_RE = re.compile(r"price of (.+)$")
+
+
+class MenuLookup:
+    """
+    Finds the menu items a question mentions, typos included ("avacado shake price" ->
+    avocado shake), with string matching only: no embedding, search or reranking.
+
+    Every word span of the question (up to the longest item name) is scored against
+    every item name in one `process.cdist` call; the best non-overlapping spans at or
+    above `score_cutoff` are the mentions. A question with mentions and a price, rating
+    or popularity word (within INTENT_CUTOFF), or of the form "how much is <item>", is
+    answered from the data when the data has the figure for every mentioned item:
+      - price: from the FAQ answers that quote prices ("... is of Rs. 190")
+      - rating / popularity: from the item's orders (num_orders > 0)
+    Otherwise the mentioned items are handed to retrieval as candidates.
+
+    Hit/miss counters are available through `stats()`.
+    """
+
+    def __init__(self, docs, faq_df=None, score_cutoff: float = 85.0, max_items: int = 3):
+        """
+        Args:
+            docs: document store (MetadataStore or list of docs); item positions are the
+                retriever's document indices
+            faq_df: output of load_faq, read for item prices; None for no prices
+            score_cutoff: minimum fuzz.ratio (0-100) between a question span and an item name
+            max_items: mentions kept per question
+        """
+        if isinstance(docs, MetadataStore):
+            positions = np.flatnonzero(docs.types() == TYPE_ITEM)
+        else:
+            positions = [i for i, d in enumerate(docs) if d['meta'].get('type') == 'item']
+        self.positions = [int(i) for i in positions]
+        self.metas = [docs[i]['meta'] for i in self.positions]
+        self.texts = [docs[i]['text'] for i in self.positions]
+        self.names = [FAQFastPath.key(str(m.get('item_name', ''))) for m in self.metas]
+        self.score_cutoff = score_cutoff
+        self.max_items = max_items
+        self._max_words = max((len(n.split()) for n in self.names), default=0)
+        self.prices: Dict[int, str] = self._read_prices(faq_df) if faq_df is not None else {}
+
+        self._lock = threading.Lock()
+        self._counts = {"queries": 0, "answered": 0, "injected": 0, "miss": 0}
+
+    def _read_prices(self, faq_df) -> Dict[int, str]:
+        """Item slot -> price quoted by the FAQ (first quote wins, FAQ order)."""
+        prices: Dict[int, str] = {}
+
+        def add(name: str, price: str):
+            match = process.extractOne(FAQFastPath.key(name), self.names, scorer=fuzz.ratio,
+                                       score_cutoff=self.score_cutoff)
+            if match is not None:
+                prices.setdefault(match[2], price)
+
+        for question, answer in zip(faq_df['question'].tolist(), faq_df['answer'].tolist()):
+            answer = str(answer).lower()
+            # "Sir Nutella Puff is of Rs. 190, Egg Puff is of Rs. 190, ..."
+            for part in answer.split(","):
+                pair = _PRICE_PAIR_RE.match(part)
+                if pair:
+                    add(pair.group(1), pair.group(2))
+            # "what is price of americano" -> "... you can enjoy it at just Rs. 190"
+            asked = _PRICE_QUESTION_RE.search(str(question))
+            quoted = _PRICE_RE.findall(answer)
+            if asked and "," not in asked.group(1) and len(quoted) == 1:
+                add(asked.group(1), quoted[0])
+        return prices
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self._counts["queries"] += 1
+            self._counts[outcome] += 1
+
+    # -------------------- Matching --------------------
+    def mentions(self, query: str) -> List[Dict[str, Any]]:
+        """
+        Menu items mentioned in `query`, in question order.
+
+        Returns:
+            [{"index", "meta", "text", "score", "span"}]; "index" is the document position,
+            "score" the match quality in [0, 1], "span" the (start, end) word range
+        """
+        words = FAQFastPath.key(query).split()
+        if not words or not self.names:
+            return []
+        spans, bounds = [], []
+        for n in range(1, min(self._max_words, len(words)) + 1):
+            for start in range(len(words) - n + 1):
+                span = " ".join(words[start:start + n])
+                if len(span) >= 4:  # "tea", "cup": too short to match names by spelling
+                    spans.append(span)
+                    bounds.append((start, start + n))
+        if not spans:
+            return []
+
+        # One bulk call: spans x names similarity matrix, zero below the cutoff
+        scores = process.cdist(spans, self.names, scorer=fuzz.ratio, score_cutoff=self.score_cutoff)
+        rows, cols = np.nonzero(scores)
+        # Best score first; on ties the longer span ("au laite cappucchino" over "au laite")
+        order = sorted(range(len(rows)), key=lambda j: (-scores[rows[j], cols[j]],
+                                                         -(bounds[rows[j]][1] - bounds[rows[j]][0])))
+        used_words, used_items, found = set(), set(), []
+        for j in order:
+            (start, end), slot = bounds[rows[j]], int(cols[j])
+            if slot in used_items or used_words.intersection(range(start, end)):
+                continue
+            used_items.add(slot)
+            used_words.update(range(start, end))
+            found.append({"index": self.positions[slot], "meta": self.metas[slot], "text": self.texts[slot],
+                          "score": float(scores[rows[j], cols[j]]) / 100.0, "span": (start, end), "slot": slot})
+            if len(found) == self.max_items:
+                break
+        found.sort(key=lambda f: f["span"])
+        return found
+
+    @staticmethod
+    def intent(query: str, mentions: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        "price", "rating" or "popularity" if a word outside the item names asks for it
+        (exactly or within INTENT_CUTOFF), or "price" for "how much is / for <item>".
+        """
+        words = FAQFastPath.key(query).split()
+        covered, starts = set(), {m["span"][0] for m in mentions}
+        for m in mentions:
+            covered.update(range(*m["span"]))
+        for i, word in enumerate(words):
+            if tuple(words[i:i + 2]) == _HOW_MUCH and i + 2 < len(words) and words[i + 2] in _HOW_MUCH_LINKS:
+                j = i + 3
+                while j < len(words) and words[j] in _ARTICLES:
+                    j += 1
+                if j in starts:
+                    return "price"
+            if i in covered or len(word) < 4:
+                continue
+            match = process.extractOne(word, INTENT_WORDS.keys(), scorer=fuzz.ratio, score_cutoff=INTENT_CUTOFF)
+            if match is not None:
+                return INTENT_WORDS[match[0]]
+        return None
+
+    # -------------------- Answers --------------------
+    def _fact(self, intent: str, mention: Dict[str, Any]) -> Optional[str]:
+        meta = mention["meta"]
+        name = str(meta.get("item_name", "")).title()
+        if intent == "price":
+            price = self.prices.get(mention["slot"])
+            return None if price is None else f"{name} is Rs. {price}."
+        if not meta.get("num_orders"):
+            return None  # no orders recorded: nothing to report
+        if intent == "rating":
+            return f"{name} is rated {meta['avg_rating']:g} across {meta['num_orders']} orders."
+        return f"{name} has been ordered {meta['num_orders']} times."
+
+    def lookup(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Args:
+            query: raw user question
+
+        Returns:
+            {"items": mentions, "intent": str or None, "answer": str or None}, or None when
+            no menu item is mentioned. "answer" is set for a direct question whose figures
+            are all in the data; otherwise "items" are meant for the candidate set.
+        """
+        items = self.mentions(query)
+        if not items:
+            self._count("miss")
+            return None
+        intent = self.intent(query, items)
+        facts = [self._fact(intent, m) for m in items] if intent else [None]
+        answer = " ".join(facts) if all(f is not None for f in facts) else None
+        self._count("answered" if answer is not None else "injected")
+        return {"items": items, "intent": intent, "answer": answer}
+
+    @staticmethod
+    def inject(candidates: List[Dict[str, Any]], items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Put the mentioned items in front of the retrieved candidates (dropping their
+        duplicates). Their score is 1 + match quality, above any hybrid score (at most 1),
+        so a single clear mention passes the reranker's margin gate without a rerank.
+        """
+        seen = {m["index"] for m in items}
+        front = [{"index": m["index"], "meta": m["meta"], "text": m["text"], "score": 1.0 + m["score"]}
+                 for m in items]
+        return front + [c for c in candidates if c["index"] not in seen]
+
+    def stats(self) -> Dict[str, float]:
+        """Counters plus the rates of templated answers and of injected mentions."""
+        with self._lock:
+            counts = dict(self._counts)
+        total = counts["queries"] or 1
+        counts["answer_rate"] = counts["answered"] / total
+        counts["inject_rate"] = counts["injected"] / total
+        counts["hit_rate"] = (counts["answered"] + counts["injected"]) / total
+        return counts
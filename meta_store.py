@@ -0,0 +1,269 @@
+# meta_store.py
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+import numpy as np
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, one process per file set
+    fcntl = None
+
+# Record type codes; anything that does not fit the item/faq schema is stored as JSON
+TYPE_ITEM, TYPE_FAQ, TYPE_OTHER = 0, 1, 2
+_ITEM_KEYS = ("type", "item_id", "item_name", "num_orders", "avg_rating")
+_FAQ_KEYS = ("type", "question", "answer")
+
+# String columns of a record: (item_id, item_name) for items, (question, answer) for FAQs,
+# (json,) for other documents. Unused slots hold -1.
+_NO_STRING = -1
+
+_FILES = ("doc_record", "doc_text", "doc_id", "rec_type", "rec_num_orders",
+          "rec_avg_rating", "rec_strings", "str_offsets")
+
+
+class MetadataStore:
+    """
+    Columnar, memory-mappable replacement for the list-of-dicts document store.
+
+    Layout:
+      - per document: record index, text string id, document id string id
+      - per record: type code (uint8), num_orders (int64), avg_rating (float64),
+        two string ids (item_id/item_name or question/answer)
+      - all strings interned once in a UTF-8 blob addressed by an offsets array
+
+    FAQ chunks point at one shared record instead of repeating the question and answer.
+    Loaded with mmap=True, nothing is read until a document is accessed, and worker
+    processes share the same pages. Documents are materialized as dicts only on access,
+    so the store can be passed anywhere a `docs` list was used.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], blob: np.ndarray):
+        self.doc_record = arrays["doc_record"]
+        self.doc_text = arrays["doc_text"]
+        self.doc_id = arrays["doc_id"]
+        self.rec_type = arrays["rec_type"]
+        self.rec_num_orders = arrays["rec_num_orders"]
+        self.rec_avg_rating = arrays["rec_avg_rating"]
+        self.rec_strings = arrays["rec_strings"]
+        self.str_offsets = arrays["str_offsets"]
+        self.blob = blob
+
+    # -------------------- Construction --------------------
+    @classmethod
+    def from_docs(cls, docs: Sequence[Dict[str, Any]]) -> "MetadataStore":
+        """Build from build_document_store output ({"id", "text", "meta"} dicts)."""
+        strings: Dict[str, int] = {}
+        records: Dict[int, int] = {}  # id(meta dict) -> record index, so shared FAQ metas share a record
+        rec_type, rec_num_orders, rec_avg_rating, rec_strings = [], [], [], []
+        doc_record, doc_text, doc_id = [], [], []
+
+        def intern(s: Optional[str]) -> int:
+            if s is None:
+                return _NO_STRING
+            if s not in strings:
+                strings[s] = len(strings)
+            return strings[s]
+
+        for d in docs:
+            meta = d.get("meta", {})
+            rec = records.get(id(meta))
+            if rec is None:
+                rec = len(rec_type)
+                records[id(meta)] = rec
+                if tuple(meta.keys()) == _ITEM_KEYS and meta["type"] == "item":
+                    rec_type.append(TYPE_ITEM)
+                    rec_num_orders.append(meta["num_orders"])
+                    rec_avg_rating.append(meta["avg_rating"])
+                    rec_strings.append((intern(meta["item_id"]), intern(meta["item_name"])))
+                elif tuple(meta.keys()) == _FAQ_KEYS and meta["type"] == "faq":
+                    rec_type.append(TYPE_FAQ)
+                    rec_num_orders.append(0)
+                    rec_avg_rating.append(0.0)
+                    rec_strings.append((intern(meta["question"]), intern(meta["answer"])))
+                else:
+                    rec_type.append(TYPE_OTHER)
+                    rec_num_orders.append(meta.get("num_orders", 0))
+                    rec_avg_rating.append(meta.get("avg_rating", 0.0))
+                    rec_strings.append((intern(json.dumps(meta, ensure_ascii=False)), _NO_STRING))
+            doc_record.append(rec)
+            doc_text.append(intern(d.get("text", "")))
+            doc_id.append(intern(str(d.get("id", len(doc_id)))))
+
+        encoded = [s.encode("utf-8") for s in strings]  # dicts keep insertion order = string id
+        offsets = np.zeros(len(encoded) + 1, dtype="int64")
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype="uint8")
+
+        arrays = {
+            "doc_record": np.array(doc_record, dtype="int32"),
+            "doc_text": np.array(doc_text, dtype="int32"),
+            "doc_id": np.array(doc_id, dtype="int32"),
+            "rec_type": np.array(rec_type, dtype="uint8"),
+            "rec_num_orders": np.array(rec_num_orders, dtype="int64"),
+            "rec_avg_rating": np.array(rec_avg_rating, dtype="float64"),
+            "rec_strings": np.array(rec_strings, dtype="int32").reshape(-1, 2),
+            "str_offsets": offsets,
+        }
+        return cls(arrays, blob)
+
+    @classmethod
+    def from_metas(cls, metas: Sequence[Dict[str, Any]], doc_ids: Optional[Sequence[str]] = None) -> "MetadataStore":
+        """Build from bare metadata dicts (documents get empty texts)."""
+        if doc_ids is None:
+            doc_ids = [str(i) for i in range(len(metas))]
+        return cls.from_docs([{"id": i, "text": "", "meta": m} for i, m in zip(doc_ids, metas)])
+
+    # -------------------- Persistence --------------------
+    def save(self, path: str):
+        """
+        Write every column to a temp file and rename it into place, so processes that
+        still map the previous files keep reading intact (old) pages instead of a truncated file.
+        """
+        os.makedirs(path, exist_ok=True)
+        for name in _FILES:
+            arr = np.asarray(getattr(self, name))
+            write_atomic(os.path.join(path, name + ".npy"), lambda f, arr=arr: np.save(f, arr))
+        write_atomic(os.path.join(path, "strings.bin"), lambda f: f.write(np.asarray(self.blob).tobytes()))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "MetadataStore":
+        mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(path, name + ".npy"), mmap_mode=mode) for name in _FILES}
+        blob_path = os.path.join(path, "strings.bin")
+        if os.path.getsize(blob_path) == 0:
+            blob = np.zeros(0, dtype="uint8")  # empty files cannot be mapped
+        elif mmap:
+            blob = np.memmap(blob_path, dtype="uint8", mode="r")
+        else:
+            blob = np.fromfile(blob_path, dtype="uint8")
+        return cls(arrays, blob)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, "strings.bin"))
+
+    # -------------------- Access --------------------
+    def string(self, sid: int) -> Optional[str]:
+        if sid == _NO_STRING:
+            return None
+        start, end = self.str_offsets[sid], self.str_offsets[sid + 1]
+        return bytes(self.blob[start:end]).decode("utf-8")
+
+    def text(self, i: int) -> str:
+        return self.string(int(self.doc_text[i]))
+
+    def id(self, i: int) -> str:
+        return self.string(int(self.doc_id[i]))
+
+    def meta(self, i: int) -> Dict[str, Any]:
+        rec = int(self.doc_record[i])
+        kind = int(self.rec_type[rec])
+        first, second = (int(s) for s in self.rec_strings[rec])
+        if kind == TYPE_ITEM:
+            return {"type": "item", "item_id": self.string(first), "item_name": self.string(second),
+                    "num_orders": int(self.rec_num_orders[rec]), "avg_rating": float(self.rec_avg_rating[rec])}
+        if kind == TYPE_FAQ:
+            return {"type": "faq", "question": self.string(first), "answer": self.string(second)}
+        return json.loads(self.string(first))
+
+    def doc_ids(self) -> List[str]:
+        return [self.string(int(s)) for s in self.doc_id]
+
+    def texts(self) -> List[str]:
+        return [self.string(int(s)) for s in self.doc_text]
+
+    # Typed per-document columns, no dicts involved
+    def types(self) -> np.ndarray:
+        return np.asarray(self.rec_type)[np.asarray(self.doc_record)]
+
+    def num_orders(self) -> np.ndarray:
+        return np.asarray(self.rec_num_orders)[np.asarray(self.doc_record)]
+
+    def avg_ratings(self) -> np.ndarray:
+        return np.asarray(self.rec_avg_rating)[np.asarray(self.doc_record)]
+
+    @property
+    def metas(self) -> "MetaView":
+        return MetaView(self)
+
+    # Sequence protocol: behaves like the list of {"id", "text", "meta"} dicts
+    def __len__(self) -> int:
+        return len(self.doc_record)
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("document index out of range")
+        return {"id": self.id(i), "text": self.text(i), "meta": self.meta(i)}
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+def doc_texts(docs) -> List[str]:
+    """Texts of a MetadataStore or of a list of document dicts."""
+    if isinstance(docs, MetadataStore):
+        return docs.texts()
+    return [d['text'] for d in docs]
+
+
+def write_atomic(path: str, write):
+    """
+    Write through `write(f)` to a temp file and rename it over `path`. Processes that
+    map the old file keep their (old, intact) pages; new readers see the new file.
+    The temp file has a unique name, so concurrent writers never share one.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".",
+                               suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+@contextmanager
+def file_lock(directory: str):
+    """
+    Exclusive lock between processes on `<directory>/.lock`, held for the `with` block.
+
+    Saved file sets (FAISS index + store + manifest, sparse index, item matrix) are
+    written several files at a time. Writers and loaders take this lock, so a loader
+    never pairs new files with old ones, and when the data changes only the first
+    worker rebuilds: the others find the saved fingerprint up to date once they get
+    the lock. Without fcntl (Windows) it is a no-op.
+    """
+    os.makedirs(directory or ".", exist_ok=True)
+    with open(os.path.join(directory or ".", ".lock"), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class MetaView:
+    """Read-only sequence of metadata dicts, materialized per access (for FaissIndexer.metadata)."""
+
+    def __init__(self, store: MetadataStore):
+        self.store = store
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        return self.store.meta(i)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self.store)):
+            yield self.store.meta(i)
@@ -0,0 +1,122 @@
+# metrics.py
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+# Upper bounds (seconds) of the stage latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metrics:
+    """
+    Metrics hook used by the CafeBot pipeline. This base class records nothing; subclass
+    it (or use PrometheusMetrics) to send the measurements somewhere.
+
+    Hooks:
+      - stage(name, wall, cpu): one execution of a pipeline stage, in seconds. CPU time is
+        that of the thread that ran the stage; work handed to another thread (the
+        micro-batchers, the streaming generator) shows up in wall time only.
+      - count(name, n): an event counter (FAQ hit, answer cache hit, ...)
+      - observe(name, value): a sampled value (candidate counts, ...)
+    """
+
+    def stage(self, name: str, wall: float, cpu: float):
+        pass
+
+    def count(self, name: str, n: int = 1):
+        pass
+
+    def observe(self, name: str, value: float):
+        pass
+
+    @contextmanager
+    def timer(self, name: str):
+        """Time the enclosed block as one execution of stage `name`."""
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            self.stage(name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+
+class PrometheusMetrics(Metrics):
+    """
+    In-process aggregation rendered in the Prometheus text exposition format:
+
+      - <prefix>_stage_wall_seconds: histogram per stage
+      - <prefix>_stage_cpu_seconds_total: counter per stage
+      - <prefix>_events_total: counter per event
+      - <prefix>_observed: summary (sum and count) per observed value
+    """
+
+    def __init__(self, prefix: str = "cafebot", buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._wall: Dict[str, List[float]] = {}  # stage -> per-bucket counts (non-cumulative) + overflow
+        self._wall_sum: Dict[str, float] = {}
+        self._cpu_sum: Dict[str, float] = {}
+        self._events: Dict[str, int] = {}
+        self._observed: Dict[str, Tuple[float, int]] = {}  # name -> (sum, count)
+
+    def stage(self, name: str, wall: float, cpu: float):
+        slot = next((i for i, b in enumerate(self.buckets) if wall <= b), len(self.buckets))
+        with self._lock:
+            counts = self._wall.setdefault(name, [0] * (len(self.buckets) + 1))
+            counts[slot] += 1
+            self._wall_sum[name] = self._wall_sum.get(name, 0.0) + wall
+            self._cpu_sum[name] = self._cpu_sum.get(name, 0.0) + cpu
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self._events[name] = self._events.get(name, 0) + n
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            total, n = self._observed.get(name, (0.0, 0))
+            self._observed[name] = (total + value, n + 1)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage call count and mean wall/CPU milliseconds, events, and observed means."""
+        with self._lock:
+            stages = {
+                name: {"calls": sum(counts),
+                       "wall_ms": 1000 * self._wall_sum[name] / sum(counts),
+                       "cpu_ms": 1000 * self._cpu_sum[name] / sum(counts)}
+                for name, counts in self._wall.items()
+            }
+            return {"stages": stages, "events": dict(self._events),
+                    "observed": {name: total / n for name, (total, n) in self._observed.items()}}
+
+    def render(self) -> str:
+        """The metrics as Prometheus text (serve it at /metrics)."""
+        p = self.prefix
+        with self._lock:
+            lines = [f"# HELP {p}_stage_wall_seconds Wall time per pipeline stage.",
+                     f"# TYPE {p}_stage_wall_seconds histogram"]
+            for name, counts in sorted(self._wall.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    lines.append(f'{p}_stage_wall_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{p}_stage_wall_seconds_bucket{{stage="{name}",le="+Inf"}} {sum(counts)}')
+                lines.append(f'{p}_stage_wall_seconds_sum{{stage="{name}"}} {self._wall_sum[name]:.6f}')
+                lines.append(f'{p}_stage_wall_seconds_count{{stage="{name}"}} {sum(counts)}')
+
+            lines += [f"# HELP {p}_stage_cpu_seconds_total CPU time of the calling thread per pipeline stage.",
+                      f"# TYPE {p}_stage_cpu_seconds_total counter"]
+            for name, total in sorted(self._cpu_sum.items()):
+                lines.append(f'{p}_stage_cpu_seconds_total{{stage="{name}"}} {total:.6f}')
+
+            lines += [f"# HELP {p}_events_total Pipeline events (fast path and cache hits, ...).",
+                      f"# TYPE {p}_events_total counter"]
+            for name, n in sorted(self._events.items()):
+                lines.append(f'{p}_events_total{{event="{name}"}} {n}')
+
+            lines += [f"# HELP {p}_observed Sampled pipeline values (candidate counts, ...).",
+                      f"# TYPE {p}_observed summary"]
+            for name, (total, n) in sorted(self._observed.items()):
+                lines.append(f'{p}_observed_sum{{name="{name}"}} {total:g}')
+                lines.append(f'{p}_observed_count{{name="{name}"}} {n}')
+        return "\n".join(lines) + "\n"
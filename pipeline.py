@@ -0,0 +1,230 @@
+# pipeline.py
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from data_loader import normalize
+from hot_reload import Snapshot, SnapshotManager
+from metrics import Metrics
+
+NO_ANSWER = "Sorry, I couldn't find relevant information."
+PROMPT_DOCS = 4  # Generator.craft_prompt uses the first 4 context documents
+
+
+class Turn:
+    """
+    One question on its way through CafeBot: the snapshot it is answered from, the
+    retrieved candidates, the context documents and, once known, the answer.
+
+    source: where the answer comes from
+      - "faq":       FAQ fast path (verbatim answer)
+      - "menu":      menu lookup (price / rating / popularity of the items mentioned)
+      - "cache":     answer cache (a similar recent question with the same context)
+      - "generated": Generator, filled in by CafeBot.generate / CafeBot.stream
+      - "none":      nothing retrieved
+      - None:        not answered yet; `prompt` is ready for generation
+    """
+
+    def __init__(self, query: str, user_pref: Optional[str], snapshot: Snapshot):
+        self.query = query  # as typed, used in the prompt
+        self.q_norm = normalize(query)  # used for search, fast path and reranking
+        self.user_pref = user_pref
+        self.snapshot = snapshot
+        self.q_emb = None
+        self.menu_items: List[Dict[str, Any]] = []  # menu items the question mentions
+        self.candidates: List[Dict[str, Any]] = []
+        self.context: List[Dict[str, Any]] = []
+        self.prompt: Optional[str] = None
+        self.answer: Optional[str] = None
+        self.source: Optional[str] = None
+
+    @property
+    def context_ids(self) -> List[int]:
+        """Document positions the prompt is built from (answer cache key)."""
+        return [c['index'] for c in self.context[:PROMPT_DOCS]]
+
+
+class CafeBot:
+    """
+    The question-answering flow shared by the CLI and the Streamlit app:
+
+        encode -> FAQ fast path -> menu lookup -> dense + sparse search (concurrently)
+        -> fuse with texts (+ mentioned items) -> adaptive rerank -> answer cache -> prompt -> generate
+
+    Dataset-dependent components come from a snapshot read once per question, so a hot
+    reload never mixes data inside one answer. Every stage is reported to a Metrics hook
+    (wall and CPU time per stage, candidate counts, fast path / menu / cache / rerank outcomes).
+    """
+
+    def __init__(self, embedder, reranker, generator, snapshots: Union[SnapshotManager, Snapshot],
+                 metrics: Optional[Metrics] = None, k: int = 10, alpha: float = 0.6, rerank_top_n: int = 6,
+                 context_size: int = 6, executor: Optional[Executor] = None):
+        """
+        Args:
+            snapshots: SnapshotManager (hot reload), tenants.TenantView (one location of a
+                TenantStore), or one fixed Snapshot
+            metrics: hook receiving the measurements; default records nothing
+            k: candidates kept after fusing the dense and sparse results
+            alpha: dense weight of the hybrid score
+            rerank_top_n: candidates the reranker scores when retrieval is not confident
+            context_size: documents handed to the prompt (and kept as the answer's sources)
+            executor: runs the sparse search next to the encoder and the dense search;
+                a small thread pool is created if None
+        """
+        self.embedder = embedder
+        self.reranker = reranker
+        self.generator = generator
+        self.snapshots = snapshots
+        self.metrics = metrics or Metrics()
+        self.k = k
+        self.alpha = alpha
+        self.rerank_top_n = rerank_top_n
+        self.context_size = context_size
+        self._own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=4, thread_name_prefix="cafebot-sparse")
+
+    @property
+    def snapshot(self) -> Snapshot:
+        if isinstance(self.snapshots, Snapshot):
+            return self.snapshots
+        return self.snapshots.current
+
+    # -------------------- Question answering --------------------
+    def retrieve(self, query: str, user_pref: Optional[str] = None) -> Turn:
+        """
+        Everything up to generation. The returned turn either has its answer (FAQ fast
+        path, answer cache, nothing found) or a prompt for `generate` / `stream`.
+        """
+        m = self.metrics
+        turn = Turn(query, user_pref, self.snapshot)
+        retriever = turn.snapshot.retriever
+        kk = self.k * 2
+        m.count("questions")
+
+        # The sparse leg needs no embedding: it runs while the query is encoded
+        def sparse_leg():
+            with m.timer("sparse"):
+                return retriever.sparse_search(turn.q_norm, k=kk)
+
+        sparse_future = self.executor.submit(sparse_leg)
+
+        with m.timer("encode"):
+            turn.q_emb = self.embedder.encode([turn.q_norm])  # encoded once, shared by every stage below
+        with m.timer("faq_fastpath"):
+            hit = turn.snapshot.faq_fastpath.lookup(turn.q_norm, q_emb=turn.q_emb)
+        if hit is not None:
+            # Known FAQ: answer verbatim, no retrieval, reranking or generation
+            m.count("faq_" + hit["match"])
+            turn.candidates = turn.context = [{"meta": hit["meta"], "text": hit["question"]}]
+            turn.answer, turn.source = hit["answer"].strip(), "faq"
+            return turn
+
+        menu = turn.snapshot.menu_lookup
+        if menu is not None:
+            with m.timer("menu_lookup"):
+                found = menu.lookup(turn.q_norm)
+            if found is not None:
+                turn.menu_items = found["items"]
+                if found["answer"] is not None:
+                    # Direct item question: answered from the data, no retrieval or generation
+                    m.count("menu_" + found["intent"])
+                    turn.candidates = turn.context = menu.inject([], turn.menu_items)
+                    turn.answer, turn.source = found["answer"], "menu"
+                    return turn
+                m.count("menu_inject")
+
+        with m.timer("dense"):
+            dense = retriever.dense_search(turn.q_norm, k=kk, q_emb=turn.q_emb)
+        with m.timer("sparse_wait"):
+            sparse = sparse_future.result()
+        with m.timer("fuse"):
+            candidates = retriever.fuse(dense, sparse, k=self.k, alpha=self.alpha, with_text=True)
+            if turn.menu_items:
+                candidates = menu.inject(candidates, turn.menu_items)
+        m.observe("dense_candidates", len(dense))
+        m.observe("sparse_candidates", len(sparse))
+        m.observe("candidates", len(candidates))
+        if not candidates:
+            m.count("no_candidates")
+            turn.answer, turn.source = NO_ANSWER, "none"
+            return turn
+
+        # Rerank (skipped when retrieval is clearly confident, else only the prompt's head)
+        with m.timer("rerank"):
+            turn.candidates = self.reranker.rerank_adaptive(turn.q_norm, candidates, top_n=self.rerank_top_n)
+        m.count("rerank_" + turn.candidates[0]['rerank_path'])
+        turn.context = turn.candidates[:self.context_size]
+
+        # Reuse the answer to a similar recent question with the same context
+        with m.timer("answer_cache"):
+            answer = turn.snapshot.answer_cache.get(turn.q_emb, turn.context_ids, user_pref)
+        if answer is not None:
+            m.count("answer_cache_hit")
+            turn.answer, turn.source = answer, "cache"
+            return turn
+        m.count("answer_cache_miss")
+
+        with m.timer("prompt"):
+            turn.prompt = self.generator.craft_prompt(query, turn.context, user_pref)
+        return turn
+
+    def generate(self, turn: Turn) -> str:
+        """The turn's answer, generated in one call (batched with concurrent requests if enabled)."""
+        if turn.answer is not None:
+            return turn.answer
+        with self.metrics.timer("generate"):
+            answer = self.generator.generate(turn.prompt).strip()
+        self._answered(turn, answer)
+        return answer
+
+    def stream(self, turn: Turn) -> Iterator[str]:
+        """
+        The turn's answer as pieces of text while it is decoded. The "generate" stage
+        covers the whole stream (including the consumer's time between pieces);
+        time to the first piece is observed as "first_piece_seconds".
+        """
+        if turn.answer is not None:
+            yield turn.answer
+            return
+        pieces = []
+        start = time.perf_counter()
+        with self.metrics.timer("generate"):
+            for piece in self.generator.generate_stream(turn.prompt):
+                if not pieces:
+                    self.metrics.observe("first_piece_seconds", time.perf_counter() - start)
+                pieces.append(piece)
+                yield piece
+        self._answered(turn, "".join(pieces).strip())
+
+    def _answered(self, turn: Turn, answer: str):
+        turn.answer, turn.source = answer, "generated"
+        turn.snapshot.answer_cache.put(turn.q_emb, turn.context_ids, answer, turn.user_pref)
+
+    def ask(self, query: str, user_pref: Optional[str] = None) -> Turn:
+        """retrieve + generate, for callers that do not stream."""
+        turn = self.retrieve(query, user_pref)
+        self.generate(turn)
+        return turn
+
+    # -------------------- Recommendations --------------------
+    def recommend(self, user_pref: str, k: int = 5, snapshot: Optional[Snapshot] = None) -> List[Dict[str, Any]]:
+        """Items for `user_pref`, from `snapshot` if given (so the caller knows their data version)."""
+        with self.metrics.timer("recommend"):
+            return (snapshot or self.snapshot).recommender.recommend(user_pref, k=k)
+
+    # -------------------- Reporting --------------------
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Counters of the current snapshot's fast path, menu lookup and answer cache, and of the reranker."""
+        snap = self.snapshot
+        out = {
+            "faq_fastpath": snap.faq_fastpath.stats(),
+            "answer_cache": snap.answer_cache.stats(),
+            "reranker": self.reranker.stats(),
+        }
+        if snap.menu_lookup is not None:
+            out["menu_lookup"] = snap.menu_lookup.stats()
+        return out
+
+    def close(self):
+        if self._own_executor:
+            self.executor.shutdown(wait=False)
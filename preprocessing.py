@@ -0,0 +1,174 @@
+# preprocessing.py
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import nltk
+
+# NLTK resources: name -> path checked in the local nltk_data directories
+NLTK_RESOURCES = {
+    "stopwords": "corpora/stopwords",
+    "wordnet": "corpora/wordnet",
+    "omw-1.4": "corpora/omw-1.4",
+}
+_nltk_ready = set()
+
+
+def ensure_nltk(*names: str):
+    """Download NLTK resources only if they are not installed locally (checked once per process)."""
+    for name in names:
+        if name in _nltk_ready:
+            continue
+        try:
+            nltk.data.find(NLTK_RESOURCES[name])
+        except LookupError:
+            nltk.download(name, quiet=True)
+        _nltk_ready.add(name)
+
+
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9\s]')
+
+
+class TextPreprocessor:
+    """
+    Embedder preprocessing: lowercase, drop non-alphanumeric characters, remove English
+    stopwords and lemmatize with WordNet.
+
+    Two bounded LRU caches avoid repeating work:
+      - token -> lemma (vocabularies are small, so nearly every token is a hit)
+      - text -> preprocessed text (repeated queries, unchanged documents on rebuild)
+
+    `preprocess_many` handles a whole corpus: duplicates are processed once and large
+    inputs are split into chunks preprocessed in parallel worker processes.
+    """
+
+    def __init__(self, token_cache_size: int = 100_000, text_cache_size: int = 50_000,
+                 stop_words: Optional[Iterable[str]] = None, lemmatizer=None):
+        """
+        Args:
+            token_cache_size: max entries of the per-token lemma cache
+            text_cache_size: max entries of the per-text result cache
+            stop_words: stopword set (default: NLTK English stopwords, loaded on first use)
+            lemmatizer: object with `lemmatize(token)` (default: WordNetLemmatizer)
+        """
+        self.token_cache_size = token_cache_size
+        self.text_cache_size = text_cache_size
+        self._stop_words = frozenset(stop_words) if stop_words is not None else None
+        self._lemmatizer = lemmatizer
+        self.lemmatize = lru_cache(maxsize=token_cache_size)(self._lemmatize)
+        self._texts: "OrderedDict[str, str]" = OrderedDict()  # LRU order, oldest first
+        self._lock = threading.Lock()
+        self._hits = self._misses = 0
+
+    @property
+    def stop_words(self) -> frozenset:
+        if self._stop_words is None:
+            from nltk.corpus import stopwords
+            ensure_nltk("stopwords")
+            self._stop_words = frozenset(stopwords.words('english'))
+        return self._stop_words
+
+    @property
+    def lemmatizer(self):
+        if self._lemmatizer is None:
+            from nltk.stem import WordNetLemmatizer
+            ensure_nltk("wordnet", "omw-1.4")
+            self._lemmatizer = WordNetLemmatizer()
+        return self._lemmatizer
+
+    def _lemmatize(self, token: str) -> str:
+        return self.lemmatizer.lemmatize(token)
+
+    def _preprocess(self, text: str) -> str:
+        # Lowercase and remove non-alphanumeric characters
+        text = _NON_ALNUM_RE.sub('', text.lower())
+
+        # Tokenize, remove stopwords, lemmatize
+        stop_words, lemmatize = self.stop_words, self.lemmatize
+        return ' '.join([lemmatize(t) for t in text.split() if t not in stop_words])
+
+    # -------------------- Text cache --------------------
+    def _cached(self, text: str) -> Optional[str]:
+        with self._lock:
+            out = self._texts.get(text)
+            if out is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._texts.move_to_end(text)
+            return out
+
+    def _store(self, pairs: Iterable[Tuple[str, str]]):
+        with self._lock:
+            for text, out in pairs:
+                self._texts[text] = out
+                self._texts.move_to_end(text)
+            while len(self._texts) > self.text_cache_size:
+                self._texts.popitem(last=False)
+
+    def preprocess(self, text: str) -> str:
+        out = self._cached(text)
+        if out is None:
+            out = self._preprocess(text)
+            self._store([(text, out)])
+        return out
+
+    def preprocess_many(self, texts: List[str], workers: Optional[int] = None, chunk_size: int = 2_000,
+                        parallel_min: int = 20_000) -> List[str]:
+        """
+        Preprocess a list of texts. Each distinct text is processed once; when at least
+        `parallel_min` distinct texts are not cached yet, they are split into `chunk_size`
+        chunks spread over `workers` processes (default: CPU count).
+        """
+        results: Dict[str, str] = {}
+        todo = []
+        for t in dict.fromkeys(texts):
+            out = self._cached(t)
+            if out is None:
+                todo.append(t)
+            else:
+                results[t] = out
+
+        workers = workers or os.cpu_count() or 1
+        if len(todo) >= parallel_min and workers > 1:
+            chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+            if self._lemmatizer is None:
+                ensure_nltk("wordnet", "omw-1.4")  # once here rather than racing in every worker
+            init = (self.token_cache_size, self.text_cache_size, self.stop_words, self._lemmatizer)
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=init) as pool:
+                for chunk, processed in zip(chunks, pool.map(_preprocess_chunk, chunks)):
+                    results.update(zip(chunk, processed))
+        else:
+            results.update((t, self._preprocess(t)) for t in todo)
+
+        self._store((t, results[t]) for t in todo)
+        return [results[t] for t in texts]
+
+    def cache_info(self) -> Dict[str, Any]:
+        with self._lock:
+            text = {"hits": self._hits, "misses": self._misses, "size": len(self._texts),
+                    "maxsize": self.text_cache_size}
+        return {"token": self.lemmatize.cache_info()._asdict(), "text": text}
+
+    def cache_clear(self):
+        self.lemmatize.cache_clear()
+        with self._lock:
+            self._texts.clear()
+            self._hits = self._misses = 0
+
+
+# -------------------- Worker processes --------------------
+_worker: Optional[TextPreprocessor] = None
+
+
+def _init_worker(token_cache_size, text_cache_size, stop_words, lemmatizer):
+    global _worker
+    _worker = TextPreprocessor(token_cache_size, text_cache_size, stop_words, lemmatizer)
+
+
+def _preprocess_chunk(texts: List[str]) -> List[str]:
+    return [_worker._preprocess(t) for t in texts]
@@ -0,0 +1,110 @@
+# quantization.py
+import json
+import os
+import numpy as np
+from typing import Optional
+from meta_store import write_atomic
+
+PRECISIONS = ("float32", "float16", "int8")
+
+
+class QuantizedMatrix:
+    """
+    Row-major matrix of normalized embeddings kept in a compact dtype.
+
+    precision:
+      - "float32": stored as is
+      - "float16": half precision, half the memory
+      - "int8":    symmetric per-row scalar quantization (int8 codes + one float32 scale
+                   per row), about a quarter of the memory
+
+    Dot products are computed on the compact form: rows are widened to float32 one
+    chunk at a time, so the full float32 matrix is never materialized.
+    """
+
+    def __init__(self, vectors: np.ndarray, precision: str = "float32", chunk_rows: int = 4096):
+        """
+        Args:
+            vectors: (n, dim) array
+            precision: one of PRECISIONS
+            chunk_rows: rows widened to float32 at a time in `dot`
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision {precision!r}, expected one of {PRECISIONS}")
+        self.precision = precision
+        self.chunk_rows = chunk_rows
+        vectors = np.asarray(vectors, dtype="float32")
+        self.shape = vectors.shape
+        self.scale = None
+        if precision == "float32":
+            self.codes = np.ascontiguousarray(vectors)
+        elif precision == "float16":
+            self.codes = vectors.astype("float16")
+        else:
+            max_abs = np.abs(vectors).max(axis=1) if len(vectors) else np.zeros(0, dtype="float32")
+            self.scale = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype("float32")
+            self.codes = np.clip(np.rint(vectors / self.scale[:, None]), -127, 127).astype("int8")
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    # -------------------- Persistence --------------------
+    def save(self, path: str, fingerprint: str = ""):
+        """
+        Codes (and int8 scales) as .npy files, config.json last; `fingerprint` identifies
+        what the vectors were computed from (see `saved_fingerprint`).
+        """
+        os.makedirs(path, exist_ok=True)
+        config_path = os.path.join(path, "config.json")
+        if os.path.exists(config_path):
+            os.remove(config_path)  # until the new one is written, no fingerprint matches the mixed files
+        write_atomic(os.path.join(path, "codes.npy"), lambda f: np.save(f, self.codes))
+        if self.scale is not None:
+            write_atomic(os.path.join(path, "scale.npy"), lambda f: np.save(f, self.scale))
+        config = {"precision": self.precision, "shape": list(self.shape), "fingerprint": fingerprint}
+        write_atomic(config_path, lambda f: f.write(json.dumps(config).encode("utf-8")))
+
+    @staticmethod
+    def saved_fingerprint(path: str) -> Optional[str]:
+        try:
+            with open(os.path.join(path, "config.json"), "r", encoding="utf-8") as f:
+                return json.load(f).get("fingerprint")
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, chunk_rows: int = 4096) -> "QuantizedMatrix":
+        """Load saved codes; with mmap=True they are mapped read-only and shared between processes."""
+        with open(os.path.join(path, "config.json"), "r", encoding="utf-8") as f:
+            config = json.load(f)
+        mode = "r" if mmap else None
+        matrix = cls.__new__(cls)
+        matrix.precision = config["precision"]
+        matrix.chunk_rows = chunk_rows
+        matrix.shape = tuple(config["shape"])
+        matrix.codes = np.load(os.path.join(path, "codes.npy"), mmap_mode=mode)
+        matrix.scale = np.load(os.path.join(path, "scale.npy"), mmap_mode=mode) if matrix.precision == "int8" else None
+        return matrix
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def dequantize(self, rows=slice(None)) -> np.ndarray:
+        out = self.codes[rows].astype("float32")
+        if self.scale is not None:
+            out *= self.scale[rows][:, None]
+        return out
+
+    def dot(self, queries: np.ndarray) -> np.ndarray:
+        """queries (m, dim) float32 -> (m, n) float32 inner products with every row."""
+        queries = np.asarray(queries, dtype="float32")
+        if self.precision == "float32":
+            return queries @ self.codes.T
+        out = np.empty((queries.shape[0], self.shape[0]), dtype="float32")
+        for start in range(0, self.shape[0], self.chunk_rows):
+            rows = slice(start, start + self.chunk_rows)
+            out[:, rows] = queries @ self.codes[rows].astype("float32").T
+            if self.scale is not None:
+                out[:, rows] *= self.scale[rows]
+        return out
@@ -1,7 +1,12 @@
 # recommender.py
+import hashlib
+import heapq
+import threading
 import numpy as np
-from sklearn.preprocessing import MinMaxScaler
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional, Tuple, Union
+from meta_store import MetadataStore, TYPE_ITEM, file_lock
+from sparse_index import top_k
+from quantization import QuantizedMatrix
 
 class SimpleRecommender:
     """
@@ -9,38 +14,191 @@ class SimpleRecommender:
       - Semantic similarity (sentence embeddings)
       - Popularity (# of orders)
       - Ratings (avg user rating)
+
+    Only menu items are scored; FAQ chunks are never recommended. Item vectors are kept
+    in one compact matrix and can be taken from the FAISS index instead of re-encoded.
     """
 
-    def __init__(self, docs: List[Dict[str, Any]], embedder):
+    def __init__(self, docs, embedder, doc_embeddings: Optional[np.ndarray] = None,
+                 item_embeddings: Union[np.ndarray, QuantizedMatrix, None] = None, precision: str = "float32"):
         """
         Args:
-            docs: list of dicts with 'text' and 'meta' (must include 'num_orders' and 'avg_rating')
+            docs: MetadataStore, or list of dicts with 'text' and 'meta' (must include 'num_orders' and 'avg_rating')
             embedder: a sentence-transformers model wrapper
+            doc_embeddings: optional normalized vectors for all docs, shape (len(docs), dim)
+            item_embeddings: optional normalized vectors for the item docs only, in document order
+                (a QuantizedMatrix is used as is, e.g. one loaded memory-mapped)
+            precision: storage of the item matrix, "float32", "float16" or "int8" (see QuantizedMatrix)
         """
         self.docs = docs
-        self.texts = [d['text'] for d in docs]
         self.embedder = embedder
 
-        if not docs:
+        if not len(docs):
             raise ValueError("Docs list cannot be empty.")
 
-        # Extract metadata
-        self.pop = np.array([d['meta'].get('num_orders', 0) for d in docs], dtype=float)
-        self.rating = np.array([d['meta'].get('avg_rating', 0.0) for d in docs], dtype=float)
+        # Document positions of the candidate items; all arrays below are parallel to it
+        self.item_idx = self.item_positions(docs)
+
+        # Extract metadata (typed columns when the store has them, no dicts built)
+        if isinstance(docs, MetadataStore):
+            pop = docs.num_orders()[self.item_idx].astype(float)
+            rating = docs.avg_ratings()[self.item_idx].astype(float)
+        else:
+            pop = np.array([docs[i]['meta'].get('num_orders', 0) for i in self.item_idx], dtype=float)
+            rating = np.array([docs[i]['meta'].get('avg_rating', 0.0) for i in self.item_idx], dtype=float)
+
+        # Popularity/rating state, updated by `ingest_orders`
+        self._write_lock = threading.Lock()
+        self._item_pos: Optional[Dict[str, int]] = None  # item_id -> item slot, built on first ingest
+        self._rated = pop.copy()  # orders behind each average rating (the snapshot counts all as rated)
+        self._pop_range = _RunningRange(pop)
+        self._rating_range = _RunningRange(rating)
+        self._stats = _Stats(pop, rating, self._pop_range, self._rating_range)
+
+        # Item vectors: given, sliced from all-doc vectors, or encoded (items only)
+        if item_embeddings is None and doc_embeddings is not None:
+            item_embeddings = np.asarray(doc_embeddings)[self.item_idx]
+        if item_embeddings is None:
+            texts = [docs[int(i)]['text'] for i in self.item_idx]
+            item_embeddings = self.embedder.encode(texts, normalize=True)
+        assert len(item_embeddings) == len(self.item_idx), "Item vectors and items length mismatch"
+        if not isinstance(item_embeddings, QuantizedMatrix):
+            item_embeddings = QuantizedMatrix(item_embeddings, precision)
+        self.item_embeddings = item_embeddings
+
+    @staticmethod
+    def item_positions(docs) -> np.ndarray:
+        """Positions of the menu items in docs (all docs when none is typed as an item)."""
+        if isinstance(docs, MetadataStore):
+            is_item = docs.types() == TYPE_ITEM
+        else:
+            is_item = np.array([d['meta'].get('type') == 'item' for d in docs], dtype=bool)
+        if not is_item.any():
+            return np.arange(len(docs))  # untyped documents: everything is a candidate
+        return np.flatnonzero(is_item)
+
+    @classmethod
+    def from_indexer(cls, docs, embedder, indexer, precision: str = "float32",
+                     cache_path: Optional[str] = None) -> "SimpleRecommender":
+        """
+        Build with the item vectors already stored in `indexer` instead of re-encoding them.
+        Flat / HNSW indexes keep exact vectors; other index types fall back to encoding.
+
+        With `cache_path`, the item matrix is saved there and memory-mapped, so worker
+        processes share one copy; it is reused while the items, the embedder and the
+        precision stay the same. Processes sharing it take turns through a lock file in it.
+        """
+        positions = cls.item_positions(docs)
+        if cache_path is None:
+            return cls._from_vectors(docs, embedder, indexer, positions, precision)
+
+        fingerprint = cls._items_fingerprint(docs, positions, embedder, precision)
+        with file_lock(cache_path):  # checked under the lock: only the first worker to see new items writes
+            if QuantizedMatrix.saved_fingerprint(cache_path) == fingerprint:
+                try:
+                    return cls(docs, embedder, item_embeddings=QuantizedMatrix.load(cache_path))
+                except (OSError, ValueError):
+                    pass  # damaged files: recompute them
+            rec = cls._from_vectors(docs, embedder, indexer, positions, precision)
+            rec.item_embeddings.save(cache_path, fingerprint)
+            rec.item_embeddings = QuantizedMatrix.load(cache_path)
+            return rec
+
+    @classmethod
+    def _from_vectors(cls, docs, embedder, indexer, positions: np.ndarray, precision: str) -> "SimpleRecommender":
+        try:
+            vectors = indexer.reconstruct_positions(positions)
+        except RuntimeError:
+            vectors = None
+        return cls(docs, embedder, item_embeddings=vectors, precision=precision)
+
+    @staticmethod
+    def _items_fingerprint(docs, positions: np.ndarray, embedder, precision: str) -> str:
+        h = hashlib.sha1(f"{embedder.cache_namespace()}|{precision}".encode("utf-8"))
+        for i in positions:
+            doc = docs[int(i)]
+            h.update(f"\0{doc['id']}\0{doc['text']}".encode("utf-8"))
+        return h.hexdigest()
+
+    # -------------------- Popularity / rating --------------------
+    # Current snapshot; min-max normalized on read (constant columns → 0)
+    @property
+    def pop(self) -> np.ndarray:
+        return self._stats.pop
+
+    @property
+    def rating(self) -> np.ndarray:
+        return self._stats.rating
+
+    @property
+    def pop_norm(self) -> np.ndarray:
+        return self._stats.pop_norm()
+
+    @property
+    def rating_norm(self) -> np.ndarray:
+        return self._stats.rating_norm()
+
+    def ingest_orders(self, events: Iterable[Tuple[str, Optional[float]]]) -> Dict[str, int]:
+        """
+        Apply a batch of order events to popularity and ratings.
+
+        Each event is (item_id, rating); rating may be None for an unrated order. Counts
+        and running means are updated for the changed items only, and the min/max used
+        for normalization is maintained incrementally. The new values are published as
+        one snapshot, so a concurrent `recommend` sees either all of the batch or none.
+
+        Returns:
+            {"events", "changed" (items), "unknown" (events for unknown item ids)}
+        """
+        events = list(events)
+        with self._write_lock:
+            if self._item_pos is None:
+                self._item_pos = {self.docs[int(i)]['meta'].get('item_id'): j for j, i in enumerate(self.item_idx)}
+            slots, ratings, unknown = [], [], 0
+            for item_id, rating in events:
+                j = self._item_pos.get(str(item_id))
+                if j is None:
+                    unknown += 1
+                    continue
+                slots.append(j)
+                ratings.append(np.nan if rating is None else float(rating))
+            if not slots:
+                return {"events": len(events), "changed": 0, "unknown": unknown}
 
-        # Normalize popularity and ratings → scale [0,1]
-        self.pop_norm = self._normalize(self.pop)
-        self.rating_norm = self._normalize(self.rating)
+            slots, ratings = np.asarray(slots, dtype="int64"), np.asarray(ratings, dtype=float)
+            changed, inverse = np.unique(slots, return_inverse=True)
+            orders = np.bincount(inverse, minlength=len(changed)).astype(float)
+            rated = ~np.isnan(ratings)
+            n_rated = np.bincount(inverse[rated], minlength=len(changed)).astype(float)
+            rating_sum = np.bincount(inverse[rated], weights=ratings[rated], minlength=len(changed))
 
-        # Precompute embeddings for all docs to avoid recomputing on every query
-        self.doc_embeddings = self.embedder.encode(self.texts, normalize=True)
+            # Copy-on-write: readers keep using the previous arrays until the swap below
+            old = self._stats
+            pop, rating = old.pop.copy(), old.rating.copy()
+            pop[changed] += orders
+            prev_rated = self._rated[changed]
+            total_rated = prev_rated + n_rated
+            has_rating = total_rated > 0
+            rating[changed[has_rating]] = ((rating[changed] * prev_rated + rating_sum)[has_rating]
+                                           / total_rated[has_rating])
+            self._rated[changed] = total_rated
 
-    def _normalize(self, arr: np.ndarray) -> np.ndarray:
-        """Utility to normalize metadata values safely"""
-        if len(arr) == 0:
-            return np.zeros_like(arr)
-        scaler = MinMaxScaler()
-        return scaler.fit_transform(arr.reshape(-1, 1)).ravel()
+            self._pop_range.update(changed, pop[changed])
+            self._rating_range.update(changed, rating[changed])
+            self._stats = _Stats(pop, rating, self._pop_range, self._rating_range)
+        return {"events": len(events), "changed": int(len(changed)), "unknown": unknown}
+
+    def _results(self, scores: np.ndarray, k: int, stats: "_Stats") -> List[Dict[str, Any]]:
+        # Partial selection over items, ties by document order
+        top_scores, top_items = top_k(scores, np.arange(len(scores)), k)
+        results = []
+        for s, j in zip(top_scores, top_items):
+            doc = self.docs[int(self.item_idx[j])]
+            meta = doc['meta']
+            if meta.get('type') == 'item':
+                meta = dict(meta, num_orders=int(stats.pop[j]), avg_rating=float(stats.rating[j]))
+            results.append({"meta": meta, "text": doc['text'], "score": float(s)})
+        return results
 
     def recommend(self, user_pref_text: str, k: int = 5, alpha: float = 0.5, beta: float = 0.3, gamma: float = 0.2) -> List[Dict[str, Any]]:
         """
@@ -56,19 +214,81 @@ class SimpleRecommender:
         Returns:
             list of dicts with {'meta': ..., 'text': ..., 'score': ...}
         """
-        # Encode query (normalize to enable cosine similarity via dot product)
-        q_emb = self.embedder.encode([user_pref_text], normalize=True).squeeze()
+        return self.recommend_batch([user_pref_text], k=k, alpha=alpha, beta=beta, gamma=gamma)[0]
+
+    def recommend_batch(self, user_pref_texts: List[str], k: int = 5, alpha: float = 0.5, beta: float = 0.3,
+                        gamma: float = 0.2) -> List[List[Dict[str, Any]]]:
+        """
+        `recommend` for many preference strings: one encoder call and one matrix product.
+        Returns one result list per preference string.
+        """
+        if not user_pref_texts:
+            return []
+        # Encode queries (normalize to enable cosine similarity via dot product)
+        q_emb = self.embedder.encode(list(user_pref_texts), normalize=True)
 
-        # Cosine similarity (dot product since embeddings are normalized)
-        sims = self.doc_embeddings @ q_emb.T
+        # Cosine similarity (dot product since embeddings are normalized) + weighted popularity/rating
+        stats = self._stats  # one consistent snapshot for the whole call
+        scores = alpha * self.item_embeddings.dot(q_emb) + beta * stats.pop_norm() + gamma * stats.rating_norm()
+        return [self._results(row, k, stats) for row in scores]
 
-        # Final weighted score
-        final_score = alpha * sims + beta * self.pop_norm + gamma * self.rating_norm
 
-        # Top-k results
-        idxs = np.argsort(-final_score)[:k]
-        results = [
-            {"meta": self.docs[i]['meta'], "text": self.texts[i], "score": float(final_score[i])}
-            for i in idxs
-        ]
-        return results
+class _Stats:
+    """Immutable popularity/rating snapshot with the min/max it is normalized by."""
+
+    def __init__(self, pop: np.ndarray, rating: np.ndarray, pop_range: "_RunningRange",
+                 rating_range: "_RunningRange"):
+        self.pop, self.rating = pop, rating
+        self.pop_lo, self.pop_hi = pop_range.lo(), pop_range.hi()
+        self.rating_lo, self.rating_hi = rating_range.lo(), rating_range.hi()
+
+    @staticmethod
+    def _scale(arr: np.ndarray, lo: float, hi: float) -> np.ndarray:
+        return (arr - lo) / (hi - lo) if hi > lo else np.zeros_like(arr)
+
+    def pop_norm(self) -> np.ndarray:
+        return self._scale(self.pop, self.pop_lo, self.pop_hi)
+
+    def rating_norm(self) -> np.ndarray:
+        return self._scale(self.rating, self.rating_lo, self.rating_hi)
+
+
+class _RunningRange:
+    """
+    Min and max of a changing array in O(log n) per changed value: two heaps with lazy
+    deletion (an entry is stale once its slot has been updated again).
+    """
+
+    def __init__(self, values: np.ndarray):
+        self.n = len(values)
+        self.version = np.zeros(self.n, dtype="int64")
+        self._min = [(float(v), j, 0) for j, v in enumerate(values)]
+        self._max = [(-float(v), j, 0) for j, v in enumerate(values)]
+        heapq.heapify(self._min)
+        heapq.heapify(self._max)
+
+    def update(self, slots: np.ndarray, values: np.ndarray):
+        for j, v in zip(slots.tolist(), values.tolist()):
+            self.version[j] += 1
+            heapq.heappush(self._min, (v, j, int(self.version[j])))
+            heapq.heappush(self._max, (-v, j, int(self.version[j])))
+        if len(self._min) > 4 * max(self.n, 16):
+            self._compact()
+
+    def _top(self, heap: list) -> float:
+        while heap and heap[0][2] != self.version[heap[0][1]]:
+            heapq.heappop(heap)  # superseded value
+        return heap[0][0] if heap else 0.0
+
+    def lo(self) -> float:
+        return self._top(self._min)
+
+    def hi(self) -> float:
+        return -self._top(self._max)
+
+    def _compact(self):
+        self._min = [e for e in self._min if e[2] == self.version[e[1]]]
+        self._max = [e for e in self._max if e[2] == self.version[e[1]]]
+        heapq.heapify(self._min)
+        heapq.heapify(self._max)
+
@@ -1,14 +1,90 @@
 # reranker.py
 from sentence_transformers import CrossEncoder
-from typing import List, Dict, Any
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+from batching import MicroBatcher
+from faq_fastpath import FAQFastPath
+from inference import InferenceConfig
 
 class Reranker:
     """
     Reranks candidate documents based on a CrossEncoder model.
     """
 
-    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", device: str = "cpu"):
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", device: str = "cpu",
+                 inference: Optional[InferenceConfig] = None, score_cache_size: int = 10_000):
+        """
+        Args:
+            inference: CPU inference settings (quantization, threads); default eager float32
+            score_cache_size: max (query, text) -> score entries kept (0 disables the cache)
+        """
         self.model = CrossEncoder(model_name, device=device)
+        self.inference = inference or InferenceConfig()
+        # The transformer inside the CrossEncoder wrapper
+        self.model.model = self.inference.optimize(self.model.model)
+        self.batcher = None
+
+        self.score_cache_size = score_cache_size
+        self._scores: "OrderedDict[Tuple[str, str], float]" = OrderedDict()  # LRU, oldest first
+        self._lock = threading.Lock()
+        self._counts = {"calls": 0, "skipped_exact": 0, "skipped_margin": 0, "reranked": 0,
+                        "pairs_scored": 0, "pairs_cached": 0}
+
+    def enable_batching(self, max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        """
+        Coalesce (query, text) pairs from concurrent `rerank` calls into shared
+        CrossEncoder.predict calls (see batching.MicroBatcher).
+        """
+        if self.batcher is None:
+            self.batcher = MicroBatcher(self._predict, max_batch_size=max_batch_size,
+                                        max_wait_ms=max_wait_ms, name="rerank-batcher")
+
+    def _predict(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        with self.inference.context():
+            scores = self.model.predict(list(pairs), batch_size=max(1, len(pairs)))
+        return [float(s) for s in scores]
+
+    def score_pairs(self, pairs: Sequence[Tuple[str, str]]) -> List[float]:
+        """Relevance score per (query, text) pair, through the batcher when enabled."""
+        if not pairs:
+            return []
+        if self.batcher is None:
+            return self._predict(list(pairs))
+        return self.batcher.map(pairs)
+
+    def _candidate_text(self, c: Dict[str, Any]) -> str:
+        # Attempt to get text from 'text', 'item_name', or 'answer'
+        return c.get('text') or c.get('meta', {}).get('item_name') or c.get('meta', {}).get('answer') or ""
+
+    def _count(self, **deltas: int):
+        with self._lock:
+            for key, n in deltas.items():
+                self._counts[key] += n
+
+    def cached_scores(self, query: str, texts: List[str]) -> List[float]:
+        """`score_pairs` for one query through the (query, text) LRU score cache."""
+        scores: List[Optional[float]] = [None] * len(texts)
+        missing = []
+        with self._lock:
+            for i, t in enumerate(texts):
+                s = self._scores.get((query, t))
+                if s is None:
+                    missing.append(i)
+                else:
+                    self._scores.move_to_end((query, t))
+                    scores[i] = s
+        fresh = self.score_pairs([(query, texts[i]) for i in missing])
+        with self._lock:
+            for i, s in zip(missing, fresh):
+                scores[i] = s
+                if self.score_cache_size:
+                    self._scores[(query, texts[i])] = s
+            while len(self._scores) > self.score_cache_size:
+                self._scores.popitem(last=False)
+            self._counts["pairs_scored"] += len(missing)
+            self._counts["pairs_cached"] += len(texts) - len(missing)
+        return scores
 
     def rerank(self, query: str, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -21,14 +97,7 @@ class Reranker:
         Returns:
             List of dicts with added 'rerank_score', sorted by descending score
         """
-        pairs = []
-
-        for c in candidates:
-            # Attempt to get text from 'text', 'item_name', or 'answer'
-            text = c.get('text') or c.get('meta', {}).get('item_name') or c.get('meta', {}).get('answer') or ""
-            pairs.append((query, text))
-
-        scores = self.model.predict(pairs)
+        scores = self.cached_scores(query, [self._candidate_text(c) for c in candidates])
 
         for i, s in enumerate(scores):
             candidates[i]['rerank_score'] = float(s)
@@ -36,3 +105,51 @@ class Reranker:
         # Sort descending by rerank score
         candidates_sorted = sorted(candidates, key=lambda x: -x['rerank_score'])
         return candidates_sorted
+
+    def rerank_adaptive(self, query: str, candidates: List[Dict[str, Any]], margin: float = 0.15,
+                        top_n: int = 5) -> List[Dict[str, Any]]:
+        """
+        Confidence-gated rerank of hybrid_search results (sorted by their 'score').
+
+        - an FAQ candidate whose question equals the query: moved to the front, no rerank
+        - top hybrid score ahead of the runner-up by at least `margin`: order kept, no rerank
+        - otherwise: only the first `top_n` candidates are reranked, the rest keep their order
+
+        Every returned candidate gets 'rerank_path' ("exact", "margin" or "reranked").
+        """
+        self._count(calls=1)
+        if not candidates:
+            return candidates
+
+        key = FAQFastPath.key(query)
+        for i, c in enumerate(candidates):
+            meta = c.get('meta', {})
+            if meta.get('type') == 'faq' and FAQFastPath.key(str(meta.get('question', ''))) == key:
+                self._count(skipped_exact=1)
+                ordered = [c] + candidates[:i] + candidates[i + 1:]
+                return self._tag(ordered, "exact")
+
+        scores = [c.get('score', 0.0) for c in candidates]
+        if len(scores) == 1 or scores[0] - scores[1] >= margin:
+            self._count(skipped_margin=1)
+            return self._tag(list(candidates), "margin")
+
+        self._count(reranked=1)
+        head = self.rerank(query, candidates[:top_n])
+        return self._tag(head + candidates[top_n:], "reranked")
+
+    @staticmethod
+    def _tag(candidates: List[Dict[str, Any]], path: str) -> List[Dict[str, Any]]:
+        for c in candidates:
+            c['rerank_path'] = path
+        return candidates
+
+    def stats(self) -> Dict[str, float]:
+        """Counters for each rerank path and the score cache, plus rates."""
+        with self._lock:
+            counts = dict(self._counts)
+        calls = counts["calls"] or 1
+        pairs = (counts["pairs_scored"] + counts["pairs_cached"]) or 1
+        counts["skip_rate"] = (counts["skipped_exact"] + counts["skipped_margin"]) / calls
+        counts["cache_hit_rate"] = counts["pairs_cached"] / pairs
+        return counts
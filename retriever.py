@@ -1,7 +1,9 @@
 # retriever.py
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from typing import List, Dict, Any
+from concurrent.futures import Executor
+from typing import List, Dict, Any, Optional
+from meta_store import MetadataStore, doc_texts
+from sparse_index import SparseIndex
 
 class MyRetriever:
     """Simple wrapper retriever for FAISS indexer"""
@@ -13,47 +15,74 @@ class HybridRetriever:
     """
     Hybrid retriever combining:
       - Dense embeddings (via FAISS indexer)
-      - Sparse TF-IDF recall
+      - Sparse TF-IDF (or BM25) recall through an inverted index
     """
-    def __init__(self, docs: List[Dict[str, Any]], embedder, faiss_indexer, max_features: int = 5000):
+    def __init__(self, docs, embedder, faiss_indexer, max_features: int = 5000, sparse_scoring: str = "tfidf",
+                 sparse: Optional[SparseIndex] = None):
+        """
+        Args:
+            docs: MetadataStore (usually `faiss_indexer.store`) or list of document dicts
+            sparse_scoring: "tfidf" (cosine over TF-IDF) or "bm25"
+            sparse: prebuilt SparseIndex over `docs` (e.g. SparseIndex.load_or_build, memory-mapped);
+                built here from the document texts if None
+        """
         self.docs = docs
-        self.texts = [d['text'] for d in docs]
         self.embedder = embedder
         self.indexer = faiss_indexer
 
-        # Fit TF-IDF on corpus (1-2 grams)
-        self.tfidf = TfidfVectorizer(ngram_range=(1, 2), max_features=max_features)
-        self.tfidf_matrix = self.tfidf.fit_transform(self.texts)
+        # Inverted index over the 1-2 gram vocabulary
+        if sparse is None:
+            sparse = SparseIndex(doc_texts(docs), scoring=sparse_scoring, max_features=max_features)
+        self.sparse = sparse
 
-    def dense_search(self, query: str, k: int = 10) -> List[Dict[str, Any]]:
-        """Search using dense embeddings + FAISS"""
-        q_emb = self.embedder.encode([query])  # already normalized
+    def dense_search(self, query: str, k: int = 10, q_emb: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Search using dense embeddings + FAISS (pass `q_emb` to reuse an already encoded query)"""
+        if q_emb is None:
+            q_emb = self.embedder.encode([query])  # already normalized
         results = self.indexer.search(q_emb, top_k=k)
         return results
 
     def sparse_search(self, query: str, k: int = 10) -> List[Dict[str, Any]]:
-        """Search using TF-IDF cosine similarity"""
-        q_vec = self.tfidf.transform([query])
-        scores = (self.tfidf_matrix @ q_vec.T).toarray().ravel()
-
-        top_idx = np.argsort(-scores)[:k]
+        """Search using TF-IDF cosine similarity (or BM25), touching only documents that share a term"""
+        scores, top_idx = self.sparse.search(query, k)
         results = [
-            {"index": i, "meta": self.docs[i]['meta'], "score": float(scores[i])}
-            for i in top_idx if scores[i] > 0
+            {"index": int(i), "meta": self._meta(i), "score": float(s)}
+            for i, s in zip(top_idx, scores)
         ]
         return results
 
-    def hybrid_search(self, query: str, k: int = 8, alpha: float = 0.6) -> List[Dict[str, Any]]:
+    def _meta(self, i: int) -> Dict[str, Any]:
+        # The columnar store can build the meta alone, without the text and id of the document
+        return self.docs.meta(i) if isinstance(self.docs, MetadataStore) else self.docs[i]['meta']
+
+    def _text(self, i: int) -> str:
+        return self.docs.text(i) if isinstance(self.docs, MetadataStore) else self.docs[i]['text']
+
+    def hybrid_search(self, query: str, k: int = 8, alpha: float = 0.6,
+                      q_emb: Optional[np.ndarray] = None, executor: Optional[Executor] = None,
+                      with_text: bool = False) -> List[Dict[str, Any]]:
         """
         Hybrid search combining dense + sparse scores.
         Args:
             query: user query string
             k: number of results to return
             alpha: weight for dense (0-1). Higher alpha → more dense influence.
+            q_emb: normalized query embedding, shape (1, dim); encoded here if None
+            executor: if given, the sparse search runs on it while the dense search runs here
+            with_text: add each result's document 'text' (for the reranker and the prompt)
         """
-        dense = self.dense_search(query, k=k * 2)
-        sparse = self.sparse_search(query, k=k * 2)
+        if executor is not None:
+            sparse_future = executor.submit(self.sparse_search, query, k * 2)
+            dense = self.dense_search(query, k=k * 2, q_emb=q_emb)
+            sparse = sparse_future.result()
+        else:
+            dense = self.dense_search(query, k=k * 2, q_emb=q_emb)
+            sparse = self.sparse_search(query, k=k * 2)
+        return self.fuse(dense, sparse, k=k, alpha=alpha, with_text=with_text)
 
+    def fuse(self, dense: List[Dict[str, Any]], sparse: List[Dict[str, Any]], k: int = 8, alpha: float = 0.6,
+             with_text: bool = False) -> List[Dict[str, Any]]:
+        """Weighted merge of dense_search and sparse_search results (see hybrid_search)."""
         combined = {}
 
         # Add dense results
@@ -86,5 +115,101 @@ class HybridRetriever:
             }
             for idx, v in combined.items()
         ]
+        results = sorted(results, key=lambda x: -x['score'])[:k]
+
+        # Texts only for the survivors; indices come from the index, so they are always valid
+        if with_text:
+            for r in results:
+                r['text'] = self._text(r['index'])
+        return results
+
+    def hybrid_search_batch(self, queries: List[str], k: int = 8, alpha: float = 0.6) -> List[List[Dict[str, Any]]]:
+        """
+        Batched `hybrid_search`: one encoder forward pass, one FAISS search over the query
+        matrix, one sparse matrix product for the sparse scores, and score fusion in NumPy.
+
+        Returns one result list per query, in the same format as `hybrid_search`.
+        """
+        if not queries:
+            return []
+        queries = list(queries)
+        kk = k * 2
+
+        q_emb = self.embedder.encode(queries)  # already normalized
+        dense_scores, dense_idx = self.indexer.search_positions(q_emb, top_k=kk)
+        dense_scores = np.where(dense_idx >= 0, dense_scores.astype(float), 0.0)
+        sparse_scores, sparse_idx = self.sparse.search_batch(queries, kk)
+
+        # match[q, s, d]: sparse hit s of query q is the same document as dense hit d
+        match = (sparse_idx[:, :, None] == dense_idx[:, None, :]) & (sparse_idx[:, :, None] >= 0)
+        in_dense = match.any(axis=2)
+
+        # Dense hits pick up the sparse score of the same document, sparse-only hits get dense 0
+        fused_dense = alpha * dense_scores + (1 - alpha) * (match * sparse_scores[:, :, None]).sum(axis=1)
+        fused_sparse = (1 - alpha) * sparse_scores
+
+        cand_idx = np.hstack([dense_idx, np.where(in_dense, -1, sparse_idx)])
+        cand_score = np.hstack([fused_dense, fused_sparse])
+        cand_score = np.where(cand_idx >= 0, cand_score, -np.inf)
+
+        order = np.argsort(-cand_score, axis=1, kind="stable")[:, :k]
+        top_idx = np.take_along_axis(cand_idx, order, axis=1)
+        top_score = np.take_along_axis(cand_score, order, axis=1)
+
+        results = []
+        for idx_row, score_row in zip(top_idx, top_score):
+            results.append([
+                {"index": int(i), "meta": self._meta(i), "score": float(s)}
+                for i, s in zip(idx_row, score_row) if i >= 0
+            ])
+        return results
+
+
+class MergedRetriever(HybridRetriever):
+    """
+    Hybrid search over several HybridRetrievers (shards) as if they were one corpus, e.g. a
+    location's menu shard plus the FAQ shard shared by every location.
+
+    Documents of shard i are numbered from offsets[i], so result indices stay unique.
+    Dense scores are cosine similarities from the same embedder and compare directly;
+    sparse scores are TF-IDF cosines with per-shard IDF weights (close enough to merge,
+    less so with BM25).
+    """
+
+    def __init__(self, shards: List[HybridRetriever]):
+        self.shards = list(shards)
+        self.offsets = np.cumsum([0] + [len(s.docs) for s in self.shards])
+        self.embedder = self.shards[0].embedder
+        self.docs = None  # no single store: documents are resolved through their shard
+        self.indexer = None
+        self.sparse = None
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    def _locate(self, i: int):
+        s = int(np.searchsorted(self.offsets, i, side="right")) - 1
+        return self.shards[s], int(i - self.offsets[s])
+
+    def _meta(self, i: int) -> Dict[str, Any]:
+        shard, j = self._locate(i)
+        return shard._meta(j)
+
+    def _text(self, i: int) -> str:
+        shard, j = self._locate(i)
+        return shard._text(j)
+
+    def _merge(self, per_shard: List[List[Dict[str, Any]]], k: int) -> List[Dict[str, Any]]:
+        results = [dict(r, index=r['index'] + int(off)) for rows, off in zip(per_shard, self.offsets) for r in rows]
+        return sorted(results, key=lambda r: -r['score'])[:k]
+
+    def dense_search(self, query: str, k: int = 10, q_emb: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        if q_emb is None:
+            q_emb = self.embedder.encode([query])  # encoded once for every shard
+        return self._merge([s.dense_search(query, k=k, q_emb=q_emb) for s in self.shards], k)
+
+    def sparse_search(self, query: str, k: int = 10) -> List[Dict[str, Any]]:
+        return self._merge([s.sparse_search(query, k=k) for s in self.shards], k)
 
-        return sorted(results, key=lambda x: -x['score'])[:k]
+    def hybrid_search_batch(self, queries: List[str], k: int = 8, alpha: float = 0.6) -> List[List[Dict[str, Any]]]:
+        return [self.hybrid_search(q, k=k, alpha=alpha) for q in queries]
@@ -0,0 +1,290 @@
+# server.py
+"""
+HTTP API for POS terminals and kiosks, on the same CafeBot pipeline as the CLI and the app.
+
+Endpoints (JSON in, JSON out):
+  POST /ask        {"question": str, "user_pref": str?}
+                   -> {"answer", "source", "sources": [meta, ...], "data_version"}
+  POST /recommend  {"preferences": str?, "k": int?}
+                   -> {"items": [{"item_name", "score", "meta"}, ...], "data_version"}
+  GET  /metrics    per-stage timings and counters, Prometheus text format
+  GET  /health     {"status": "ok", "data_version", "in_flight"}
+
+The event loop only parses HTTP. Model work (encoding, reranking, generation) runs on a
+bounded thread pool; the reranker and generator micro-batch the calls of concurrent
+requests. Backpressure: at most --max-pending requests are admitted (queued or
+running), anything beyond gets 503 right away instead of queueing without bound.
+A request that takes longer than --timeout gets 504 (its work still completes and
+fills the caches). The process keeps no per-client state, so instances can be run
+side by side behind a load balancer.
+
+Usage:
+    python server.py
+    python server.py --port 8080 --workers 8 --max-pending 64 --timeout 20
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from embedder import Embedder
+from embedding_cache import EmbeddingCache
+from reranker import Reranker
+from generator import Generator
+from hot_reload import SnapshotManager
+from metrics import Metrics, PrometheusMetrics
+from pipeline import CafeBot
+
+logger = logging.getLogger(__name__)
+
+BASE = "Dataset/Chat Bot Dataset/"
+MAX_BODY = 64 * 1024
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+           504: "Gateway Timeout"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _string_field(body: Dict[str, Any], name: str) -> str:
+    """An optional string field of a request body ("" if absent or null)."""
+    value = body.get(name)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise HTTPError(400, f"'{name}' must be a string")
+    return value
+
+
+def _json_default(o):
+    return o.item() if hasattr(o, "item") else str(o)  # numpy scalars in metadata
+
+
+class CafeServer:
+    """asyncio HTTP/1.1 server (keep-alive, Content-Length bodies) in front of a CafeBot."""
+
+    def __init__(self, bot: CafeBot, workers: int = 4, max_pending: int = 32, timeout: float = 30.0,
+                 idle_timeout: float = 60.0):
+        """
+        Args:
+            bot: the pipeline; its metrics hook also receives "rejected" and "timeouts" counts
+            workers: threads running pipeline calls
+            max_pending: requests admitted at once (running + waiting for a worker)
+            timeout: seconds before a request is answered with 504
+            idle_timeout: seconds a keep-alive connection may stay idle (or take to send a request)
+        """
+        self.bot = bot
+        self.metrics: Metrics = bot.metrics
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cafebot-worker")
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.in_flight = 0  # admitted requests whose pipeline call has not finished (event loop only)
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    # -------------------- Lifecycle --------------------
+    async def start(self, host: str = "127.0.0.1", port: int = 8000):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server
+
+    async def serve_forever(self, host: str = "127.0.0.1", port: int = 8000):
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+        self.executor.shutdown(wait=False)
+
+    # -------------------- Offloading --------------------
+    async def run(self, fn, *args):
+        """
+        Run a blocking pipeline call on the worker pool, with admission control and a
+        timeout. The slot is held until the call really finishes, not until the client
+        gets its 504, so timed-out work still counts against `max_pending`.
+        """
+        if self.in_flight >= self.max_pending:
+            self.metrics.count("rejected")
+            raise HTTPError(503, "server busy, retry later")
+        self.in_flight += 1
+        future = asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        future.add_done_callback(self._finished)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.metrics.count("timeouts")
+            raise HTTPError(504, f"no answer within {self.timeout:g}s")
+
+    def _finished(self, _future):
+        self.in_flight -= 1
+
+    # -------------------- Endpoints --------------------
+    async def ask(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        question = _string_field(body, "question").strip()
+        if not question:
+            raise HTTPError(400, "'question' is required")
+        turn = await self.run(self.bot.ask, question, _string_field(body, "user_pref") or None)
+        return {
+            "answer": turn.answer,
+            "source": turn.source,
+            "sources": [c["meta"] for c in turn.context[:3]],
+            "data_version": turn.snapshot.version,
+        }
+
+    async def recommend(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        pref = _string_field(body, "preferences") or "popular"
+        try:
+            k = max(1, min(int(body.get("k", 5)), 50))
+        except (TypeError, ValueError):
+            raise HTTPError(400, "'k' must be an integer")
+        snapshot = self.bot.snapshot  # one snapshot for the items and the version they came from
+        recs = await self.run(self.bot.recommend, pref, k, snapshot)
+        return {
+            "items": [{"item_name": r["meta"].get("item_name"), "score": r["score"], "meta": r["meta"]}
+                      for r in recs],
+            "data_version": snapshot.version,
+        }
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, bytes, str]:
+        if path == "/metrics" and method == "GET":
+            text = self.metrics.render() if isinstance(self.metrics, PrometheusMetrics) else ""
+            return 200, text.encode("utf-8"), "text/plain; version=0.0.4"
+        if path == "/health" and method == "GET":
+            payload = {"status": "ok", "data_version": self.bot.snapshot.version, "in_flight": self.in_flight}
+        elif path in ("/ask", "/recommend"):
+            if method != "POST":
+                raise HTTPError(405, f"{path} expects POST")
+            try:
+                data = json.loads(body or b"{}")
+            except ValueError:
+                raise HTTPError(400, "body is not valid JSON")
+            if not isinstance(data, dict):
+                raise HTTPError(400, "body must be a JSON object")
+            payload = await (self.ask(data) if path == "/ask" else self.recommend(data))
+        else:
+            raise HTTPError(404, f"no route for {path}")
+        return 200, json.dumps(payload, ensure_ascii=False, default=_json_default).encode("utf-8"), "application/json"
+
+    # -------------------- HTTP --------------------
+    async def _read_request(self, reader: asyncio.StreamReader):
+        """
+        (method, path, headers, body), or None when the client closed the connection.
+        The whole request (not each line) must arrive within `idle_timeout`, so a client
+        sending headers slowly cannot hold the connection forever.
+        """
+        return await asyncio.wait_for(self._read_request_unbounded(reader), self.idle_timeout)
+
+    async def _read_request_unbounded(self, reader: asyncio.StreamReader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "malformed request line")
+        headers = {}
+        while True:
+            h = await reader.readline()
+            if h in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = h.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        raw_length = headers.get("content-length", "") or "0"
+        if not (raw_length.isascii() and raw_length.isdigit()):
+            raise HTTPError(400, "Content-Length must be a non-negative integer")
+        length = int(raw_length)
+        if length > MAX_BODY:
+            raise HTTPError(413, f"body larger than {MAX_BODY} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), urlsplit(target).path, headers, body
+
+    @staticmethod
+    def _write(writer: asyncio.StreamWriter, status: int, body: bytes, content_type: str, keep_alive: bool):
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                + ("Retry-After: 1\r\n" if status == 503 else "") + "\r\n")
+        writer.write(head.encode("latin-1") + body)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                keep_alive = True
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, body = request
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    status, payload, content_type = await self._dispatch(method, path, body)
+                except HTTPError as e:
+                    status, content_type = e.status, "application/json"
+                    payload = json.dumps({"error": str(e)}).encode("utf-8")
+                    keep_alive = keep_alive and e.status not in (400, 413)  # the stream may be out of sync
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception:  # pipeline failure: log it, keep serving, tell the client nothing internal
+                    self.metrics.count("errors")
+                    logger.exception("request failed")
+                    status, content_type = 500, "application/json"
+                    payload = json.dumps({"error": "internal server error"}).encode("utf-8")
+                self._write(writer, status, payload, content_type, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=min(8, os.cpu_count() or 1),
+                        help="threads running pipeline calls")
+    parser.add_argument("--max-pending", type=int, default=32, help="admitted requests before answering 503")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds before answering 504")
+    parser.add_argument("--data", default=BASE, help="directory with Item_to_id.csv, conversationo.csv, food.csv")
+    parser.add_argument("--reload-interval", type=float, default=30.0, help="seconds between data file checks")
+    args = parser.parse_args()
+
+    embedder = Embedder(cache=EmbeddingCache())
+    reranker = Reranker()
+    generator = Generator()
+    # Concurrent requests share model calls
+    reranker.enable_batching()
+    generator.enable_batching()
+
+    data = os.path.join(args.data, "")
+    snapshots = SnapshotManager(embedder, {"items": data + "Item_to_id.csv", "faq": data + "conversationo.csv",
+                                           "orders": data + "food.csv"}, interval=args.reload_interval)
+    snapshots.start_watching()
+    bot = CafeBot(embedder, reranker, generator, snapshots, metrics=PrometheusMetrics())
+
+    server = CafeServer(bot, workers=args.workers, max_pending=args.max_pending, timeout=args.timeout)
+    print(f"CafeBot API on http://{args.host}:{args.port} "
+          f"({args.workers} workers, {args.max_pending} pending max, {args.timeout:g}s timeout)")
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        snapshots.stop_watching()
+        bot.close()
+
+
+if __name__ == "__main__":
+    main()
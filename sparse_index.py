@@ -0,0 +1,185 @@
+# sparse_index.py
+import hashlib
+import json
+import os
+import pickle
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from typing import List, Optional, Tuple
+from meta_store import file_lock, write_atomic
+
+SCORINGS = ("tfidf", "bm25")
+_POSTING_ARRAYS = ("data", "indices", "indptr")
+
+
+def top_k(scores: np.ndarray, idx: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Best k (score, doc) pairs, highest score first and ties by document order.
+    Uses a partial selection, so the cost is O(hits) rather than a full sort.
+    """
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        scores, idx = scores[keep], idx[keep]
+    order = np.lexsort((idx, -scores))
+    return scores[order], idx[order]
+
+
+class SparseIndex:
+    """
+    Inverted index for sparse (keyword) retrieval.
+
+    The document-term matrix is stored column-major, so each vocabulary term maps to its
+    posting list (documents containing it, with weights). A query only touches the posting
+    lists of its own terms; memory and time are proportional to the number of hits, not
+    to the corpus size.
+
+    scoring:
+      - "tfidf": cosine similarity of l2-normalized TF-IDF vectors (1-2 grams)
+      - "bm25":  Okapi BM25 over the same n-gram vocabulary
+    """
+
+    def __init__(self, texts: List[str], scoring: str = "tfidf", ngram_range=(1, 2), max_features: int = 5000,
+                 k1: float = 1.5, b: float = 0.75):
+        self.fingerprint = self.fingerprint_of(texts, scoring, ngram_range, max_features, k1, b)
+        if scoring not in SCORINGS:
+            raise ValueError(f"Unknown scoring {scoring!r}, expected one of {SCORINGS}")
+        self.scoring = scoring
+        self.n_docs = len(texts)
+
+        if scoring == "tfidf":
+            self.vectorizer = TfidfVectorizer(ngram_range=ngram_range, max_features=max_features)
+            doc_term = self.vectorizer.fit_transform(texts)
+        else:
+            self.vectorizer = CountVectorizer(ngram_range=ngram_range, max_features=max_features)
+            doc_term = self._bm25_weights(self.vectorizer.fit_transform(texts), k1, b)
+
+        # Column-major = one posting list per term
+        self.postings = sparse.csc_matrix(doc_term, dtype="float64")
+        self.postings.sort_indices()
+
+    @staticmethod
+    def fingerprint_of(texts: List[str], scoring: str = "tfidf", ngram_range=(1, 2), max_features: int = 5000,
+                       k1: float = 1.5, b: float = 0.75) -> str:
+        """Hash of everything the index is built from (texts and settings)."""
+        h = hashlib.sha1(json.dumps([scoring, list(ngram_range), max_features, k1, b]).encode("utf-8"))
+        for text in texts:
+            h.update(text.encode("utf-8") + b"\0")
+        return h.hexdigest()
+
+    # -------------------- Persistence --------------------
+    def save(self, path: str):
+        """
+        Posting lists as flat .npy arrays (CSC data / indices / indptr) plus the fitted
+        vectorizer. config.json is written last, so a directory whose config matches is complete.
+        """
+        os.makedirs(path, exist_ok=True)
+        config_path = os.path.join(path, "config.json")
+        if os.path.exists(config_path):
+            os.remove(config_path)  # until the new one is written, no fingerprint matches the mixed files
+        for name in _POSTING_ARRAYS:
+            arr = getattr(self.postings, name)
+            write_atomic(os.path.join(path, f"postings_{name}.npy"), lambda f, arr=arr: np.save(f, arr))
+        write_atomic(os.path.join(path, "vectorizer.pkl"), lambda f: pickle.dump(self.vectorizer, f))
+        config = {"scoring": self.scoring, "n_docs": self.n_docs, "shape": list(self.postings.shape),
+                  "fingerprint": self.fingerprint}
+        write_atomic(config_path, lambda f: f.write(json.dumps(config).encode("utf-8")))
+
+    @staticmethod
+    def saved_fingerprint(path: str) -> Optional[str]:
+        try:
+            with open(os.path.join(path, "config.json"), "r", encoding="utf-8") as f:
+                return json.load(f).get("fingerprint")
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "SparseIndex":
+        """
+        Load a saved index. With mmap=True the posting arrays are memory-mapped read-only,
+        so worker processes share their pages; only the vectorizer is unpickled per process.
+        """
+        with open(os.path.join(path, "config.json"), "r", encoding="utf-8") as f:
+            config = json.load(f)
+        mode = "r" if mmap else None
+        data, indices, indptr = (np.load(os.path.join(path, f"postings_{name}.npy"), mmap_mode=mode)
+                                 for name in _POSTING_ARRAYS)
+        index = cls.__new__(cls)
+        index.scoring = config["scoring"]
+        index.n_docs = config["n_docs"]
+        index.fingerprint = config["fingerprint"]
+        with open(os.path.join(path, "vectorizer.pkl"), "rb") as f:
+            index.vectorizer = pickle.load(f)
+        # Saved with sorted indices; copy=False keeps the mapped arrays
+        index.postings = sparse.csc_matrix((data, indices, indptr), shape=tuple(config["shape"]), copy=False)
+        index.postings.has_sorted_indices = True
+        return index
+
+    @classmethod
+    def load_or_build(cls, texts: List[str], path: str, mmap: bool = True, **params) -> "SparseIndex":
+        """
+        Load the index saved at `path` if it was built from the same texts and settings,
+        else build it, save it and load the saved copy (so every process maps the same files).
+        Processes sharing `path` take turns through a lock file in it (meta_store.file_lock).
+        """
+        fingerprint = cls.fingerprint_of(texts, **params)
+        with file_lock(path):  # checked under the lock: only the first worker to see new texts rebuilds
+            if cls.saved_fingerprint(path) == fingerprint:
+                try:
+                    return cls.load(path, mmap=mmap)
+                except (OSError, ValueError, pickle.UnpicklingError):
+                    pass  # damaged files: rebuild them
+            index = cls(texts, **params)
+            index.save(path)
+            return cls.load(path, mmap=mmap) if mmap else index
+
+    @staticmethod
+    def _bm25_weights(tf: sparse.spmatrix, k1: float, b: float) -> sparse.csr_matrix:
+        """Turn raw term counts into per-(doc, term) BM25 contributions."""
+        tf = sparse.csr_matrix(tf, dtype="float64")
+        n_docs = tf.shape[0]
+        doc_len = np.asarray(tf.sum(axis=1)).ravel()
+        avg_len = doc_len.mean() if n_docs and doc_len.mean() > 0 else 1.0
+        df = np.bincount(tf.indices, minlength=tf.shape[1])
+        idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+        rows = np.repeat(np.arange(n_docs), np.diff(tf.indptr))
+        norm = k1 * (1 - b + b * doc_len[rows] / avg_len)
+        tf.data = idf[tf.indices] * tf.data * (k1 + 1) / (tf.data + norm)
+        return tf
+
+    def _query_matrix(self, queries: List[str]) -> sparse.csr_matrix:
+        q = sparse.csr_matrix(self.vectorizer.transform(queries), dtype="float64")
+        if self.scoring == "bm25":
+            q.data[:] = 1.0  # each distinct query term counts once
+        return q
+
+    def search(self, query: str, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (scores, doc indices) of the top-k documents sharing a term with the query.
+        Documents with a zero score are never returned.
+        """
+        scores, idx = self.search_batch([query], k)
+        hits = idx[0] >= 0
+        return scores[0][hits], idx[0][hits]
+
+    def search_batch(self, queries: List[str], k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score all queries with one sparse x sparse product. For every query term the product
+        walks that term's posting list only, and the result stays sparse (one entry per hit).
+        Returns (scores, indices) of shape (n_queries, k); missing hits have index -1.
+        """
+        q_mat = self._query_matrix(queries)                      # (n_queries, vocab)
+        scores = sparse.csr_matrix(q_mat @ self.postings.T)      # (n_queries, n_docs)
+        scores.eliminate_zeros()
+
+        top_scores = np.zeros((len(queries), k), dtype=float)
+        top_idx = np.full((len(queries), k), -1, dtype="int64")
+        for row in range(len(queries)):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            data, cols = scores.data[start:end], scores.indices[start:end].astype("int64")
+            positive = data > 0
+            row_scores, row_idx = top_k(data[positive], cols[positive], k)
+            top_scores[row, :len(row_idx)] = row_scores
+            top_idx[row, :len(row_idx)] = row_idx
+        return top_scores, top_idx
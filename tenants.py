@@ -0,0 +1,295 @@
+# tenants.py
+import os
+import re
+import threading
+import time
+import pandas as pd
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from data_loader import load_items, load_faq, load_orders, build_document_store
+from index_manifest import load_or_build_index
+from meta_store import doc_texts
+from retriever import HybridRetriever, MergedRetriever
+from sparse_index import SparseIndex
+from recommender import SimpleRecommender
+from faq_fastpath import FAQFastPath
+from menu_lookup import MenuLookup
+from answer_cache import SemanticAnswerCache
+from hot_reload import Snapshot, SnapshotManager
+
+ITEMS_FILE, FAQ_FILE, ORDERS_FILE = "Item_to_id.csv", "conversationo.csv", "food.csv"
+_TENANT_RE = re.compile(r"^[A-Za-z0-9][\w-]*$")  # a directory name, never a path (or "_shared_faq")
+
+# Empty frames with the columns build_document_store reads
+_NO_ITEMS = pd.DataFrame({"id": pd.Series(dtype=str), "item": pd.Series(dtype=str)})
+_NO_ORDERS = pd.DataFrame({"id": pd.Series(dtype=str), "times_appeared": pd.Series(dtype="int64"),
+                           "food_rating": pd.Series(dtype=float)})
+_NO_FAQ = pd.DataFrame({"question": pd.Series(dtype=str), "answer": pd.Series(dtype=str)})
+
+
+def _dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+class SharedFAQ:
+    """
+    The FAQ shard every location shares: its documents, FAISS index, sparse index and
+    fast path exist once per process instead of once per location.
+    """
+
+    def __init__(self, embedder, faq_path: str, cache_dir: str, index_params: Optional[Dict[str, Any]] = None):
+        self.path = faq_path
+        self.stamp = os.stat(faq_path).st_mtime_ns
+        self.faq = load_faq(faq_path)
+        docs = build_document_store(_NO_ITEMS, self.faq, _NO_ORDERS)
+        self.indexer, self.status = load_or_build_index(
+            docs, embedder, {"faq": faq_path}, index_path=os.path.join(cache_dir, "faiss.index"),
+            meta_path=os.path.join(cache_dir, "meta"), manifest_path=os.path.join(cache_dir, "manifest.json"),
+            index_params=index_params)
+        self.docs = self.indexer.store
+        sparse = SparseIndex.load_or_build(doc_texts(self.docs), os.path.join(cache_dir, "sparse"))
+        self.retriever = HybridRetriever(self.docs, embedder, self.indexer, sparse=sparse)
+        self.fastpath = FAQFastPath(self.faq, embedder)
+        self._pairs = set(zip((FAQFastPath.key(q) for q in self.faq["question"]), self.faq["answer"]))
+        self.nbytes = _dir_size(cache_dir)
+
+    def changed(self) -> bool:
+        try:
+            return os.stat(self.path).st_mtime_ns != self.stamp
+        except OSError:
+            return False  # file being replaced: keep serving the loaded copy
+
+    def own_rows(self, faq_df: pd.DataFrame) -> pd.DataFrame:
+        """Rows of a location's FAQ that the shared FAQ does not already answer the same way."""
+        keys = (FAQFastPath.key(q) for q in faq_df["question"])
+        shared = [(key, answer) in self._pairs for key, answer in zip(keys, faq_df["answer"])]
+        return faq_df[~pd.Series(shared, index=faq_df.index, dtype=bool)]
+
+
+class LayeredFAQ:
+    """FAQFastPath over a location's own FAQ rows first, then over the shared FAQ."""
+
+    def __init__(self, own: FAQFastPath, shared: FAQFastPath):
+        self.layers = [own, shared] if own.answers else [shared]
+        self._lock = threading.Lock()
+        self._counts = {"queries": 0, "exact": 0, "semantic": 0, "miss": 0}
+
+    def lookup(self, query: str, q_emb=None) -> Optional[Dict[str, Any]]:
+        hit = None
+        for layer in self.layers:
+            hit = layer.lookup(query, q_emb=q_emb)
+            if hit is not None:
+                break
+        with self._lock:
+            self._counts["queries"] += 1
+            self._counts["miss" if hit is None else hit["match"]] += 1
+        return hit
+
+    def stats(self) -> Dict[str, float]:
+        """Same counters and rates as FAQFastPath.stats, for this location only."""
+        with self._lock:
+            counts = dict(self._counts)
+        total = counts["queries"] or 1
+        counts["exact_rate"] = counts["exact"] / total
+        counts["semantic_rate"] = counts["semantic"] / total
+        counts["hit_rate"] = (counts["exact"] + counts["semantic"]) / total
+        return counts
+
+
+class TenantView:
+    """One location of a TenantStore, usable wherever a SnapshotManager is (e.g. CafeBot)."""
+
+    def __init__(self, store: "TenantStore", tenant: str):
+        self.store = store
+        self.tenant = tenant
+
+    @property
+    def current(self) -> Snapshot:
+        return self.store.get(self.tenant)
+
+
+class TenantStore:
+    """
+    Data shards of many cafe locations in one process.
+
+    Layout of `root`, one directory per location:
+        <root>/<tenant>/Item_to_id.csv      the location's menu
+        <root>/<tenant>/food.csv            optional: its orders (popularity and ratings)
+        <root>/<tenant>/conversationo.csv   optional: FAQ rows specific to the location
+
+    The FAQ at `shared_faq_path` is indexed once (SharedFAQ). A location's shard holds
+    its menu items and only those FAQ rows the shared FAQ does not already have; its
+    retriever searches the shard and the shared FAQ together (MergedRetriever), and its
+    fast path tries the location's FAQ rows first.
+
+    Shards are built (or loaded from `cache_dir`, memory-mapped) on a location's first
+    request and kept in LRU order. When the on-disk footprint of the loaded shards exceeds
+    `memory_budget_mb`, the least recently used ones are dropped; requests still holding
+    an evicted snapshot finish on it. The budget counts mapped-file bytes only (FAISS
+    index, document store, sparse postings, item matrix, vectorizer): the heap parts of
+    a shard (FAQ fast path embeddings, unpickled vectorizer, menu lookup tables, answer
+    cache) come on top, so leave headroom for them. A loaded shard is checked for changed CSVs at most
+    every `reload_interval` seconds and rebuilt incrementally, like SnapshotManager does.
+    """
+
+    def __init__(self, embedder, root: str, shared_faq_path: str, cache_dir: str = "models/tenants",
+                 memory_budget_mb: float = 512.0, reload_interval: float = 30.0,
+                 index_params: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            embedder: Embedder shared by every shard
+            root: directory with one sub-directory per location
+            shared_faq_path: FAQ CSV shared by all locations
+            cache_dir: where shard indexes are saved (one sub-directory per location)
+            memory_budget_mb: on-disk (mapped) size of loaded shards above which cold ones are evicted
+            reload_interval: seconds between data file checks of a loaded shard
+            index_params: FaissIndexer arguments for every shard (index_type, ...)
+        """
+        self.embedder = embedder
+        self.root = root
+        self.shared_faq_path = shared_faq_path
+        self.cache_dir = cache_dir
+        self.memory_budget = memory_budget_mb * 2**20
+        self.reload_interval = reload_interval
+        self.index_params = index_params
+
+        self._lock = threading.Lock()
+        self._faq_lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._shards: "OrderedDict[str, SnapshotManager]" = OrderedDict()  # LRU, oldest first
+        self._sizes: Dict[str, int] = {}
+        self._checked: Dict[str, float] = {}
+        self._counts = {"requests": 0, "loads": 0, "evictions": 0, "reloads": 0}
+        self._faq_checked = time.monotonic()
+        self._faq = SharedFAQ(embedder, shared_faq_path, os.path.join(cache_dir, "_shared_faq"), index_params)
+
+    def tenants(self) -> List[str]:
+        """Locations with a menu under `root`."""
+        return sorted(name for name in os.listdir(self.root)
+                      if _TENANT_RE.match(name) and os.path.isfile(os.path.join(self.root, name, ITEMS_FILE)))
+
+    def view(self, tenant: str) -> TenantView:
+        return TenantView(self, tenant)
+
+    # -------------------- Shared FAQ --------------------
+    def shared_faq(self, force: bool = False) -> SharedFAQ:
+        """
+        The shared FAQ shard, rebuilt when its CSV changed (checked at most every
+        `reload_interval` seconds unless `force`). Locations follow on their next check,
+        since the shared FAQ is one of their data files.
+        """
+        if force or time.monotonic() - self._faq_checked >= self.reload_interval:
+            with self._faq_lock:
+                if force or time.monotonic() - self._faq_checked >= self.reload_interval:
+                    self._faq_checked = time.monotonic()
+                    if self._faq.changed():
+                        self._faq = SharedFAQ(self.embedder, self.shared_faq_path,
+                                              os.path.join(self.cache_dir, "_shared_faq"), self.index_params)
+        return self._faq
+
+    # -------------------- Shards --------------------
+    def _paths(self, tenant: str) -> Dict[str, str]:
+        base = os.path.join(self.root, tenant)
+        paths = {"items": os.path.join(base, ITEMS_FILE),
+                 "shared_faq": self.shared_faq_path}  # in the manifest: a shared FAQ change re-dedups the shard
+        for name, filename in (("orders", ORDERS_FILE), ("faq", FAQ_FILE)):
+            if os.path.isfile(os.path.join(base, filename)):
+                paths[name] = os.path.join(base, filename)
+        return paths
+
+    def _build(self, embedder, data_paths: Dict[str, str], version: int = 0,
+               index_kwargs: Optional[Dict[str, Any]] = None, shared_dir: Optional[str] = None) -> Snapshot:
+        """SnapshotManager builder for one location (same signature as build_snapshot)."""
+        shared = self.shared_faq(force=True)
+        items = load_items(data_paths["items"])
+        orders = load_orders(data_paths["orders"]) if "orders" in data_paths else _NO_ORDERS
+        faq = shared.own_rows(load_faq(data_paths["faq"])) if "faq" in data_paths else _NO_FAQ
+        docs = build_document_store(items, faq, orders)
+
+        indexer, status = load_or_build_index(docs, embedder, data_paths, **(index_kwargs or {}))
+        docs = indexer.store
+        sparse = SparseIndex.load_or_build(doc_texts(docs), os.path.join(shared_dir, "sparse"))
+        own = HybridRetriever(docs, embedder, indexer, sparse=sparse)
+
+        return Snapshot(
+            version=version,
+            status=status,
+            docs=docs,
+            faq=faq,
+            indexer=indexer,
+            retriever=MergedRetriever([own, shared.retriever]),
+            recommender=SimpleRecommender.from_indexer(docs, embedder, indexer,
+                                                       cache_path=os.path.join(shared_dir, "recommender")),
+            faq_fastpath=LayeredFAQ(FAQFastPath(faq, embedder), shared.fastpath),
+            answer_cache=SemanticAnswerCache(indexer=indexer),
+            # The shard's documents come first in the merged index, so its positions hold;
+            # prices quoted by the location's own FAQ rows take precedence
+            menu_lookup=MenuLookup(docs, pd.concat([faq, shared.faq])),
+        )
+
+    def _load(self, tenant: str) -> SnapshotManager:
+        if not _TENANT_RE.match(tenant) or not os.path.isfile(os.path.join(self.root, tenant, ITEMS_FILE)):
+            raise KeyError(f"Unknown tenant {tenant!r}")
+        with self._lock:
+            lock = self._load_locks.setdefault(tenant, threading.Lock())
+        with lock:  # one build per location, concurrent first requests wait for it
+            with self._lock:
+                if tenant in self._shards:
+                    return self._shards[tenant]
+            shard_dir = os.path.join(self.cache_dir, tenant)
+            manager = SnapshotManager(
+                self.embedder, self._paths(tenant),
+                index_kwargs={"index_path": os.path.join(shard_dir, "faiss.index"),
+                              "meta_path": os.path.join(shard_dir, "meta"),
+                              "manifest_path": os.path.join(shard_dir, "manifest.json"),
+                              "index_params": self.index_params},
+                interval=self.reload_interval, shared_dir=shard_dir, builder=self._build)
+            with self._lock:
+                self._shards[tenant] = manager
+                self._sizes[tenant] = _dir_size(shard_dir)
+                self._checked[tenant] = time.monotonic()
+                self._counts["loads"] += 1
+                self._evict(keep=tenant)
+            return manager
+
+    def _evict(self, keep: str):
+        """Drop least recently used shards until the loaded ones fit the budget (caller holds the lock)."""
+        while sum(self._sizes.values()) > self.memory_budget and len(self._shards) > 1:
+            tenant = next(t for t in self._shards if t != keep)
+            del self._shards[tenant]
+            del self._sizes[tenant]
+            # Per-location bookkeeping goes too, or it grows with every location ever requested
+            self._checked.pop(tenant, None)
+            self._load_locks.pop(tenant, None)
+            self._counts["evictions"] += 1
+
+    def get(self, tenant: str) -> Snapshot:
+        """Current snapshot of a location, loading its shard on first use."""
+        with self._lock:
+            self._counts["requests"] += 1
+            manager = self._shards.get(tenant)
+            if manager is not None:
+                self._shards.move_to_end(tenant)
+                due = time.monotonic() - self._checked[tenant] >= self.reload_interval
+                if due:
+                    self._checked[tenant] = time.monotonic()
+        if manager is None:
+            return self._load(tenant).current
+
+        if due and manager.check() is not None:
+            with self._lock:
+                self._counts["reloads"] += 1
+                if tenant in self._sizes:
+                    self._sizes[tenant] = _dir_size(os.path.join(self.cache_dir, tenant))
+                    self._evict(keep=tenant)
+        return manager.current
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters, loaded locations (least recently used first) and their footprint."""
+        with self._lock:
+            out: Dict[str, Any] = dict(self._counts)
+            out["loaded"] = list(self._shards)
+            out["loaded_mb"] = sum(self._sizes.values()) / 2**20
+        out["shared_faq_mb"] = self._faq.nbytes / 2**20
+        return out
@@ -0,0 +1,70 @@
+# test_menu_lookup.py
+import pandas as pd
+import pytest
+
+from menu_lookup import MenuLookup
+
+
+def _item(i, name, num_orders=0, avg_rating=0.0):
+    return {"id": f"item_{i}", "text": name,
+            "meta": {"type": "item", "item_id": str(i), "item_name": name,
+                     "num_orders": num_orders, "avg_rating": avg_rating}}
+
+
+@pytest.fixture
+def lookup():
+    docs = [_item(1, "avocado shake"), _item(2, "iced coffee late"), _item(3, "americano", 12, 2.0),
+            _item(4, "oreo shake"),
+            {"id": "faq_0_0", "text": "what is price of americano",
+             "meta": {"type": "faq", "question": "what is price of americano", "answer": "Rs. 190"}}]
+    faq = pd.DataFrame({"question": ["what is price of avocado shake", "what is price of iced coffee late",
+                                     "what is price of americano", "what is price of oreo shake"],
+                        "answer": ["Its our one of best, you can enjoy it at just Rs. 200",
+                                   "Its our one of best, you can enjoy it at just Rs. 180",
+                                   "Its our one of best, you can enjoy it at just Rs. 190",
+                                   "Sir Oreo Shake is of Rs. 190"]})
+    return MenuLookup(docs, faq)
+
+
+def test_typo_price_question_is_answered(lookup):
+    found = lookup.lookup("avacado shake price")
+    assert [m["index"] for m in found["items"]] == [0]
+    assert found["intent"] == "price"
+    assert found["answer"] == "Avocado Shake is Rs. 200."
+
+
+def test_how_much_is_item_is_a_price_question(lookup):
+    found = lookup.lookup("how much is an avocado shake and an oreo shake")
+    assert found["answer"] == "Avocado Shake is Rs. 200. Oreo Shake is Rs. 190."
+
+
+def test_how_much_of_something_else_is_not_a_price_question(lookup):
+    found = lookup.lookup("how much sugar is in the iced coffee latte")
+    assert [m["meta"]["item_name"] for m in found["items"]] == ["iced coffee late"]
+    assert found["intent"] is None
+    assert found["answer"] is None
+
+
+def test_near_miss_words_are_not_intents(lookup):
+    # "start" is 80 against "stars": americano has orders, so a rating would be answered
+    found = lookup.lookup("i will start with an americano")
+    assert found["intent"] is None
+    assert found["answer"] is None
+
+
+def test_rating_needs_orders(lookup):
+    assert lookup.lookup("what is the rating of americano")["answer"] == "Americano is rated 2 across 12 orders."
+    assert lookup.lookup("what is the rating of oreo shake")["answer"] is None
+
+
+def test_no_mention(lookup):
+    assert lookup.lookup("do you have wifi") is None
+    assert lookup.stats()["miss"] == 1
+
+
+def test_inject_puts_mentions_first_without_duplicates(lookup):
+    items = lookup.mentions("is the oreo shake good")
+    candidates = [{"index": 4, "meta": {}, "text": "", "score": 0.5}, {"index": 3, "meta": {}, "text": "", "score": 0.4}]
+    merged = MenuLookup.inject(candidates, items)
+    assert [c["index"] for c in merged] == [3, 4]
+    assert merged[0]["score"] > 1.0